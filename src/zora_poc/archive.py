@@ -0,0 +1,227 @@
+from pathlib import Path
+import mmap
+import os
+import struct
+import sys
+
+from zora_poc.events import BurnEvent, MintEvent, SwapEvent
+
+# Partition file: a header, then one fixed-width little-endian column per field, each
+# holding `count` values. Columns are ordered by width so every integer column starts
+# aligned to its own width, and the narrow ones are read as typed memoryviews (or
+# numpy.frombuffer) straight from the mapped file.
+## magic, version, reserved, from_block, to_block, count
+HEADER = struct.Struct("<4sHHqqQ")
+MAGIC = b"ZPEA"
+VERSION = 1
+# name, width in bytes, memoryview format of the narrow columns (None: int.from_bytes)
+COLUMNS = (
+    ## amounts of Mint/Burn (uint256) and Swap (int256, two's complement)
+    ("amount0", 32, None),
+    ("amount1", 32, None),
+    ## amount of Mint/Burn, liquidity after a Swap
+    ("amount", 16, None),
+    ("block_number", 8, "q"),
+    ("log_index", 4, "I"),
+    ## tick after a Swap
+    ("tick_lower", 4, "i"),
+    ("tick_upper", 4, "i"),
+    ("sqrt_price_x96", 20, None),
+    ("kind", 1, "B"),
+)
+MINT, BURN, SWAP = 0, 1, 2
+
+
+def column_values(event) -> tuple:
+    # the values of an event in COLUMNS order
+    if isinstance(event, SwapEvent):
+        return (
+            event.amount0,
+            event.amount1,
+            event.liquidity,
+            event.block_number,
+            event.log_index,
+            event.tick,
+            0,
+            event.sqrt_price_x96,
+            SWAP,
+        )
+    return (
+        event.amount0,
+        event.amount1,
+        event.amount,
+        event.block_number,
+        event.log_index,
+        event.tick_lower,
+        event.tick_upper,
+        0,
+        MINT if isinstance(event, MintEvent) else BURN,
+    )
+
+
+def write_partition(path: Path, from_block: int, to_block: int, events: list) -> None:
+    # written next to the target and renamed over it, like a checkpoint
+    assert sys.byteorder == "little", "archive columns are little-endian"
+    rows = [column_values(event) for event in events]
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as partition_file:
+        partition_file.write(
+            HEADER.pack(MAGIC, VERSION, 0, from_block, to_block, len(rows))
+        )
+        for i, (_, width, _) in enumerate(COLUMNS):
+            # negative values as two's complement
+            mask = (1 << 8 * width) - 1
+            partition_file.write(
+                b"".join((row[i] & mask).to_bytes(width, "little") for row in rows)
+            )
+        partition_file.flush()
+        os.fsync(partition_file.fileno())
+    os.replace(tmp_path, path)
+
+
+# The decoded events of one pool in from_block..to_block, memory-mapped read-only.
+# columns maps each column name to a typed memoryview (narrow columns) or a byte view of
+# `count` fixed-width values; events() rebuilds the Mint/Burn/SwapEvent records.
+class ArchivePartition:
+    def __init__(self, path: Path):
+        assert sys.byteorder == "little", "archive columns are little-endian"
+        self.path = Path(path)
+        with open(self.path, "rb") as partition_file:
+            self._mmap = mmap.mmap(partition_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.from_block, self.to_block, self.count = (
+            HEADER.unpack_from(self._mmap)
+        )
+        assert magic == MAGIC and version == VERSION, f"not an event archive: {path}"
+        self._view = memoryview(self._mmap)
+        self.columns = {}
+        offset = HEADER.size
+        for name, width, fmt in COLUMNS:
+            column = self._view[offset : offset + width * self.count]
+            self.columns[name] = column.cast(fmt) if fmt else column
+            offset += width * self.count
+
+    def __len__(self):
+        return self.count
+
+    def events(self, from_block: int | None = None, to_block: int | None = None):
+        columns = self.columns
+        amount0s = columns["amount0"]
+        amount1s = columns["amount1"]
+        amounts = columns["amount"]
+        sqrt_prices = columns["sqrt_price_x96"]
+        block_numbers = columns["block_number"]
+        log_indexes = columns["log_index"]
+        tick_lowers = columns["tick_lower"]
+        tick_uppers = columns["tick_upper"]
+        kinds = columns["kind"]
+        for i in range(self.count):
+            block_number = block_numbers[i]
+            if from_block is not None and block_number < from_block:
+                continue
+            if to_block is not None and block_number > to_block:
+                break
+            kind = kinds[i]
+            signed = kind == SWAP
+            amount0 = int.from_bytes(
+                amount0s[32 * i : 32 * i + 32], "little", signed=signed
+            )
+            amount1 = int.from_bytes(
+                amount1s[32 * i : 32 * i + 32], "little", signed=signed
+            )
+            amount = int.from_bytes(amounts[16 * i : 16 * i + 16], "little")
+            if signed:
+                yield SwapEvent(
+                    block_number,
+                    log_indexes[i],
+                    amount0,
+                    amount1,
+                    int.from_bytes(sqrt_prices[20 * i : 20 * i + 20], "little"),
+                    amount,
+                    tick_lowers[i],
+                )
+            else:
+                yield (MintEvent if kind == MINT else BurnEvent)(
+                    block_number,
+                    log_indexes[i],
+                    tick_lowers[i],
+                    tick_uppers[i],
+                    amount,
+                    amount0,
+                    amount1,
+                )
+
+    def close(self) -> None:
+        for column in self.columns.values():
+            column.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return (
+            f"ArchivePartition(from_block={self.from_block}, to_block={self.to_block}, "
+            f"count={self.count})"
+        )
+
+
+# Local append-only archive of decoded pool events, one directory per pool with one
+# partition file per block range. Partitions of a pool are contiguous: each one starts
+# right after the head (last block) of the previous one, so the archive always holds
+# every event of its pool from the first partition's from_block to the head. Only
+# blocks deep enough not to be reorganized away belong in it.
+class EventArchive:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def pool_dir(self, pool_address: str) -> Path:
+        return self.root / pool_address.lower()
+
+    def partitions(self, pool_address: str) -> list[tuple[int, int, Path]]:
+        # (from_block, to_block, path), oldest first
+        pool_dir = self.pool_dir(pool_address)
+        if not pool_dir.is_dir():
+            return []
+        partitions = []
+        for path in pool_dir.glob("*.events"):
+            from_block, to_block = path.stem.split("-")
+            partitions.append((int(from_block), int(to_block), path))
+        return sorted(partitions)
+
+    def head(self, pool_address: str) -> int | None:
+        partitions = self.partitions(pool_address)
+        return partitions[-1][1] if partitions else None
+
+    def append(
+        self, pool_address: str, from_block: int, to_block: int, events: list
+    ) -> None:
+        # events of from_block..to_block in log order, right after the head
+        head = self.head(pool_address)
+        assert head is None or from_block == head + 1, "archive is append-only"
+        assert from_block <= to_block
+        pool_dir = self.pool_dir(pool_address)
+        pool_dir.mkdir(parents=True, exist_ok=True)
+        path = pool_dir / f"{from_block:010d}-{to_block:010d}.events"
+        write_partition(path, from_block, to_block, events)
+
+    def events(
+        self,
+        pool_address: str,
+        from_block: int | None = None,
+        to_block: int | None = None,
+    ):
+        # the archived events of the pool within the block bounds, in log order
+        for start, end, path in self.partitions(pool_address):
+            if (from_block is not None and end < from_block) or (
+                to_block is not None and start > to_block
+            ):
+                continue
+            with ArchivePartition(path) as partition:
+                yield from partition.events(from_block, to_block)
+
+    def __repr__(self):
+        return f"EventArchive(root={self.root})"
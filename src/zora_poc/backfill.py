@@ -0,0 +1,168 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+import os
+
+from zora_poc.checkpoint import Checkpoint
+from zora_poc.client import Client, get_client
+from zora_poc.events import POOL_EVENT_TOPICS, BurnEvent, MintEvent, decode_log
+from zora_poc.lens_state import TickBook
+from zora_poc.simulator.libraries.Shared import MAX_UINT128, TickInfo
+from zora_poc.tailer import LogTailer, RangeSizer
+
+
+# Net effect of the Mint/Burn/Swap events of one block range on a TickBook. Mint and Burn
+# only add to liquidityGross and liquidityNet, so the tick deltas of consecutive ranges
+# simply add up, in any order. The price, tick and active liquidity are the ones of the
+# last Swap, plus the positions modified after it that contain its tick: those are the
+# liquidityNet deltas after the swap at ticks at or below it (a position below the tick
+# adds and removes the same amount, one above adds nothing), so they are kept apart.
+class LiquidityDelta:
+    def __init__(self):
+        ## tick => [liquidityGross delta, liquidityNet delta]
+        self.ticks = {}
+        ## (sqrtPriceX96, liquidity, tick) of the last Swap, None without one
+        self.swap = None
+        ## tick => liquidityNet delta of the positions modified after the last Swap
+        self.nets_after_swap = {}
+
+    def modify_position(self, tick_lower: int, tick_upper: int, liquidity_delta: int):
+        if liquidity_delta == 0:
+            return
+        for tick, net in (
+            (tick_lower, liquidity_delta),
+            (tick_upper, -liquidity_delta),
+        ):
+            entry = self.ticks.get(tick)
+            if entry is None:
+                entry = self.ticks[tick] = [0, 0]
+            entry[0] += liquidity_delta
+            entry[1] += net
+            self.nets_after_swap[tick] = self.nets_after_swap.get(tick, 0) + net
+
+    def apply(self, event) -> None:
+        # a decoded event of zora_poc.events, in log order
+        if isinstance(event, MintEvent):
+            self.modify_position(event.tick_lower, event.tick_upper, event.amount)
+        elif isinstance(event, BurnEvent):
+            self.modify_position(event.tick_lower, event.tick_upper, -event.amount)
+        else:
+            self.swap = (event.sqrt_price_x96, event.liquidity, event.tick)
+            self.nets_after_swap = {}
+
+    def merge(self, later: "LiquidityDelta") -> "LiquidityDelta":
+        # adds the delta of the range right after this one, in place
+        for tick, (gross, net) in later.ticks.items():
+            entry = self.ticks.get(tick)
+            if entry is None:
+                entry = self.ticks[tick] = [0, 0]
+            entry[0] += gross
+            entry[1] += net
+        if later.swap is not None:
+            self.swap = later.swap
+            self.nets_after_swap = dict(later.nets_after_swap)
+        else:
+            for tick, net in later.nets_after_swap.items():
+                self.nets_after_swap[tick] = self.nets_after_swap.get(tick, 0) + net
+        return self
+
+    def apply_to(self, book: TickBook) -> None:
+        # the same book as applying the range's events one by one, without journaling
+        for tick, (gross, net) in self.ticks.items():
+            if gross == 0 and net == 0:
+                continue
+            info = book.ticks.get(tick)
+            if info is None:
+                info = book.ticks[tick] = TickInfo(0, 0, 0, 0)
+                book.tick_index.insert(tick)
+            info.liquidityGross += gross
+            info.liquidityNet += net
+            assert 0 <= info.liquidityGross <= MAX_UINT128, "LO"
+            if info.liquidityGross == 0:
+                del book.ticks[tick]
+                book.tick_index.remove(tick)
+        if self.swap is not None:
+            book.sqrt_price_x96, book.liquidity, book.tick = self.swap
+        if book.tick is not None:
+            book.liquidity += sum(
+                net for tick, net in self.nets_after_swap.items() if tick <= book.tick
+            )
+
+    def __repr__(self):
+        return f"LiquidityDelta(ticks={len(self.ticks)}, swap={self.swap})"
+
+
+def fetch_delta(
+    client_factory, pool_address: str, from_block: int, to_block: int
+) -> tuple[LiquidityDelta, str | None]:
+    # worker: the delta of the pool's events in from_block..to_block and the hash of
+    # to_block, through a LogTailer of its own
+    delta = LiquidityDelta()
+    block_hashes = {}
+
+    def handle_log(log):
+        event = decode_log(log)
+        if event is not None:
+            delta.apply(event)
+
+    tailer = LogTailer(
+        pool_address,
+        POOL_EVENT_TOPICS,
+        from_block,
+        handle_log,
+        client=client_factory(),
+        range_sizer=RangeSizer(initial_size=100_000),
+        block_hashes=block_hashes,
+    )
+    asyncio.run(tailer.run(stop_block=to_block))
+    return delta, block_hashes.get(to_block)
+
+
+def backfill(
+    pool_address: str,
+    from_block: int,
+    to_block: int,
+    workers: int | None = None,
+    ranges_per_worker: int = 4,
+    journal_depth: int = 0,
+    client_factory=None,
+) -> Checkpoint:
+    # Replays the pool's events of from_block..to_block on an empty book, with the block
+    # range split into ranges_per_worker ranges per worker process so a busy stretch does
+    # not hold up the others. Workers connect through client_factory(), by default a
+    # Client of the current client's RPC URL. Deltas are merged in block order as they
+    # come in; the result is the checkpoint a sequential replay reaches after to_block.
+    # Blocks within the reorg depth of the head are better left to the tailer.
+    workers = workers or os.cpu_count() or 1
+    if client_factory is None:
+        client_factory = partial(Client, get_client().rpc_url)
+    ranges = min(workers * ranges_per_worker, to_block - from_block + 1)
+    bounds = [
+        from_block + (to_block - from_block + 1) * i // ranges
+        for i in range(ranges + 1)
+    ]
+
+    total = LiquidityDelta()
+    block_hash = None
+    with ProcessPoolExecutor(workers) as executor:
+        for delta, block_hash in executor.map(
+            fetch_delta,
+            repeat(client_factory),
+            repeat(pool_address),
+            bounds[:-1],
+            [bound - 1 for bound in bounds[1:]],
+        ):
+            total.merge(delta)
+
+    book = TickBook(journal_depth=journal_depth)
+    total.apply_to(book)
+    # the journal starts after the backfilled blocks
+    book.journal_floor = to_block
+    return Checkpoint(
+        to_block,
+        block_hash,
+        (to_block + 1, -1),
+        book,
+        {to_block: block_hash} if block_hash is not None else {},
+    )
@@ -0,0 +1,466 @@
+from pathlib import Path
+import random
+import tempfile
+import time
+import tracemalloc
+
+from zora_poc.archive import EventArchive
+from zora_poc.client import UNISWAP_V3_POOL_ABI, load_abi
+from zora_poc.depth_index import DepthIndex
+from zora_poc.events import (
+    BURN_TOPIC,
+    MINT_TOPIC,
+    SWAP_TOPIC,
+    decode_log,
+    decode_logs,
+)
+from zora_poc.float_depth import FloatDepth
+from zora_poc.lens import UNCHECKED_KERNEL, PoolSnapshot, Slot0, swap_quote
+from zora_poc.lens_state import Tick, TickBook, TickSnapshot
+from zora_poc.pools import PoolInfo, PoolRegistry
+from zora_poc.tick_file import MappedTicks, write_tick_snapshot
+from zora_poc.tiered_quote import FLOAT_TIER, TieredQuoter
+from zora_poc.simulator.libraries import SwapMath, TickMath, UncheckedSwapMath
+from zora_poc.simulator.libraries.Shared import (
+    FEE_AMOUNT_TICK_SPACING,
+    MAX_TICK,
+    MIN_TICK,
+    TickInfo,
+)
+
+# Usage: python -m zora_poc.benchmarks
+# Timings of the fast paths against their reference implementations. The quote fast
+# paths are checked against the references in tests/test_quotes.py and decode_log against
+# web3's process_log in tests/test_events.py (python -m pytest).
+
+
+def timed(fn, inputs) -> float:
+    start_time = time.perf_counter()
+    for x in inputs:
+        fn(x)
+    return time.perf_counter() - start_time
+
+
+def bench_get_tick_at_sqrt_ratio(samples: int = 200_000, seed: int = 0) -> None:
+    rnd = random.Random(seed)
+    boundaries = []
+    inside = []
+    for _ in range(samples):
+        tick = rnd.randint(MIN_TICK, MAX_TICK - 1)
+        sqrt_price = TickMath.getSqrtRatioAtTick(tick)
+        # the boundary itself and the last price below it
+        boundaries += [sqrt_price, max(sqrt_price - 1, TickMath.MIN_SQRT_RATIO)]
+        inside.append(
+            sqrt_price
+            + rnd.randrange(TickMath.getSqrtRatioAtTick(tick + 1) - sqrt_price)
+        )
+    boundaries += [TickMath.MIN_SQRT_RATIO, TickMath.MAX_SQRT_RATIO - 1]
+
+    for name, prices in (("inside a tick", inside), ("on a tick boundary", boundaries)):
+        reference = timed(TickMath.getTickAtSqrtRatio, prices)
+        fast = timed(TickMath.getTickAtSqrtRatioFast, prices)
+        print(
+            f"getTickAtSqrtRatio {name}: {len(prices)} prices, "
+            f"reference {reference:.3f}s, fast {fast:.3f}s, speedup {reference / fast:.1f}x"
+        )
+
+
+def random_swap_step_inputs(rnd: random.Random) -> tuple:
+    # magnitudes are drawn log-uniformly so that tiny and huge values both show up
+    sqrt_price = TickMath.getSqrtRatioAtTick(rnd.randint(MIN_TICK, MAX_TICK - 1))
+    sqrt_target = TickMath.getSqrtRatioAtTick(rnd.randint(MIN_TICK, MAX_TICK - 1))
+    if rnd.random() < 0.5:
+        sqrt_target = sqrt_price + rnd.randint(
+            -(2 ** rnd.randint(0, 96)), 2 ** rnd.randint(0, 96)
+        )
+        sqrt_target = min(
+            max(sqrt_target, TickMath.MIN_SQRT_RATIO), TickMath.MAX_SQRT_RATIO
+        )
+    liquidity = rnd.randrange(2 ** rnd.randint(0, 128))
+    amount = rnd.randrange(2 ** rnd.randint(0, 200)) * rnd.choice((1, -1))
+    fee = rnd.choice((100, 500, 3000, 10000))
+    return (sqrt_price, sqrt_target, liquidity, amount, fee)
+
+
+def bench_unchecked_swap_step(samples: int = 200_000, seed: int = 0) -> None:
+    rnd = random.Random(seed)
+    inputs = []
+    while len(inputs) < samples:
+        args = random_swap_step_inputs(rnd)
+        try:
+            SwapMath.computeSwapStep(*args)
+        except (AssertionError, ZeroDivisionError):
+            # the reference reverts, the unchecked kernel is not defined there
+            continue
+        inputs.append(args)
+
+    reference = timed(lambda args: SwapMath.computeSwapStep(*args), inputs)
+    unchecked = timed(lambda args: UncheckedSwapMath.computeSwapStep(*args), inputs)
+    print(
+        f"computeSwapStep: {len(inputs)} random steps, "
+        f"checked {reference:.3f}s, unchecked {unchecked:.3f}s, speedup {reference / unchecked:.1f}x"
+    )
+
+
+def random_pool(rnd: random.Random, positions: int, tick_spacing: int = 200) -> tuple:
+    # (ticks mapping, slot0, liquidity) of a pool with random positions around the price
+    ticks = {}
+    current_tick = rnd.randrange(-50_000, 50_000)
+    for _ in range(positions):
+        lower = (current_tick // tick_spacing + rnd.randrange(-300, 300)) * tick_spacing
+        upper = lower + tick_spacing * rnd.randrange(1, 200)
+        amount = rnd.randrange(10**15, 10**22)
+        for tick, delta in ((lower, amount), (upper, -amount)):
+            info = ticks.setdefault(tick, TickInfo(0, 0, 0, 0))
+            info.liquidityGross += amount
+            info.liquidityNet += delta
+    liquidity = sum(
+        info.liquidityNet for tick, info in ticks.items() if tick <= current_tick
+    )
+    sqrt_price = TickMath.getSqrtRatioAtTick(current_tick) + rnd.randrange(10**20)
+    slot0 = Slot0(sqrt_price, TickMath.getTickAtSqrtRatio(sqrt_price))
+    return ticks, slot0, liquidity
+
+
+def bench_float_depth(pools: int = 20, amounts: int = 2_000, seed: int = 0) -> None:
+    rnd = random.Random(seed)
+    exact_time = 0.0
+    float_time = 0.0
+    quoted = 0
+    for _ in range(pools):
+        ticks, slot0, liquidity = random_pool(rnd, rnd.choice((3, 30, 400)))
+        snapshot = TickSnapshot.from_mapping(ticks)
+        amounts_in = [int(10 ** rnd.uniform(0, 30)) for _ in range(amounts)]
+        for zero_for_one in (True, False):
+            index = DepthIndex(
+                snapshot, slot0, liquidity, zero_for_one, kernel=UNCHECKED_KERNEL
+            )
+            depth = FloatDepth(snapshot, slot0, liquidity, zero_for_one)
+
+            start_time = time.perf_counter()
+            for amount in amounts_in:
+                index.quote(amount)
+            exact_time += time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            depth.quote_many(amounts_in)
+            float_time += time.perf_counter() - start_time
+            quoted += len(amounts_in)
+
+    print(
+        f"FloatDepth.quote_many: {quoted} quotes, exact {exact_time:.3f}s, "
+        f"float {float_time:.3f}s, speedup {exact_time / float_time:.1f}x"
+    )
+
+
+def bench_tiered_quote(pools: int = 20, requests: int = 500, seed: int = 0) -> None:
+    # thresholds are competing routes or min-outs a relative 1e-7 to 10% away from the
+    # exact output, in both directions
+    rnd = random.Random(seed)
+    answered = []
+    exact_time = 0.0
+    tiered_time = 0.0
+    for _ in range(pools):
+        ticks, slot0, liquidity = random_pool(rnd, rnd.choice((3, 30, 400)))
+        snapshot = TickSnapshot.from_mapping(ticks)
+        for zero_for_one in (True, False):
+            limit = (
+                TickMath.MIN_SQRT_RATIO + 1
+                if zero_for_one
+                else TickMath.MAX_SQRT_RATIO - 1
+            )
+            amounts_in = [int(10 ** rnd.uniform(12, 24)) for _ in range(requests)]
+            exact = []
+            start_time = time.perf_counter()
+            for amount in amounts_in:
+                amount0, amount1, _, _, _ = swap_quote(
+                    snapshot, slot0, liquidity, zero_for_one, amount, limit
+                )
+                exact.append(-amount1 if zero_for_one else -amount0)
+            exact_time += time.perf_counter() - start_time
+            thresholds = [
+                int(out * (1 + rnd.choice((1, -1)) * 10 ** rnd.uniform(-7, -1)))
+                for out in exact
+            ]
+
+            start_time = time.perf_counter()
+            quoter = TieredQuoter(snapshot, slot0, liquidity, zero_for_one)
+            results = [
+                quoter.meets(amount, threshold)
+                for amount, threshold in zip(amounts_in, thresholds)
+            ]
+            tiered_time += time.perf_counter() - start_time
+
+            answered += [result.tier for result in results]
+
+    fast = answered.count(FLOAT_TIER) / len(answered)
+    print(
+        f"TieredQuoter.meets: {len(answered)} answers, "
+        f"{fast:.1%} from the float tier, exact {exact_time:.3f}s, "
+        f"tiered {tiered_time:.3f}s, speedup {exact_time / tiered_time:.1f}x"
+    )
+
+
+def random_pool_logs(rnd: random.Random, count: int) -> list:
+    # raw Mint/Burn/Swap logs as get_logs returns them, with values over the full range
+    # of every field
+    from eth_abi import encode
+    from hexbytes import HexBytes
+    from web3.datastructures import AttributeDict
+
+    def word(value: int) -> HexBytes:
+        return HexBytes((value % 2**256).to_bytes(32, "big"))
+
+    logs = []
+    for i in range(count):
+        kind = rnd.choice((MINT_TOPIC, BURN_TOPIC, SWAP_TOPIC, SWAP_TOPIC))
+        owner = "0x" + rnd.randbytes(20).hex()
+        if kind == SWAP_TOPIC:
+            topics = [HexBytes(kind), word(int(owner, 16)), word(rnd.getrandbits(160))]
+            data = encode(
+                ["int256", "int256", "uint160", "uint128", "int24"],
+                [
+                    rnd.randint(-(2**255), 2**255 - 1),
+                    rnd.randint(-(2**255), 2**255 - 1),
+                    rnd.getrandbits(160),
+                    rnd.getrandbits(128),
+                    rnd.randint(MIN_TICK, MAX_TICK),
+                ],
+            )
+        else:
+            tick_lower = rnd.randint(MIN_TICK, MAX_TICK - 1)
+            tick_upper = rnd.randint(tick_lower + 1, MAX_TICK)
+            topics = [HexBytes(kind), word(int(owner, 16))]
+            topics += [word(tick_lower), word(tick_upper)]
+            amounts = [rnd.getrandbits(128), rnd.getrandbits(256), rnd.getrandbits(256)]
+            if kind == MINT_TOPIC:
+                data = encode(
+                    ["address", "uint128", "uint256", "uint256"], [owner, *amounts]
+                )
+            else:
+                data = encode(["uint128", "uint256", "uint256"], amounts)
+        logs.append(
+            AttributeDict(
+                {
+                    "address": "0xE020E67Cb76C780329d4c205578Aaa6d6478Fb2A",
+                    "topics": topics,
+                    "data": HexBytes(data),
+                    "blockNumber": 30_000_000 + i // 4,
+                    "logIndex": i % 4,
+                    "transactionIndex": 0,
+                    "transactionHash": HexBytes(rnd.randbytes(32)),
+                    "blockHash": HexBytes(rnd.randbytes(32)),
+                    "removed": False,
+                }
+            )
+        )
+    return logs
+
+
+def bench_decode_log(samples: int = 10_000, seed: int = 0) -> None:
+    from web3 import Web3
+
+    rnd = random.Random(seed)
+    logs = random_pool_logs(rnd, samples)
+    events = Web3().eth.contract(abi=load_abi(UNISWAP_V3_POOL_ABI)).events
+    abi_events = {
+        MINT_TOPIC: events.Mint(),
+        BURN_TOPIC: events.Burn(),
+        SWAP_TOPIC: events.Swap(),
+    }
+
+    def process_log(log):
+        return abi_events[log["topics"][0].to_0x_hex()].process_log(log)
+
+    reference = timed(process_log, logs)
+    fast = timed(decode_log, logs)
+    print(
+        f"decode_log: {len(logs)} Mint/Burn/Swap logs, "
+        f"reference {reference:.3f}s, fast {fast:.3f}s, speedup {reference / fast:.1f}x"
+    )
+
+
+def bench_pool_registry(pools: int = 1_000, seed: int = 0) -> None:
+    # memory of a registry of `pools` pools with random fee tiers and books, and their
+    # quotes checked against DepthIndex with the same fee and tick spacing
+    rnd = random.Random(seed)
+    infos = []
+    books = []
+    for i in range(pools):
+        fee = rnd.choice(list(FEE_AMOUNT_TICK_SPACING))
+        info = PoolInfo.from_fee(
+            "0x" + rnd.randbytes(20).hex(),
+            "0x" + rnd.randbytes(20).hex(),
+            "0x" + rnd.randbytes(20).hex(),
+            fee,
+        )
+        ticks, slot0, liquidity = random_pool(
+            rnd, rnd.choice((3, 30, 100)), info.tick_spacing
+        )
+        rows = [Tick(t, i.liquidityGross, i.liquidityNet) for t, i in ticks.items()]
+        infos.append(info)
+        books.append((rows, slot0, liquidity))
+
+    tracemalloc.start()
+    registry = PoolRegistry(journal_depth=64)
+    for info in infos:
+        registry.add(info)
+    empty = tracemalloc.get_traced_memory()[0]
+    for info, (rows, slot0, liquidity) in zip(infos, books):
+        registry[info.address].state.book = TickBook.from_ticks(
+            rows, slot0.sqrtPriceX96, liquidity, slot0.tick, journal_depth=64
+        )
+    full = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    ticks = sum(len(pool.book) for pool in registry)
+
+    for pool in list(registry)[:100]:
+        for zero_for_one in (True, False):
+            depth = DepthIndex(
+                TickSnapshot.from_mapping(pool.book.ticks),
+                pool.slot0,
+                pool.book.liquidity,
+                zero_for_one,
+                fee=pool.info.fee,
+                tick_spacing=pool.info.tick_spacing,
+            )
+            for amount in (10**15, -(10**15), 10**21):
+                assert pool.quote(zero_for_one, amount) == depth.quote(amount)
+
+    print(
+        f"PoolRegistry: {len(registry)} pools, {ticks} initialized ticks, "
+        f"{full / 2**20:.1f} MiB, {empty / len(registry):.0f} B per empty pool, "
+        f"{(full - empty) / ticks:.0f} B per tick"
+    )
+
+
+def bench_event_archive(samples: int = 200_000, seed: int = 0) -> None:
+    # archived events read back identical to decoding the logs they came from
+    rnd = random.Random(seed)
+    events = decode_logs(random_pool_logs(rnd, samples))
+    with tempfile.TemporaryDirectory() as root:
+        archive = EventArchive(root)
+        pool_address = "0xE020E67Cb76C780329d4c205578Aaa6d6478Fb2A"
+        last_block = events[-1].block_number
+        start_time = time.perf_counter()
+        archive.append(pool_address, events[0].block_number, last_block, events)
+        write_time = time.perf_counter() - start_time
+        partitions = archive.partitions(pool_address)
+        size = sum(path.stat().st_size for _, _, path in partitions)
+
+        start_time = time.perf_counter()
+        archived = list(archive.events(pool_address))
+        read_time = time.perf_counter() - start_time
+    assert archived == events
+    print(
+        f"EventArchive: {len(events)} events identical after a round trip, "
+        f"{size / len(events):.0f} B per event, write {write_time:.3f}s, "
+        f"read {read_time:.3f}s ({len(events) / read_time / 1e6:.2f}M events/s)"
+    )
+
+
+def bench_tick_file(positions: int = 6_000, seed: int = 0) -> None:
+    # cold start of a ~10k tick pool: decoding a getAllTicks result into Tick objects
+    # and a TickSnapshot, against mapping a tick snapshot file
+    from eth_abi import decode, encode
+
+    rnd = random.Random(seed)
+    fee = 500
+    tick_spacing = FEE_AMOUNT_TICK_SPACING[fee]
+    ticks, slot0, liquidity = random_pool(rnd, 0, tick_spacing)
+    for _ in range(positions):
+        lower = rnd.randrange(-60_000, 60_000) * tick_spacing
+        upper = lower + tick_spacing * rnd.randrange(1, 2_000)
+        amount = rnd.randrange(10**15, 10**22)
+        for tick, delta in ((lower, amount), (upper, -amount)):
+            info = ticks.setdefault(tick, TickInfo(0, 0, 0, 0))
+            info.liquidityGross += amount
+            info.liquidityNet += delta
+    liquidity = sum(
+        info.liquidityNet for tick, info in ticks.items() if tick <= slot0.tick
+    )
+    rows = [(t, i.liquidityGross, i.liquidityNet) for t, i in sorted(ticks.items())]
+    result = encode(["(int24,uint128,int128)[]"], [rows])
+
+    def cold_start():
+        (decoded,) = decode(["(int24,uint128,int128)[]"], result)
+        return TickSnapshot.from_ticks(tuple(Tick(*row) for row in decoded))
+
+    start_time = time.perf_counter()
+    snapshot = cold_start()
+    decode_time = time.perf_counter() - start_time
+    tracemalloc.start()
+    snapshot = cold_start()
+    decode_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    pool_snapshot = PoolSnapshot(
+        0,
+        "0xE020E67Cb76C780329d4c205578Aaa6d6478Fb2A",
+        "",
+        "",
+        slot0,
+        liquidity,
+        snapshot,
+        fee=fee,
+        tick_spacing=tick_spacing,
+    )
+    with tempfile.TemporaryDirectory() as root:
+        path = Path(root) / "pool.ticks"
+        write_tick_snapshot(path, pool_snapshot)
+
+        start_time = time.perf_counter()
+        MappedTicks(path).close()
+        map_time = time.perf_counter() - start_time
+        tracemalloc.start()
+        mapped = MappedTicks(path)
+        map_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        for zero_for_one in (True, False):
+            limit = (
+                TickMath.MIN_SQRT_RATIO + 1
+                if zero_for_one
+                else TickMath.MAX_SQRT_RATIO - 1
+            )
+            for amount in (10**15, 10**20, 10**24, -(10**18)):
+                expected = swap_quote(
+                    snapshot,
+                    slot0,
+                    liquidity,
+                    zero_for_one,
+                    amount,
+                    limit,
+                    fee=fee,
+                    tick_spacing=tick_spacing,
+                )
+                actual = swap_quote(
+                    mapped,
+                    mapped.slot0,
+                    mapped.liquidity,
+                    zero_for_one,
+                    amount,
+                    limit,
+                    fee=mapped.fee,
+                    tick_spacing=mapped.tick_spacing,
+                )
+                assert actual == expected, (zero_for_one, amount, actual, expected)
+        size = path.stat().st_size
+        mapped.close()
+
+    print(
+        f"MappedTicks: {len(snapshot)} ticks ({size / 1024:.0f} KiB file), quotes "
+        f"identical, cold start decode {decode_time * 1e3:.1f}ms / "
+        f"{decode_memory / 1024:.0f} KiB, mmap {map_time * 1e3:.3f}ms / "
+        f"{map_memory / 1024:.1f} KiB, speedup {decode_time / map_time:.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    bench_get_tick_at_sqrt_ratio()
+    bench_unchecked_swap_step()
+    bench_float_depth()
+    bench_tiered_quote()
+    bench_decode_log()
+    bench_pool_registry()
+    bench_event_archive()
+    bench_tick_file()
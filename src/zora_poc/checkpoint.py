@@ -0,0 +1,103 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import os
+
+from zora_poc.lens_state import TickBook
+from zora_poc.simulator.libraries.Shared import TickInfo
+
+
+# Ingestion progress of one pool: the tick book after applying every log up to and
+# including block_number, the hash of that block, and the (blockNumber, logIndex) of the
+# last applied log. Logs at or below the watermark are skipped, so replaying a range that
+# was already applied (a restart, an overlapping range) applies every event exactly once.
+# The book's reorg journal and the hashes of recent blocks are saved too, so a reorg right
+# after a restart can still be rolled back.
+@dataclass
+class Checkpoint:
+    block_number: int
+    block_hash: str | None = None
+    watermark: tuple[int, int] = (-1, -1)
+    book: TickBook = field(default_factory=TickBook)
+    ## block number => hash of recently handled blocks, see LogTailer.block_hashes
+    block_hashes: dict[int, str] = field(default_factory=dict)
+
+    def rollback(self, block_number: int) -> None:
+        # back to the state after block_number, whose logs all stay applied
+        self.book.rollback(block_number)
+        self.block_number = block_number
+        self.block_hash = self.block_hashes.get(block_number)
+        self.watermark = min(self.watermark, (block_number + 1, -1))
+
+    def is_applied(self, log) -> bool:
+        return (log["blockNumber"], log["logIndex"]) <= self.watermark
+
+    def mark_applied(self, log) -> None:
+        self.watermark = (log["blockNumber"], log["logIndex"])
+
+    def to_json(self) -> dict:
+        return {
+            "block_number": self.block_number,
+            "block_hash": self.block_hash,
+            "watermark": list(self.watermark),
+            "sqrt_price_x96": self.book.sqrt_price_x96,
+            "liquidity": self.book.liquidity,
+            "tick": self.book.tick,
+            # tick => [liquidityGross, liquidityNet]
+            "ticks": {
+                str(tick): [info.liquidityGross, info.liquidityNet]
+                for tick, info in self.book.ticks.items()
+            },
+            "journal_depth": self.book.journal_depth,
+            "journal_floor": self.book.journal_floor,
+            "journal": [[block, undo] for block, undo in self.book.journal],
+            "block_hashes": {str(block): h for block, h in self.block_hashes.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Checkpoint":
+        book = TickBook(
+            data["sqrt_price_x96"],
+            data["liquidity"],
+            data["tick"],
+            data["journal_depth"],
+        )
+        for tick, (liquidity_gross, liquidity_net) in data["ticks"].items():
+            book.ticks[int(tick)] = TickInfo(liquidity_gross, liquidity_net, 0, 0)
+            book.tick_index.insert(int(tick))
+        book.journal.extend(
+            (block, [tuple(entry) for entry in undo]) for block, undo in data["journal"]
+        )
+        book.journal_floor = data["journal_floor"]
+        return cls(
+            data["block_number"],
+            data["block_hash"],
+            tuple(data["watermark"]),
+            book,
+            {int(block): h for block, h in data["block_hashes"].items()},
+        )
+
+    def save(self, path: Path) -> None:
+        # write a temporary file next to the target and rename it over the target, so a
+        # crash leaves either the previous or the new checkpoint, never a partial one
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w") as checkpoint_file:
+            json.dump(self.to_json(), checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint | None":
+        try:
+            with open(path, "r") as checkpoint_file:
+                return cls.from_json(json.load(checkpoint_file))
+        except FileNotFoundError:
+            return None
+
+    def __repr__(self):
+        return (
+            f"Checkpoint(block_number={self.block_number}, block_hash={self.block_hash}, "
+            f"watermark={self.watermark}, book={self.book})"
+        )
@@ -0,0 +1,102 @@
+from functools import lru_cache
+from pathlib import Path
+import json
+
+# Configuration
+RPC_URL = "http://base-proxy.lat.nodes.internal.notnotzora.com"
+LENS_ADDRESS = "0x3b9eb662131aAFa7703675CD7EdBB215dBC829b4"
+POOL_ADDRESS = "0xE020E67Cb76C780329d4c205578Aaa6d6478Fb2A"
+QUOTER_ADDRESS = "0x3d4e44Eb1374240CE5F1B871ab261CD16335B76a"
+# Multicall3 has the same address on every chain it is deployed to, Base included
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# ABI files ship next to this module, so loading them does not depend on the working directory
+ABI_DIR = Path(__file__).parent
+UNISWAP_V3_LENS_ABI = "UniswapV3Lens"
+UNISWAP_V3_POOL_ABI = "UniswapV3Pool"
+UNISWAP_V3_QUOTER_ABI = "UniswapV3Quoter"
+MULTICALL3_ABI = "Multicall3"
+
+
+@lru_cache(maxsize=None)
+def load_abi(name: str) -> list:
+    with open(ABI_DIR / f"{name}.json", "r") as abi_file:
+        return json.load(abi_file)
+
+
+# RPC connection and contract objects, created on first use. Nothing here runs at import
+# time: web3 itself is only imported when w3 is first needed, so processes that only quote
+# never pay for it. Pass a provider (any web3 provider, for example a local fake) and an
+# async_provider for async_w3 to talk to something other than RPC_URL.
+class Client:
+    def __init__(self, rpc_url: str = RPC_URL, provider=None, async_provider=None):
+        self.rpc_url = rpc_url
+        self.provider = provider
+        self.async_provider = async_provider
+        self._w3 = None
+        self._async_w3 = None
+        self._contracts = {}
+
+    @property
+    def w3(self):
+        if self._w3 is None:
+            from web3 import Web3
+
+            w3 = Web3(self.provider or Web3.HTTPProvider(self.rpc_url))
+            if not w3.is_connected():
+                raise Exception("Failed to connect to Ethereum node")
+            self._w3 = w3
+        return self._w3
+
+    @property
+    def async_w3(self):
+        # AsyncWeb3 for the asyncio tailer, connected on its first request
+        if self._async_w3 is None:
+            from web3 import AsyncWeb3
+
+            self._async_w3 = AsyncWeb3(
+                self.async_provider or AsyncWeb3.AsyncHTTPProvider(self.rpc_url)
+            )
+        return self._async_w3
+
+    def contract(self, address: str, abi_name: str):
+        key = (address.lower(), abi_name)
+        contract = self._contracts.get(key)
+        if contract is None:
+            contract = self.w3.eth.contract(
+                address=self.w3.to_checksum_address(address), abi=load_abi(abi_name)
+            )
+            self._contracts[key] = contract
+        return contract
+
+    def pool(self, address: str = POOL_ADDRESS):
+        return self.contract(address, UNISWAP_V3_POOL_ABI)
+
+    def lens(self, address: str = LENS_ADDRESS):
+        return self.contract(address, UNISWAP_V3_LENS_ABI)
+
+    def quoter(self, address: str = QUOTER_ADDRESS):
+        return self.contract(address, UNISWAP_V3_QUOTER_ABI)
+
+    def multicall(self, address: str = MULTICALL3_ADDRESS):
+        return self.contract(address, MULTICALL3_ABI)
+
+    def __repr__(self):
+        provider = self.provider if self.provider is not None else self.rpc_url
+        return f"Client({provider!r}, connected={self._w3 is not None})"
+
+
+_default_client = None
+
+
+def get_client() -> Client:
+    # the process wide client used when a function is not given one
+    global _default_client
+    if _default_client is None:
+        _default_client = Client()
+    return _default_client
+
+
+def set_client(client: Client) -> None:
+    global _default_client
+    _default_client = client
@@ -0,0 +1,94 @@
+from zora_poc.lens import (
+    CHECKED_KERNEL,
+    FEE,
+    TICK_SPACING,
+    SwapPath,
+    check_sqrt_price_limit,
+    tick_readers,
+)
+from zora_poc.simulator.libraries.Shared import MAX_SQRT_RATIO, MIN_SQRT_RATIO
+
+
+# Cumulative depth of one pool snapshot in one swap direction. Build it once per block
+# and direction, then every quote is a binary search over the prefix sums of the input
+# (exact input) or output (exact output) needed to fully cross each tick range, plus the
+# one computeSwapStep for the partial range where the amount runs out. Results are the
+# same as lens.swap_quote, including the per-step fee rounding, because the steps before
+# that point are exactly the ones swap_quote would run.
+class DepthIndex:
+    def __init__(
+        self,
+        ticks,
+        slot0,
+        liquidity: int,
+        zero_for_one: bool,
+        sqrt_price_limit_x96: int | None = None,
+        tick_index=None,
+        kernel=CHECKED_KERNEL,
+        fee: int = FEE,
+        tick_spacing: int = TICK_SPACING,
+    ):
+        if sqrt_price_limit_x96 is None:
+            sqrt_price_limit_x96 = (
+                MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+            )
+        check_sqrt_price_limit(slot0, zero_for_one, sqrt_price_limit_x96)
+
+        next_initialized, liquidity_net = tick_readers(ticks, tick_index)
+        self.zero_for_one = zero_for_one
+        self.sqrt_price_limit_x96 = sqrt_price_limit_x96
+        self.exact_input_path = SwapPath(
+            next_initialized,
+            liquidity_net,
+            slot0,
+            liquidity,
+            zero_for_one,
+            True,
+            sqrt_price_limit_x96,
+            kernel,
+            fee,
+            tick_spacing,
+        ).build()
+        self.exact_output_path = SwapPath(
+            next_initialized,
+            liquidity_net,
+            slot0,
+            liquidity,
+            zero_for_one,
+            False,
+            sqrt_price_limit_x96,
+            kernel,
+            fee,
+            tick_spacing,
+        ).build()
+
+    def __len__(self):
+        return len(self.exact_input_path.states) - 1
+
+    @property
+    def max_amount_in(self) -> int:
+        # input (fee included) that moves the price all the way to the limit
+        return self.exact_input_path.used[-1]
+
+    @property
+    def max_amount_out(self) -> int:
+        return self.exact_output_path.used[-1]
+
+    def quote(self, amount_specified: int):
+        # Same arguments and return value as lens.swap_quote: positive amounts are exact input,
+        # negative amounts exact output
+        if amount_specified > 0:
+            return self.exact_input_path.quote(amount_specified)
+        return self.exact_output_path.quote(amount_specified)
+
+    def quote_exact_input(self, amount_in: int):
+        return self.quote(amount_in)
+
+    def quote_exact_output(self, amount_out: int):
+        return self.quote(-amount_out)
+
+    def __repr__(self):
+        return (
+            f"DepthIndex(zero_for_one={self.zero_for_one}, steps={len(self)}, "
+            f"max_amount_in={self.max_amount_in}, max_amount_out={self.max_amount_out})"
+        )
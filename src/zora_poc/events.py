@@ -0,0 +1,112 @@
+from typing import NamedTuple
+
+# topic0 of the pool events the ingester follows
+MINT_TOPIC = "0x7a53080ba414158be7ec69b987b5fb7d07dee101fe85488f0853ae16239d0bde"
+BURN_TOPIC = "0x0c396cd989a39f4459b5fa1aed6a9a8dcdbc45908acfd67e028cd568da98982c"
+SWAP_TOPIC = "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67"
+POOL_EVENT_TOPICS = [MINT_TOPIC, BURN_TOPIC, SWAP_TOPIC]
+
+
+class MintEvent(NamedTuple):
+    block_number: int
+    log_index: int
+    tick_lower: int
+    tick_upper: int
+    amount: int
+    amount0: int
+    amount1: int
+
+
+class BurnEvent(NamedTuple):
+    block_number: int
+    log_index: int
+    tick_lower: int
+    tick_upper: int
+    amount: int
+    amount0: int
+    amount1: int
+
+
+class SwapEvent(NamedTuple):
+    block_number: int
+    log_index: int
+    amount0: int
+    amount1: int
+    sqrt_price_x96: int
+    liquidity: int
+    tick: int
+
+
+# Decoders for the fixed layouts of the three events, reading the words straight from
+# the topics and data bytes of a raw log instead of going through the general web3 ABI
+# decoder (ContractEvent.process_log). Indexed int24 ticks are sign extended to a full
+# topic word, so they decode as signed 256 bit integers; the addresses are not decoded.
+#   Mint(address sender, address indexed owner, int24 indexed tickLower,
+#        int24 indexed tickUpper, uint128 amount, uint256 amount0, uint256 amount1)
+#   Burn(address indexed owner, int24 indexed tickLower, int24 indexed tickUpper,
+#        uint128 amount, uint256 amount0, uint256 amount1)
+#   Swap(address indexed sender, address indexed recipient, int256 amount0,
+#        int256 amount1, uint160 sqrtPriceX96, uint128 liquidity, int24 tick)
+def decode_mint(log) -> MintEvent:
+    topics = log["topics"]
+    data = log["data"]
+    return MintEvent(
+        log["blockNumber"],
+        log["logIndex"],
+        int.from_bytes(topics[2], signed=True),
+        int.from_bytes(topics[3], signed=True),
+        int.from_bytes(data[32:64]),
+        int.from_bytes(data[64:96]),
+        int.from_bytes(data[96:128]),
+    )
+
+
+def decode_burn(log) -> BurnEvent:
+    topics = log["topics"]
+    data = log["data"]
+    return BurnEvent(
+        log["blockNumber"],
+        log["logIndex"],
+        int.from_bytes(topics[2], signed=True),
+        int.from_bytes(topics[3], signed=True),
+        int.from_bytes(data[0:32]),
+        int.from_bytes(data[32:64]),
+        int.from_bytes(data[64:96]),
+    )
+
+
+def decode_swap(log) -> SwapEvent:
+    data = log["data"]
+    return SwapEvent(
+        log["blockNumber"],
+        log["logIndex"],
+        int.from_bytes(data[0:32], signed=True),
+        int.from_bytes(data[32:64], signed=True),
+        int.from_bytes(data[64:96]),
+        int.from_bytes(data[96:128]),
+        int.from_bytes(data[128:160], signed=True),
+    )
+
+
+DECODERS = {
+    bytes.fromhex(MINT_TOPIC[2:]): decode_mint,
+    bytes.fromhex(BURN_TOPIC[2:]): decode_burn,
+    bytes.fromhex(SWAP_TOPIC[2:]): decode_swap,
+}
+
+
+def decode_log(log) -> MintEvent | BurnEvent | SwapEvent | None:
+    # None for any other event
+    decoder = DECODERS.get(bytes(log["topics"][0]))
+    return decoder(log) if decoder is not None else None
+
+
+def decode_logs(logs) -> list:
+    # bulk decode_log, skipping other events
+    decoders = DECODERS
+    events = []
+    for log in logs:
+        decoder = decoders.get(bytes(log["topics"][0]))
+        if decoder is not None:
+            events.append(decoder(log))
+    return events
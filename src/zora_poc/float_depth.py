@@ -0,0 +1,154 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+from zora_poc.lens import FEE
+from zora_poc.simulator.libraries import TickMath
+from zora_poc.simulator.libraries.Shared import (
+    FixedPoint96_Q96,
+    MAX_SQRT_RATIO,
+    MIN_SQRT_RATIO,
+    ONE_IN_PIPS,
+)
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for FloatDepth.quote_many
+    np = None
+
+
+EPSILON = 2.0**-52
+
+
+# Floating point depth curve of one pool snapshot in one swap direction, for approximate
+# exact-input quotes. Between two initialized ticks the liquidity L is constant and a swap
+# from sqrt price a to b takes L * (b - a) of token1 and L * (1/a - 1/b) of token0, so the
+# input needed to reach each initialized tick is a prefix sum and a quote is one search
+# plus the closed form partial swap inside the segment where the input runs out.
+#
+# Error bound against lens.swap_quote (same snapshot, default price limit, positive amount):
+#     |amount_out - exact| <= (steps + 16) * 2**-52 * amount_in * p0
+#                             + 4 * (steps + 2) * (1 + p0) + L * 2**-96 * (1 + 1 / s**2) + 1
+# where p0 is the output per unit of input at the starting price, steps the number of
+# segments touched, L the liquidity and s the sqrt price where the swap ends. The first term
+# covers float rounding (every segment amount is computed from an exact integer price
+# difference, so there is no cancellation), the second the wei rounding of amounts and fees
+# per computeSwapStep, the third the Q64.96 rounding of the final price. quote() and
+# quote_many() return this bound with every estimate.
+class FloatDepth:
+    def __init__(
+        self, ticks, slot0, liquidity: int, zero_for_one: bool, fee: int = FEE
+    ):
+        # ticks is a lens_state.TickSnapshot
+        self.zero_for_one = zero_for_one
+        self.fee = fee
+        if zero_for_one:
+            crossed = [t for t in reversed(ticks.ticks) if t <= slot0.tick]
+            limit = MIN_SQRT_RATIO + 1
+        else:
+            crossed = [t for t in ticks.ticks if t > slot0.tick]
+            limit = MAX_SQRT_RATIO - 1
+
+        # Segment k runs from sqrt_prices_x96[k] to sqrt_prices_x96[k + 1] with liquidities[k]
+        sqrt_prices_x96 = [slot0.sqrtPriceX96]
+        liquidities = [liquidity]
+        for tick in crossed:
+            sqrt_price_x96 = TickMath.getSqrtRatioAtTick(tick)
+            if (sqrt_price_x96 <= limit) if zero_for_one else (sqrt_price_x96 >= limit):
+                break
+            sqrt_prices_x96.append(sqrt_price_x96)
+            net = ticks.liquidity_net(tick)
+            liquidities.append(liquidity - net if zero_for_one else liquidity + net)
+            liquidity = liquidities[-1]
+        sqrt_prices_x96.append(limit)
+
+        amounts_in = []
+        amounts_out = []
+        for k, liquidity in enumerate(liquidities):
+            a = sqrt_prices_x96[k]
+            b = sqrt_prices_x96[k + 1]
+            # exact integer difference first, so the float terms carry no cancellation
+            delta = liquidity * (abs(b - a) / FixedPoint96_Q96)
+            amount1 = delta
+            amount0 = delta / ((a / FixedPoint96_Q96) * (b / FixedPoint96_Q96))
+            amounts_in.append(amount0 if zero_for_one else amount1)
+            amounts_out.append(amount1 if zero_for_one else amount0)
+
+        self.sqrt_prices = [p / FixedPoint96_Q96 for p in sqrt_prices_x96]
+        self.liquidities = [float(liquidity) for liquidity in liquidities]
+        self.cumulative_in = [0.0] + list(accumulate(amounts_in))
+        self.cumulative_out = [0.0] + list(accumulate(amounts_out))
+        start = self.sqrt_prices[0]
+        self.start_price = start * start if zero_for_one else 1 / (start * start)
+
+        if np is not None:
+            self._sqrt_prices = np.array(self.sqrt_prices)
+            self._liquidities = np.array(self.liquidities)
+            self._cumulative_in = np.array(self.cumulative_in)
+            self._cumulative_out = np.array(self.cumulative_out)
+
+    def __len__(self):
+        return len(self.liquidities)
+
+    def error_bound(self, amount_in, steps, liquidity, sqrt_price):
+        return (
+            (steps + 16) * EPSILON * amount_in * self.start_price
+            + 4 * (steps + 2) * (1 + self.start_price)
+            + liquidity * 2.0**-96 * (1 + 1 / (sqrt_price * sqrt_price))
+            + 1
+        )
+
+    def quote(self, amount_in: int) -> tuple[float, float, float]:
+        # (approximate amount out, approximate final sqrtPriceX96, error bound of amount out)
+        amount = amount_in * (ONE_IN_PIPS - self.fee) / ONE_IN_PIPS
+        k = bisect_right(self.cumulative_in, amount) - 1
+        if k >= len(self.liquidities):
+            # the input moves the price to the limit
+            sqrt_price = self.sqrt_prices[-1]
+            liquidity = self.liquidities[-1]
+            amount_out = self.cumulative_out[-1]
+        else:
+            remaining = amount - self.cumulative_in[k]
+            liquidity = self.liquidities[k]
+            start = self.sqrt_prices[k]
+            if self.zero_for_one:
+                denominator = liquidity + remaining * start
+                sqrt_price = liquidity * start / denominator
+                amount_out = liquidity * remaining * start * start / denominator
+            else:
+                sqrt_price = start + remaining / liquidity
+                amount_out = remaining / (start * sqrt_price)
+            amount_out += self.cumulative_out[k]
+
+        bound = self.error_bound(amount_in, k + 1, liquidity, sqrt_price)
+        return amount_out, sqrt_price * FixedPoint96_Q96, bound
+
+    def quote_many(self, amounts_in):
+        # Vectorized quote() over an array of input amounts, returns three arrays
+        amounts_in = np.asarray(amounts_in, dtype=np.float64)
+        amounts = amounts_in * ((ONE_IN_PIPS - self.fee) / ONE_IN_PIPS)
+        segments = len(self.liquidities)
+        steps = np.searchsorted(self._cumulative_in, amounts, side="right")
+        exhausted = steps > segments
+        k = np.minimum(steps - 1, segments - 1)
+
+        remaining = amounts - self._cumulative_in[k]
+        liquidity = self._liquidities[k]
+        start = self._sqrt_prices[k]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.zero_for_one:
+                denominator = liquidity + remaining * start
+                sqrt_price = liquidity * start / denominator
+                amount_out = liquidity * remaining * start * start / denominator
+            else:
+                sqrt_price = start + remaining / liquidity
+                amount_out = remaining / (start * sqrt_price)
+        amount_out = np.where(
+            exhausted, self._cumulative_out[-1], amount_out + self._cumulative_out[k]
+        )
+        sqrt_price = np.where(exhausted, self._sqrt_prices[-1], sqrt_price)
+
+        bound = self.error_bound(amounts_in, steps, liquidity, sqrt_price)
+        return amount_out, sqrt_price * FixedPoint96_Q96, bound
+
+    def __repr__(self):
+        return f"FloatDepth(zero_for_one={self.zero_for_one}, segments={len(self)})"
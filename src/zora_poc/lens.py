@@ -1,62 +1,40 @@
-from dataclasses import dataclass
+from bisect import bisect_left
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from itertools import chain
 import math
+import operator
+from typing import Callable
 import time
-from eth_typing import HexStr
-from web3 import Web3
-import json
 
-from zora_poc.lens_state import PoolState, Tick
+from zora_poc.client import POOL_ADDRESS, Client, get_client
+from zora_poc.multicall import aggregate
+from zora_poc.lens_state import PoolState, Tick, TickIndex, TickSnapshot
 from zora_poc.simulator.libraries import (
     FullMath,
     LiquidityMath,
     SafeMath,
     TickMath,
-    Tick as LibTick,
 )
-from zora_poc.simulator.libraries import SwapMath
+from zora_poc.simulator.libraries import SwapMath, UncheckedSwapMath
 from zora_poc.simulator.libraries.Shared import (
     MAX_SQRT_RATIO,
     MIN_SQRT_RATIO,
     FixedPoint128_Q128,
-    checkInputTypes,
+    MAX_INT256,
+    MAX_UINT256,
+    FEE_AMOUNT_TICK_SPACING,
+    ONE_IN_PIPS,
     toUint256,
 )
 
 
-# Configuration
-RPC_URL = "http://base-proxy.lat.nodes.internal.notnotzora.com"
-LENS_ADDRESS = Web3.to_checksum_address("0x3b9eb662131aAFa7703675CD7EdBB215dBC829b4")
-POOL_ADDRESS = Web3.to_checksum_address("0xE020E67Cb76C780329d4c205578Aaa6d6478Fb2A")
-UNISWAP_V3_LENS_ABI_PATH = "src/zora_poc/UniswapV3Lens.json"
-UNISWAP_V3_POOL_ABI_PATH = "src/zora_poc/UniswapV3Pool.json"
-
-# Web3 setup
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
-if not w3.is_connected():
-    raise Exception("Failed to connect to Ethereum node")
-
-# Load Uniswap V3 Pool ABI
-with open(UNISWAP_V3_POOL_ABI_PATH, "r") as abi_file:
-    uniswap_v3_pool_abi = json.load(abi_file)
-
-# Contract setup
-pool_contract = w3.eth.contract(address=POOL_ADDRESS, abi=uniswap_v3_pool_abi)
-
-# Web3 setup
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
-if not w3.is_connected():
-    raise Exception("Failed to connect to Ethereum node")
-
-# Load Uniswap V3 Pool ABI
-with open(UNISWAP_V3_LENS_ABI_PATH, "r") as abi_file:
-    uniswap_v3_lens_abi = json.load(abi_file)
-
-lens_contract = w3.eth.contract(address=LENS_ADDRESS, abi=uniswap_v3_lens_abi)
-
-
-def fetch_all_ticks(name: str, pool_address: HexStr) -> list[Tick]:
+def fetch_all_ticks(
+    name: str, pool_address: str, client: Client | None = None
+) -> list[Tick]:
+    client = client or get_client()
     try:
-        result = lens_contract.functions.getAllTicks(pool_address).call()
+        result = client.lens().functions.getAllTicks(pool_address).call()
         ticks = [Tick(tick[0], tick[1], tick[2]) for tick in result]
         return ticks
     except Exception as e:
@@ -65,18 +43,31 @@ def fetch_all_ticks(name: str, pool_address: HexStr) -> list[Tick]:
 
 
 TICK_BASE = 1.0001
-TICK_SPACING = 200  # 0.01% fee tier
+## fee tier of POOL_ADDRESS, the default of every quote
+FEE = 10000  # 1%
+TICK_SPACING = FEE_AMOUNT_TICK_SPACING[FEE]
 WETH_ADDRESS = "0x4200000000000000000000000000000000000006"
 
 
-def get_liquidity(ticks_net_liquidity_mapping: dict) -> None:
+def get_liquidity(
+    ticks_net_liquidity_mapping: dict,
+    client: Client | None = None,
+    pool_address: str = POOL_ADDRESS,
+    tick_spacing: int = TICK_SPACING,
+) -> None:
     # fetch all the state variables
-    tick_spacing = TICK_SPACING
-    token0 = pool_contract.functions.token0().call()
-    token1 = pool_contract.functions.token1().call()
+    client = client or get_client()
+    pool_contract = client.pool(pool_address)
+    _, (token0, token1, slot0) = aggregate(
+        [
+            pool_contract.functions.token0(),
+            pool_contract.functions.token1(),
+            pool_contract.functions.slot0(),
+        ],
+        client=client,
+    )
     decimals0, decimals1 = 18, 18
 
-    slot0 = pool_contract.functions.slot0().call()
     current_tick = slot0[1]
 
     # calculations
@@ -97,29 +88,25 @@ def get_liquidity(ticks_net_liquidity_mapping: dict) -> None:
     else:
         invert_price = False
 
-    tick = min_tick
-    while tick <= max_tick:
-        liquidity_delta = tick_liquidity_net_mapping.get(tick, 0)
-        liquidity += liquidity_delta
-
-        price = tick_to_price(tick)
-        adjusted_price = price / (10 ** (decimals1 - decimals0))  # 1
-        if invert_price:
-            adjusted_price = 1 / adjusted_price
-
-        # Compute square roots of prices corresponding to the bottom and top ticks
+    # Liquidity only changes at initialized ticks, so the amounts of every span of ranges between
+    # them telescope into a single closed form term
+    for tick, ranges, liquidity in liquidity_spans(
+        ticks_net_liquidity_mapping,
+        min_tick,
+        max_tick,
+        tick_spacing,
+        liquidity,
+        breaks=(current_range_bottom_tick, current_range_bottom_tick + tick_spacing),
+    ):
+        # Square roots of prices at the bottom and top of the span
         bottom_tick = tick
-        top_tick = bottom_tick + tick_spacing
+        top_tick = bottom_tick + ranges * tick_spacing
         sa = tick_to_price(bottom_tick // 2)  # sqrt price of bottom tick
         sb = tick_to_price(top_tick // 2)  # sqrt price of top tick
 
         if tick < current_range_bottom_tick:
-            # Compute the amounts of tokens potentially in the range
-            amount1 = liquidity * (sb - sa)
-            amount0 = amount1 / (sb * sa)
-
             # Only token1 locked
-            total_amount1 += amount1
+            total_amount1 += liquidity * (sb - sa)
 
         elif tick == current_range_bottom_tick:
             # Print the real amounts of the two assets needed to be swapped to move out of the current tick range
@@ -133,14 +120,8 @@ def get_liquidity(ticks_net_liquidity_mapping: dict) -> None:
             total_amount1 += amount1actual
 
         else:
-            # Compute the amounts of tokens potentially in the range
-            amount1 = liquidity * (sb - sa)
-            amount0 = amount1 / (sb * sa)
-
             # Only token0 locked
-            total_amount0 += amount0
-
-        tick += tick_spacing
+            total_amount0 += liquidity * (1 / sa - 1 / sb)
 
     print(
         "In total: {:.2f} {} and {:.2f} {}".format(
@@ -150,21 +131,23 @@ def get_liquidity(ticks_net_liquidity_mapping: dict) -> None:
 
 
 def swap_quote_token0_to_token1(
-    amount_in: int, ticks_net_liquidity_mapping: dict, pool_state: PoolState
+    amount_in: int,
+    ticks_net_liquidity_mapping: dict,
+    pool_state: PoolState,
+    fee: int = FEE,
+    tick_spacing: int = TICK_SPACING,
 ) -> int:
-    tick_spacing = TICK_SPACING
-
     current_tick = pool_state.current_tick
     current_liquidity = pool_state.current_liquidity
 
     max_tick = max(ticks_net_liquidity_mapping.keys())
 
     current_range_bottom_tick = math.floor(current_tick / tick_spacing) * tick_spacing
-    amount_in_remaining = amount_in * (1 - 0.0001)  # 0.01% fee
+    amount_in_remaining = amount_in * (ONE_IN_PIPS - fee) / ONE_IN_PIPS
     total_token1_out = 0
 
     current_sqrt_price = tick_to_price(current_tick / 2)
-    sqrt_price_next = tick_to_price((current_range_bottom_tick + tick_spacing) / 2)
+    sqrt_price_next = sqrt_price_at(current_range_bottom_tick + tick_spacing)
 
     # Partial tick of the current range
     if amount_in_remaining > 0:
@@ -180,98 +163,114 @@ def swap_quote_token0_to_token1(
             return int(total_token1_out)  # Stop early
 
     # Rest of the ticks
-    tick = current_range_bottom_tick + tick_spacing
-    while amount_in_remaining > 0 and tick <= max_tick:
-        liquidity_delta = ticks_net_liquidity_mapping.get(tick, 0)
-        current_liquidity += liquidity_delta
-
-        sqrt_price_current = tick_to_price(tick / 2)
-        sqrt_price_next = tick_to_price((tick + tick_spacing) / 2)
-
-        delta_y = current_liquidity * (sqrt_price_next - sqrt_price_current)
-        delta_x = delta_y / (sqrt_price_next * sqrt_price_current)
-
-        if amount_in_remaining >= delta_x:
-            total_token1_out += delta_y
-            amount_in_remaining -= delta_x
-        else:
-            delta_y_partial = amount_in_remaining * sqrt_price_current * sqrt_price_next
-            total_token1_out += delta_y_partial
-            break
-
-        tick += tick_spacing
+    total_token1_out += swap_token0_in_upward(
+        ticks_net_liquidity_mapping,
+        current_range_bottom_tick + tick_spacing,
+        max_tick,
+        tick_spacing,
+        current_liquidity,
+        amount_in_remaining,
+    )
 
     return int(total_token1_out)
 
 
-def fetch_pool_state() -> PoolState:
+def fetch_pool_state(client: Client | None = None) -> PoolState:
+    client = client or get_client()
+    pool_contract = client.pool()
     try:
-        slot0 = pool_contract.functions.slot0().call()
+        # slot0 and liquidity of the same block, in one round trip
+        _, (slot0, current_liquidity) = aggregate(
+            [pool_contract.functions.slot0(), pool_contract.functions.liquidity()],
+            client=client,
+        )
         current_tick = slot0[1]
-        current_liquidity = pool_contract.functions.liquidity().call()
         return PoolState(current_tick, current_liquidity)
     except Exception as e:
         print(f"Error fetching pool state: {e}")
         return PoolState(0, 0)
 
 
+def fetch_pool_snapshot(
+    pool_address: str = POOL_ADDRESS,
+    block_identifier="latest",
+    client: Client | None = None,
+) -> "PoolSnapshot":
+    # Everything swap_quote needs, read at one block in one eth_call: tokens, fee, tick
+    # spacing, slot0, liquidity and all initialized ticks through the lens
+    client = client or get_client()
+    pool_contract = client.pool(pool_address)
+    block_number, results = aggregate(
+        [
+            pool_contract.functions.token0(),
+            pool_contract.functions.token1(),
+            pool_contract.functions.fee(),
+            pool_contract.functions.tickSpacing(),
+            pool_contract.functions.slot0(),
+            pool_contract.functions.liquidity(),
+            client.lens().functions.getAllTicks(pool_contract.address),
+        ],
+        block_identifier,
+        client,
+    )
+    token0, token1, fee, tick_spacing, slot0, liquidity, ticks = results
+    initialized_ticks = tuple(Tick(*tick) for tick in ticks)
+    return PoolSnapshot(
+        block_number=block_number,
+        pool_address=pool_contract.address,
+        token0=token0,
+        token1=token1,
+        slot0=Slot0(slot0[0], slot0[1]),
+        liquidity=liquidity,
+        ticks=TickSnapshot.from_ticks(initialized_ticks),
+        initialized_ticks=initialized_ticks,
+        fee=fee,
+        tick_spacing=tick_spacing,
+    )
+
+
 def swap_quote_token0_to_token1_2(
-    amount_in: int, ticks_net_liquidity_mapping: dict, pool_state: PoolState
+    amount_in: int,
+    ticks_net_liquidity_mapping: dict,
+    pool_state: PoolState,
+    tick_spacing: int = TICK_SPACING,
 ) -> int:
-    tick_spacing = TICK_SPACING
     current_tick = pool_state.current_tick
     current_liquidity = pool_state.current_liquidity
 
     max_tick = max(ticks_net_liquidity_mapping.keys())
 
     current_range_bottom_tick = math.floor(current_tick / tick_spacing) * tick_spacing
-    amount_in_remaining = amount_in
-    total_token1_out = 0
-    tick = current_range_bottom_tick
-
-    while amount_in_remaining > 0 and tick <= max_tick:
-        liquidity_delta = ticks_net_liquidity_mapping.get(tick, 0)
-        current_liquidity += liquidity_delta
-
-        bottom_tick = tick
-        top_tick = bottom_tick + tick_spacing
-        sqrt_price_current = tick_to_price(bottom_tick / 2)
-        sqrt_price_next = tick_to_price(top_tick / 2)
-
-        # Compute how much token0 we need to move to the next tick
-        delta_y = current_liquidity * (sqrt_price_next - sqrt_price_current)
-        delta_x = delta_y / (sqrt_price_next * sqrt_price_current)
-
-        if amount_in_remaining >= delta_x:
-            # If we have enough token0 to swap fully in this range
-            total_token1_out += delta_y
-            amount_in_remaining -= delta_x
-        else:
-            # If not, calculate partial swap based on remaining token0
-            delta_y_partial = amount_in_remaining * sqrt_price_current * sqrt_price_next
-            total_token1_out += delta_y_partial
-            break  # Stop as we've used up all input
-
-        tick += tick_spacing
+    total_token1_out = swap_token0_in_upward(
+        ticks_net_liquidity_mapping,
+        current_range_bottom_tick,
+        max_tick,
+        tick_spacing,
+        current_liquidity,
+        amount_in,
+    )
 
     return int(total_token1_out)
 
 
 def swap_quote_token1_to_token0(
-    amount_in: int, ticks_net_liquidity_mapping: dict, pool_state: PoolState
+    amount_in: int,
+    ticks_net_liquidity_mapping: dict,
+    pool_state: PoolState,
+    fee: int = FEE,
+    tick_spacing: int = TICK_SPACING,
 ) -> int:
-    tick_spacing = TICK_SPACING
     current_tick = pool_state.current_tick
     current_liquidity = pool_state.current_liquidity
 
     min_tick = min(ticks_net_liquidity_mapping.keys())
 
     current_range_bottom_tick = math.floor(current_tick / tick_spacing) * tick_spacing
-    amount_in_remaining = amount_in * (1 - 0.0001)  # 0.01% fee
+    amount_in_remaining = amount_in * (ONE_IN_PIPS - fee) / ONE_IN_PIPS
     total_token0_out = 0
 
     current_sqrt_price = tick_to_price(current_tick / 2)
-    sqrt_price_previous = tick_to_price(current_range_bottom_tick / 2)
+    sqrt_price_previous = sqrt_price_at(current_range_bottom_tick)
 
     # Partial tick of the current range
     if amount_in_remaining > 0:
@@ -289,79 +288,182 @@ def swap_quote_token1_to_token0(
             return int(total_token0_out)  # Stop early
 
     # Rest of the ticks
-    tick = current_range_bottom_tick
-    while amount_in_remaining > 0 and tick >= min_tick:
-        liquidity_delta = ticks_net_liquidity_mapping.get(tick, 0)
-        current_liquidity += liquidity_delta
-
-        sqrt_price_current = tick_to_price(tick / 2)
-        sqrt_price_previous = tick_to_price((tick - tick_spacing) / 2)
-
-        delta_x = current_liquidity * (1 / sqrt_price_previous - 1 / sqrt_price_current)
-        delta_y = delta_x * sqrt_price_current * sqrt_price_previous
-
-        if amount_in_remaining >= delta_y:
-            total_token0_out += delta_x
-            amount_in_remaining -= delta_y
-        else:
-            delta_x_partial = amount_in_remaining / (
-                sqrt_price_current * sqrt_price_previous
-            )
-            total_token0_out += delta_x_partial
-            break
-
-        tick -= tick_spacing
+    total_token0_out += swap_token1_in_downward(
+        ticks_net_liquidity_mapping,
+        current_range_bottom_tick,
+        min_tick,
+        tick_spacing,
+        current_liquidity,
+        amount_in_remaining,
+    )
 
     return int(total_token0_out)
 
 
 def swap_quote_token1_to_token0_2(
-    amount_in: int, ticks_net_liquidity_mapping: dict, pool_state: PoolState
+    amount_in: int,
+    ticks_net_liquidity_mapping: dict,
+    pool_state: PoolState,
+    tick_spacing: int = TICK_SPACING,
 ) -> int:
-    tick_spacing = TICK_SPACING
-
     current_tick = pool_state.current_tick
     current_liquidity = pool_state.current_liquidity
 
     min_tick = min(ticks_net_liquidity_mapping.keys())
 
     current_range_bottom_tick = math.floor(current_tick / tick_spacing) * tick_spacing
-    amount_in_remaining = amount_in
-    total_token0_out = 0
-    tick = current_range_bottom_tick
+    total_token0_out = swap_token1_in_downward(
+        ticks_net_liquidity_mapping,
+        current_range_bottom_tick,
+        min_tick,
+        tick_spacing,
+        current_liquidity,
+        amount_in,
+    )
+
+    return int(total_token0_out)
 
-    while amount_in_remaining > 0 and tick >= min_tick:
-        liquidity_delta = ticks_net_liquidity_mapping.get(tick, 0)
-        current_liquidity += liquidity_delta
 
-        top_tick = tick
-        bottom_tick = top_tick - tick_spacing
-        sqrt_price_current = tick_to_price(top_tick / 2)
-        sqrt_price_next = tick_to_price(bottom_tick / 2)
+def tick_to_price(tick):
+    return TICK_BASE**tick
 
-        # Compute how much token1 is required to move to the next tick
-        delta_x = current_liquidity * (1 / sqrt_price_next - 1 / sqrt_price_current)
-        delta_y = delta_x * sqrt_price_current * sqrt_price_next
 
-        if amount_in_remaining >= delta_y:
-            # If we have enough token1 to swap fully in this range
-            total_token0_out += delta_x
-            amount_in_remaining -= delta_y
-        else:
-            # If not, calculate partial swap based on remaining token1
-            delta_x_partial = amount_in_remaining / (
-                sqrt_price_current * sqrt_price_next
-            )
-            total_token0_out += delta_x_partial
-            break  # Stop as we've used up all input
+# sqrt price of a tick for the float quotes, a table filled on first use
+@lru_cache(maxsize=65536)
+def sqrt_price_at(tick: int) -> float:
+    return tick_to_price(tick / 2)
 
-        tick -= tick_spacing
 
-    return int(total_token0_out)
+def liquidity_spans(
+    ticks_net_liquidity_mapping: dict,
+    first_tick: int,
+    last_tick: int,
+    tick_step: int,
+    liquidity,
+    breaks=(),
+):
+    # Walks first_tick, first_tick + tick_step, ... up to last_tick (tick_step is negative to
+    # walk down) adding the net liquidity of every tick on the way, and yields
+    # (tick, ranges, liquidity) for each run of `ranges` grid ticks starting at `tick` over
+    # which the liquidity stays the same. Ticks in breaks start a new run as well.
+    count = (last_tick - first_tick) // tick_step + 1
+    if count <= 0:
+        return
+    starts = {first_tick}
+    for tick in chain(ticks_net_liquidity_mapping, breaks):
+        (i, r) = divmod(tick - first_tick, tick_step)
+        if r == 0 and 0 <= i < count:
+            starts.add(tick)
+    starts = sorted(starts, reverse=tick_step < 0)
+    for tick, next_start in zip(starts, starts[1:] + [first_tick + count * tick_step]):
+        liquidity += ticks_net_liquidity_mapping.get(tick, 0)
+        yield tick, (next_start - tick) // tick_step, liquidity
+
+
+def swap_token0_in_upward(
+    ticks_net_liquidity_mapping: dict,
+    tick: int,
+    max_tick: int,
+    tick_spacing: int,
+    liquidity,
+    amount_in_remaining,
+) -> float:
+    # Token1 received for token0 over the ranges [t, t + tick_spacing] for t = tick, ... max_tick,
+    # one span of constant liquidity at a time. Over a span the per-range amounts telescope:
+    # token0 needed is L * (1 / sqrt(p_start) - 1 / sqrt(p_end)) and token1 out is
+    # L * (sqrt(p_end) - sqrt(p_start)).
+    total_token1_out = 0
+    for start, ranges, liquidity in liquidity_spans(
+        ticks_net_liquidity_mapping, tick, max_tick, tick_spacing, liquidity
+    ):
+        if amount_in_remaining <= 0:
+            break
+        sqrt_price_start = sqrt_price_at(start)
+        sqrt_price_end = sqrt_price_at(start + ranges * tick_spacing)
+        delta_x = liquidity * (1 / sqrt_price_start - 1 / sqrt_price_end)
 
+        if amount_in_remaining >= delta_x:
+            total_token1_out += liquidity * (sqrt_price_end - sqrt_price_start)
+            amount_in_remaining -= delta_x
+            continue
+
+        # Input runs out inside the span: find the last range it still fully crosses
+        bound = 1 / sqrt_price_start - amount_in_remaining / liquidity
+        full = math.floor((-2 * math.log(bound, TICK_BASE) - start) / tick_spacing)
+        full = min(max(full, 0), ranges - 1)
+        while full > 0 and liquidity * (
+            1 / sqrt_price_start - 1 / tick_to_price((start + full * tick_spacing) / 2)
+        ) > amount_in_remaining:
+            full -= 1
+        while full < ranges - 1 and liquidity * (
+            1 / sqrt_price_start
+            - 1 / tick_to_price((start + (full + 1) * tick_spacing) / 2)
+        ) <= amount_in_remaining:
+            full += 1
+
+        sqrt_price_current = tick_to_price((start + full * tick_spacing) / 2)
+        sqrt_price_next = tick_to_price((start + (full + 1) * tick_spacing) / 2)
+        total_token1_out += liquidity * (sqrt_price_current - sqrt_price_start)
+        amount_in_remaining -= liquidity * (1 / sqrt_price_start - 1 / sqrt_price_current)
+
+        delta_y_partial = amount_in_remaining * sqrt_price_current * sqrt_price_next
+        total_token1_out += delta_y_partial
+        break
+
+    return total_token1_out
+
+
+def swap_token1_in_downward(
+    ticks_net_liquidity_mapping: dict,
+    tick: int,
+    min_tick: int,
+    tick_spacing: int,
+    liquidity,
+    amount_in_remaining,
+) -> float:
+    # Token0 received for token1 over the ranges [t - tick_spacing, t] for t = tick, ... min_tick,
+    # one span of constant liquidity at a time. Over a span token1 needed is
+    # L * (sqrt(p_start) - sqrt(p_end)) and token0 out is L * (1 / sqrt(p_end) - 1 / sqrt(p_start)).
+    total_token0_out = 0
+    for start, ranges, liquidity in liquidity_spans(
+        ticks_net_liquidity_mapping, tick, min_tick, -tick_spacing, liquidity
+    ):
+        if amount_in_remaining <= 0:
+            break
+        sqrt_price_start = sqrt_price_at(start)
+        sqrt_price_end = sqrt_price_at(start - ranges * tick_spacing)
+        delta_y = liquidity * (sqrt_price_start - sqrt_price_end)
 
-def tick_to_price(tick):
-    return TICK_BASE**tick
+        if amount_in_remaining >= delta_y:
+            total_token0_out += liquidity * (1 / sqrt_price_end - 1 / sqrt_price_start)
+            amount_in_remaining -= delta_y
+            continue
+
+        # Input runs out inside the span: find the last range it still fully crosses
+        bound = sqrt_price_start - amount_in_remaining / liquidity
+        full = math.floor((start - 2 * math.log(bound, TICK_BASE)) / tick_spacing)
+        full = min(max(full, 0), ranges - 1)
+        while full > 0 and liquidity * (
+            sqrt_price_start - tick_to_price((start - full * tick_spacing) / 2)
+        ) > amount_in_remaining:
+            full -= 1
+        while full < ranges - 1 and liquidity * (
+            sqrt_price_start - tick_to_price((start - (full + 1) * tick_spacing) / 2)
+        ) <= amount_in_remaining:
+            full += 1
+
+        sqrt_price_current = tick_to_price((start - full * tick_spacing) / 2)
+        sqrt_price_previous = tick_to_price((start - (full + 1) * tick_spacing) / 2)
+        total_token0_out += liquidity * (1 / sqrt_price_current - 1 / sqrt_price_start)
+        amount_in_remaining -= liquidity * (sqrt_price_start - sqrt_price_current)
+
+        delta_x_partial = amount_in_remaining / (
+            sqrt_price_current * sqrt_price_previous
+        )
+        total_token0_out += delta_x_partial
+        break
+
+    return total_token0_out
 
 
 @dataclass
@@ -413,48 +515,57 @@ class Slot0:
     tick: int
 
 
-def nextTick(ticks, tick, lte):
-    checkInputTypes(int24=(tick), bool=(lte))
-
-    keyList = list(ticks)
-
-    # If tick doesn't exist in the mapping we fake it (easier than searching for nearest value). This is probably not the
-    # best way, but it is a simple and intuitive way to reproduce the behaviour of the logic.
-    if not ticks.__contains__(tick):
-        keyList += [tick]
-    sortedKeyList = sorted(keyList)
-    indexCurrentTick = sortedKeyList.index(tick)
-
-    if lte:
-        # If the current tick is initialized (not faked), we return the current tick
-        if ticks.__contains__(tick):
-            return tick, True
-        elif indexCurrentTick == 0:
-            # No tick to the left
-            return TickMath.MIN_TICK, False
-        else:
-            nextTick = sortedKeyList[indexCurrentTick - 1]
-    else:
-
-        if indexCurrentTick == len(sortedKeyList) - 1:
-            # No tick to the right
-            return TickMath.MAX_TICK, False
-        nextTick = sortedKeyList[indexCurrentTick + 1]
-
-    # Return tick within the boundaries
-    return nextTick, True
+## pool state read at a single block by fetch_pool_snapshot
+@dataclass(frozen=True)
+class PoolSnapshot:
+    block_number: int
+    pool_address: str
+    token0: str
+    token1: str
+    slot0: Slot0
+    liquidity: int
+    ticks: TickSnapshot
+    ## the lens rows behind ticks, with liquidityGross
+    initialized_ticks: tuple[Tick, ...] = ()
+    fee: int = FEE
+    tick_spacing: int = TICK_SPACING
+
+    def pool_state(self) -> PoolState:
+        return PoolState(self.slot0.tick, self.liquidity)
+
+
+## the arithmetic used by swap_quote. CHECKED_KERNEL is the Solidity-faithful reference with type and
+## overflow checks on every call, UNCHECKED_KERNEL performs the same integer operations without them
+@dataclass(frozen=True)
+class SwapKernel:
+    computeSwapStep: Callable
+    addInts: Callable
+    subInts: Callable
+    mulDiv: Callable
+    toUint256: Callable
+    addDelta: Callable
+
+
+CHECKED_KERNEL = SwapKernel(
+    computeSwapStep=SwapMath.computeSwapStep,
+    addInts=SafeMath.addInts,
+    subInts=SafeMath.subInts,
+    mulDiv=FullMath.mulDiv,
+    toUint256=toUint256,
+    addDelta=LiquidityMath.addDelta,
+)
 
+UNCHECKED_KERNEL = SwapKernel(
+    computeSwapStep=UncheckedSwapMath.computeSwapStep,
+    addInts=operator.add,
+    subInts=operator.sub,
+    mulDiv=lambda a, b, c: a * b // c,
+    toUint256=lambda x: x & MAX_UINT256,
+    addDelta=operator.add,
+)
 
-def swap_quote(
-    ticks,
-    slot0,
-    liquidity,
-    zero_for_one,
-    amount_specified,
-    sqrt_price_limit_x96,
-):
-    assert amount_specified != 0, "AS"
 
+def check_sqrt_price_limit(slot0, zero_for_one, sqrt_price_limit_x96):
     if zero_for_one:
         assert (
             sqrt_price_limit_x96 < slot0.sqrtPriceX96
@@ -466,98 +577,140 @@ def swap_quote(
             and sqrt_price_limit_x96 < TickMath.MAX_SQRT_RATIO
         ), "SPL"
 
-    cache = SwapCache(liquidity)
 
-    exactInput = amount_specified > 0
+def tick_readers(ticks, tick_index=None):
+    # The quote only ever reads the ticks: the next initialized tick in the swap direction and its
+    # liquidityNet. Tick.cross is deliberately not called, its fee growth bookkeeping would write into
+    # the shared ticks and the quote does not use it.
+    # TickSnapshot, tick_window.WindowedTicks
+    if hasattr(ticks, "next_initialized"):
+        return ticks.next_initialized, ticks.liquidity_net
 
-    state = SwapState(
-        amountSpecifiedRemaining=amount_specified,
-        amountCalculated=0,
-        sqrtPriceX96=slot0.sqrtPriceX96,
-        tick=slot0.tick,
-        feeGrowthGlobalX128=0,
-        liquidity=cache.liquidityStart,
-    )
+    # A persistent index maintained by the caller avoids rebuilding it per quote
+    if tick_index is None:
+        tick_index = TickIndex(ticks)
 
-    while (
-        state.amountSpecifiedRemaining != 0
-        and state.sqrtPriceX96 != sqrt_price_limit_x96
-    ):
-        step = StepComputations(0, 0, 0, 0, 0, 0, 0)
-        step.sqrtPriceStartX96 = state.sqrtPriceX96
+    def liquidity_net(tick):
+        return ticks[tick].liquidityNet
 
-        (step.tickNext, step.initialized) = nextTick(ticks, state.tick, zero_for_one)
+    return tick_index.next_initialized, liquidity_net
 
-        ## get the price for the next tick
-        step.sqrtPriceNextX96 = TickMath.getSqrtRatioAtTick(step.tickNext)
 
-        ## compute values to swap to the target tick, price limit, or point where input#output amount is exhausted
-        if zero_for_one:
-            sqrtRatioTargetX96 = (
-                sqrt_price_limit_x96
-                if step.sqrtPriceNextX96 < sqrt_price_limit_x96
-                else step.sqrtPriceNextX96
-            )
-        else:
-            sqrtRatioTargetX96 = (
-                sqrt_price_limit_x96
-                if step.sqrtPriceNextX96 > sqrt_price_limit_x96
-                else step.sqrtPriceNextX96
-            )
+## one iteration of the swap loop, applied to state in place
+def swap_step(
+    state,
+    next_initialized,
+    liquidity_net,
+    zero_for_one,
+    exactInput,
+    sqrt_price_limit_x96,
+    kernel,
+    fee=FEE,
+    tick_spacing=TICK_SPACING,
+):
+    step = StepComputations(0, 0, 0, 0, 0, 0, 0)
+    step.sqrtPriceStartX96 = state.sqrtPriceX96
+
+    (step.tickNext, step.initialized) = next_initialized(state.tick, zero_for_one)
+
+    ## get the price for the next tick
+    step.sqrtPriceNextX96 = TickMath.getSqrtRatioAtTickCached(
+        step.tickNext, tick_spacing
+    )
 
-        (
-            state.sqrtPriceX96,
-            step.amountIn,
-            step.amountOut,
-            step.feeAmount,
-        ) = SwapMath.computeSwapStep(
-            state.sqrtPriceX96,
-            sqrtRatioTargetX96,
-            state.liquidity,
-            state.amountSpecifiedRemaining,
-            10000,
+    ## compute values to swap to the target tick, price limit, or point where input#output amount is exhausted
+    if zero_for_one:
+        sqrtRatioTargetX96 = (
+            sqrt_price_limit_x96
+            if step.sqrtPriceNextX96 < sqrt_price_limit_x96
+            else step.sqrtPriceNextX96
+        )
+    else:
+        sqrtRatioTargetX96 = (
+            sqrt_price_limit_x96
+            if step.sqrtPriceNextX96 > sqrt_price_limit_x96
+            else step.sqrtPriceNextX96
         )
-        if exactInput:
-            state.amountSpecifiedRemaining -= step.amountIn + step.feeAmount
-            state.amountCalculated = SafeMath.subInts(
-                state.amountCalculated, step.amountOut
-            )
-        else:
-            state.amountSpecifiedRemaining += step.amountOut
-            state.amountCalculated = SafeMath.addInts(
-                state.amountCalculated, step.amountIn + step.feeAmount
-            )
 
-        ## update global fee tracker
-        if state.liquidity > 0:
-            state.feeGrowthGlobalX128 += FullMath.mulDiv(
-                step.feeAmount, FixedPoint128_Q128, state.liquidity
-            )
-            # Addition can overflow in Solidity - mimic it
-            state.feeGrowthGlobalX128 = toUint256(state.feeGrowthGlobalX128)
-
-        ## shift tick if we reached the next price
-        if state.sqrtPriceX96 == step.sqrtPriceNextX96:
-            ## if the tick is initialized, run the tick transition
-            ## @dev: here is where we should handle the case of an uninitialized boundary tick
-            if step.initialized:
-                liquidityNet = LibTick.cross(
-                    ticks,
-                    step.tickNext,
-                    0,
-                    0,
-                )
-                ## if we're moving leftward, we interpret liquidityNet as the opposite sign
-                ## safe because liquidityNet cannot be type(int128).min
-                if zero_for_one:
-                    liquidityNet = -liquidityNet
-
-                state.liquidity = LiquidityMath.addDelta(state.liquidity, liquidityNet)
-
-            state.tick = (step.tickNext - 1) if zero_for_one else step.tickNext
-        elif state.sqrtPriceX96 != step.sqrtPriceStartX96:
-            ## recompute unless we're on a lower tick boundary (i.e. already transitioned ticks), and haven't moved
-            state.tick = TickMath.getTickAtSqrtRatio(state.sqrtPriceX96)
+    (
+        state.sqrtPriceX96,
+        step.amountIn,
+        step.amountOut,
+        step.feeAmount,
+    ) = kernel.computeSwapStep(
+        state.sqrtPriceX96,
+        sqrtRatioTargetX96,
+        state.liquidity,
+        state.amountSpecifiedRemaining,
+        fee,
+    )
+    if exactInput:
+        state.amountSpecifiedRemaining -= step.amountIn + step.feeAmount
+        state.amountCalculated = kernel.subInts(state.amountCalculated, step.amountOut)
+    else:
+        state.amountSpecifiedRemaining += step.amountOut
+        state.amountCalculated = kernel.addInts(
+            state.amountCalculated, step.amountIn + step.feeAmount
+        )
+
+    ## update global fee tracker
+    if state.liquidity > 0:
+        state.feeGrowthGlobalX128 += kernel.mulDiv(
+            step.feeAmount, FixedPoint128_Q128, state.liquidity
+        )
+        # Addition can overflow in Solidity - mimic it
+        state.feeGrowthGlobalX128 = kernel.toUint256(state.feeGrowthGlobalX128)
+
+    ## shift tick if we reached the next price
+    if state.sqrtPriceX96 == step.sqrtPriceNextX96:
+        ## if the tick is initialized, run the tick transition
+        ## @dev: here is where we should handle the case of an uninitialized boundary tick
+        if step.initialized:
+            liquidityNet = liquidity_net(step.tickNext)
+            ## if we're moving leftward, we interpret liquidityNet as the opposite sign
+            ## safe because liquidityNet cannot be type(int128).min
+            if zero_for_one:
+                liquidityNet = -liquidityNet
+
+            state.liquidity = kernel.addDelta(state.liquidity, liquidityNet)
+
+        state.tick = (step.tickNext - 1) if zero_for_one else step.tickNext
+    elif state.sqrtPriceX96 != step.sqrtPriceStartX96:
+        ## recompute unless we're on a lower tick boundary (i.e. already transitioned ticks), and haven't moved
+        state.tick = TickMath.getTickAtSqrtRatioFast(state.sqrtPriceX96)
+
+    return step
+
+
+## runs the swap loop from state until the amount is used up or the price limit is reached
+def run_swap(
+    state,
+    next_initialized,
+    liquidity_net,
+    zero_for_one,
+    amount_specified,
+    sqrt_price_limit_x96,
+    kernel,
+    fee=FEE,
+    tick_spacing=TICK_SPACING,
+):
+    exactInput = amount_specified > 0
+
+    while (
+        state.amountSpecifiedRemaining != 0
+        and state.sqrtPriceX96 != sqrt_price_limit_x96
+    ):
+        swap_step(
+            state,
+            next_initialized,
+            liquidity_net,
+            zero_for_one,
+            exactInput,
+            sqrt_price_limit_x96,
+            kernel,
+            fee,
+            tick_spacing,
+        )
 
     (amount0, amount1) = (
         (amount_specified - state.amountSpecifiedRemaining, state.amountCalculated)
@@ -577,32 +730,209 @@ def swap_quote(
     )
 
 
+def swap_quote(
+    ticks,
+    slot0,
+    liquidity,
+    zero_for_one,
+    amount_specified,
+    sqrt_price_limit_x96,
+    tick_index=None,
+    kernel=CHECKED_KERNEL,
+    fee=FEE,
+    tick_spacing=TICK_SPACING,
+):
+    assert amount_specified != 0, "AS"
+    check_sqrt_price_limit(slot0, zero_for_one, sqrt_price_limit_x96)
+
+    next_initialized, liquidity_net = tick_readers(ticks, tick_index)
+
+    cache = SwapCache(liquidity)
+
+    state = SwapState(
+        amountSpecifiedRemaining=amount_specified,
+        amountCalculated=0,
+        sqrtPriceX96=slot0.sqrtPriceX96,
+        tick=slot0.tick,
+        feeGrowthGlobalX128=0,
+        liquidity=cache.liquidityStart,
+    )
+
+    return run_swap(
+        state,
+        next_initialized,
+        liquidity_net,
+        zero_for_one,
+        amount_specified,
+        sqrt_price_limit_x96,
+        kernel,
+        fee,
+        tick_spacing,
+    )
+
+
+# Checkpoints of one swap from slot0 that never runs out of amount: state k is the swap
+# state after fully crossing k steps (tick ranges). The swap loop of an amount only
+# depends on the price, tick and liquidity it reaches, and a step is fully crossed by
+# every amount of at least used[k] = the input (exact input) or output (exact output)
+# consumed by the first k steps. So the quote for any amount of the same sign resumes at
+# its last fully crossed checkpoint and only runs the remaining partial step there.
+class SwapPath:
+    def __init__(
+        self,
+        next_initialized,
+        liquidity_net,
+        slot0,
+        liquidity,
+        zero_for_one,
+        exact_input,
+        sqrt_price_limit_x96,
+        kernel=CHECKED_KERNEL,
+        fee=FEE,
+        tick_spacing=TICK_SPACING,
+    ):
+        self.next_initialized = next_initialized
+        self.liquidity_net = liquidity_net
+        self.zero_for_one = zero_for_one
+        self.exact_input = exact_input
+        self.sqrt_price_limit_x96 = sqrt_price_limit_x96
+        self.kernel = kernel
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        # |amount| large enough to cross every step up to the price limit
+        self.unbounded = MAX_INT256 if exact_input else -MAX_INT256
+        self.states = [
+            SwapState(
+                amountSpecifiedRemaining=self.unbounded,
+                amountCalculated=0,
+                sqrtPriceX96=slot0.sqrtPriceX96,
+                tick=slot0.tick,
+                feeGrowthGlobalX128=0,
+                liquidity=liquidity,
+            )
+        ]
+        self.used = [0]
+        self.complete = False
+
+    def extend(self) -> bool:
+        # Adds the next checkpoint, returns False once the price limit is reached
+        if self.complete:
+            return False
+        state = replace(self.states[-1])
+        if state.sqrtPriceX96 == self.sqrt_price_limit_x96:
+            self.complete = True
+            return False
+        swap_step(
+            state,
+            self.next_initialized,
+            self.liquidity_net,
+            self.zero_for_one,
+            self.exact_input,
+            self.sqrt_price_limit_x96,
+            self.kernel,
+            self.fee,
+            self.tick_spacing,
+        )
+        self.states.append(state)
+        self.used.append(MAX_INT256 - abs(state.amountSpecifiedRemaining))
+        return True
+
+    def build(self) -> "SwapPath":
+        while self.extend():
+            pass
+        return self
+
+    def checkpoint(self, size: int) -> int:
+        # Index of the last checkpoint an amount of abs value size fully crosses to. A step
+        # with nothing left to swap is not entered, hence the first of equal used values.
+        i = bisect_left(self.used, size)
+        return i if i < len(self.used) and self.used[i] == size else i - 1
+
+    def quote(self, amount_specified):
+        assert amount_specified != 0, "AS"
+        assert (amount_specified > 0) == self.exact_input
+        size = abs(amount_specified)
+        while self.used[-1] < size and self.extend():
+            pass
+
+        state = replace(self.states[self.checkpoint(size)])
+        state.amountSpecifiedRemaining += amount_specified - self.unbounded
+        return run_swap(
+            state,
+            self.next_initialized,
+            self.liquidity_net,
+            self.zero_for_one,
+            amount_specified,
+            self.sqrt_price_limit_x96,
+            self.kernel,
+            self.fee,
+            self.tick_spacing,
+        )
+
+
+def swap_quote_many(
+    ticks,
+    slot0,
+    liquidity,
+    zero_for_one,
+    amounts,
+    sqrt_price_limit_x96=None,
+    tick_index=None,
+    kernel=CHECKED_KERNEL,
+    fee=FEE,
+    tick_spacing=TICK_SPACING,
+):
+    # Quote ladder: same results as one swap_quote per amount, but the ticks are walked
+    # once per sign of amount, plus the final partial step of every amount
+    if sqrt_price_limit_x96 is None:
+        sqrt_price_limit_x96 = (
+            MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+        )
+    check_sqrt_price_limit(slot0, zero_for_one, sqrt_price_limit_x96)
+
+    next_initialized, liquidity_net = tick_readers(ticks, tick_index)
+    paths = {}
+    results = [None] * len(amounts)
+    for i in sorted(range(len(amounts)), key=lambda i: abs(amounts[i])):
+        exact_input = amounts[i] > 0
+        if exact_input not in paths:
+            paths[exact_input] = SwapPath(
+                next_initialized,
+                liquidity_net,
+                slot0,
+                liquidity,
+                zero_for_one,
+                exact_input,
+                sqrt_price_limit_x96,
+                kernel,
+                fee,
+                tick_spacing,
+            )
+        results[i] = paths[exact_input].quote(amounts[i])
+    return results
+
+
 if __name__ == "__main__":
     start_time = time.time()
-    ticks = fetch_all_ticks("WETH-Bowling", POOL_ADDRESS)
-    print(f"Fetched {len(ticks)} ticks")
-    for tick in ticks:
-        print(tick)
-    tick_mapping = {tick.tick_index: tick for tick in ticks}
+    snapshot = fetch_pool_snapshot(POOL_ADDRESS)
+    tick_snapshot = snapshot.ticks
+    print(f"Fetched {len(tick_snapshot)} ticks at block {snapshot.block_number}")
+    for tick, liquidity_net in zip(tick_snapshot.ticks, tick_snapshot.liquidity_nets):
+        print(tick, liquidity_net)
     end_time = time.time()
     print(f"Execution time: {end_time - start_time} seconds")
 
-    token0 = pool_contract.functions.token0().call()
-    token1 = pool_contract.functions.token1().call()
+    token0 = snapshot.token0
+    token1 = snapshot.token1
     print(f"Token0: {token0}, Token1: {token1}")
     decimals0 = 18
     decimals1 = 18
     print(f"Decimals0: {decimals0}, Decimals1: {decimals1}")
 
-    start_time = time.time()
-    slot0_start_resp = pool_contract.functions.slot0().call()
-    slot0_start = Slot0(slot0_start_resp[0], slot0_start_resp[1])
-
-    liquidity = pool_contract.functions.liquidity().call()
-    end_time = time.time()
-    print(f"Execution time: {end_time - start_time} seconds")
+    slot0_start = snapshot.slot0
+    liquidity_start = snapshot.liquidity
     print(f"Slot0: {slot0_start.sqrtPriceX96}, {slot0_start.tick}")
-    print(f"Liquidity: {liquidity}")
+    print(f"Liquidity: {liquidity_start}")
 
     start_time = time.time()
     (
@@ -612,7 +942,12 @@ if __name__ == "__main__":
         liquidity,
         tick,
     ) = swap_quote(
-        tick_mapping, slot0_start, liquidity, True, 5 * 10**17, MIN_SQRT_RATIO + 1
+        tick_snapshot,
+        slot0_start,
+        liquidity_start,
+        True,
+        5 * 10**17,
+        MIN_SQRT_RATIO + 1,
     )
     print(f"Amount0: {amount0/10**decimals0}, Amount1: {amount1/10**decimals1}")
     print(f"SqrtPriceX96: {sqrtPriceX96}, Liquidity: {liquidity}, Tick: {tick}")
@@ -624,9 +959,9 @@ if __name__ == "__main__":
         liquidity,
         tick,
     ) = swap_quote(
-        tick_mapping,
+        tick_snapshot,
         slot0_start,
-        liquidity,
+        liquidity_start,
         False,
         100000000 * 10**18,
         MAX_SQRT_RATIO - 1,
@@ -1,116 +1,293 @@
+import asyncio
+from functools import partial
 import time
-from eth_typing import HexStr
-from web3 import Web3
-import json
 
+from zora_poc.archive import EventArchive
+from zora_poc.backfill import backfill
+from zora_poc.checkpoint import Checkpoint
+from zora_poc.client import POOL_ADDRESS, get_client
+from zora_poc.events import (
+    POOL_EVENT_TOPICS,
+    BurnEvent,
+    MintEvent,
+    SwapEvent,
+    decode_log,
+)
+from zora_poc.lens import fetch_pool_snapshot
+from zora_poc.lens_state import TickBook
+from zora_poc.pools import Pool, PoolRegistry
+from zora_poc.tailer import LogTailer, RangeSizer
 
-# Configuration
-RPC_URL = "http://base-proxy.lat.nodes.internal.notnotzora.com"
-POOL_ADDRESS = Web3.to_checksum_address("0xE020E67Cb76C780329d4c205578Aaa6d6478Fb2A")
-UNISWAP_V3_POOL_ABI_PATH = "src/zora_poc/UniswapV3Pool.json"
 
-# Web3 setup
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
-if not w3.is_connected():
-    raise Exception("Failed to connect to Ethereum node")
+# first block of POOL_ADDRESS's events, to replay them instead of bootstrapping
+START_BLOCK = 26316951
+# one checkpoint file per pool
+CHECKPOINT_PATH = "liquidity_checkpoint_{address}.json"
+CHECKPOINT_INTERVAL = 30  # seconds
+# blocks that can still be reorganized away, Base reorgs are a few blocks deep at most
+REORG_DEPTH = 64
+# get_logs filters list the addresses of up to this many pools. Beyond that they filter
+# on the event topics only, and the logs of untracked contracts are dropped locally.
+MAX_FILTER_ADDRESSES = 500
+# blocks per event archive partition
+ARCHIVE_PARTITION_BLOCKS = 100_000
 
-# Load Uniswap V3 Pool ABI
-with open(UNISWAP_V3_POOL_ABI_PATH, "r") as abi_file:
-    uniswap_v3_pool_abi = json.load(abi_file)
+# The ingested pools. Each pool's state is a Checkpoint: its tick book, built from the
+# decoded events without any per-event RPC, and the block and log it is up to date with.
+registry = PoolRegistry(journal_depth=REORG_DEPTH)
+# get_logs range sizes that worked, per pool
+range_sizer = RangeSizer(initial_size=100_000)
+last_checkpoint_time = 0.0
 
-# Contract setup
-pool_contract = w3.eth.contract(address=POOL_ADDRESS, abi=uniswap_v3_pool_abi)
 
-tick_liquidity_map = {}
+def handle_mint(book: TickBook, event: MintEvent) -> None:
+    book.apply_mint(event.tick_lower, event.tick_upper, event.amount)
 
 
-def fetch_tick_liquidity(tick):
-    try:
-        result = pool_contract.functions.ticks(tick).call()
-        liquidity_gross = result[0]
-        tick_liquidity_map[tick] = liquidity_gross
-        # print(f"Updated tick {tick} liquidity: {liquidity_gross}")
-    except Exception as e:
-        print(f"Error fetching liquidity for tick {tick}: {e}")
+def handle_burn(book: TickBook, event: BurnEvent) -> None:
+    book.apply_burn(event.tick_lower, event.tick_upper, event.amount)
+
+
+def handle_swap(book: TickBook, event: SwapEvent) -> None:
+    book.apply_swap(event.sqrt_price_x96, event.liquidity, event.tick)
+
+
+# events are decoded straight from the log bytes (see zora_poc.events), without the
+# contract ABI
+handlers = {MintEvent: handle_mint, BurnEvent: handle_burn, SwapEvent: handle_swap}
+
+
+def checkpoint_path(pool_address: str) -> str:
+    return CHECKPOINT_PATH.format(address=pool_address.lower())
 
 
-def handle_mint(log) -> None:
-    event = pool_contract.events.Mint.process_log(log)
-    tick_lower = event["args"]["tickLower"]
-    tick_upper = event["args"]["tickUpper"]
+def handle_log(state: Checkpoint, log) -> None:
+    if state.is_applied(log):
+        return
+    state.book.begin_block(log["blockNumber"])
+    event = decode_log(log)
+    if event is not None:
+        handlers[type(event)](state.book, event)
+    else:
+        print(f"Unknown event: {log['topics'][0].to_0x_hex()}")
+    state.mark_applied(log)
 
-    # print(f"[Mint] Refreshing liquidity for ticks {tick_lower} to {tick_upper}")
-    fetch_tick_liquidity(tick_lower)
-    fetch_tick_liquidity(tick_upper)
 
+def handle_pool_log(log) -> None:
+    # routes the log to the book of its pool, logs of other contracts are dropped
+    pool = registry.get(log["address"])
+    if pool is not None:
+        handle_log(pool.state, log)
 
-def handle_burn(log) -> None:
-    event = pool_contract.events.Burn.process_log(log)
-    tick_lower = event["args"]["tickLower"]
-    tick_upper = event["args"]["tickUpper"]
 
-    # print(f"[Burn] Refreshing liquidity for ticks {tick_lower} to {tick_upper}")
-    fetch_tick_liquidity(tick_lower)
-    fetch_tick_liquidity(tick_upper)
+def save_pools(pools: list[Pool]) -> None:
+    for pool in pools:
+        pool.state.save(checkpoint_path(pool.info.address))
 
 
-def handle_swap(log) -> None:
-    event = pool_contract.events.Swap.process_log(log)
-    tick = event["args"]["tick"]
+def finish_range(
+    pools: list[Pool], from_block: int, to_block: int, block_hash: str, logs: list
+) -> None:
+    global last_checkpoint_time
+    for pool in pools:
+        # a pool resumed from a later checkpoint is already past this range
+        if to_block > pool.state.block_number:
+            pool.state.block_number = to_block
+            pool.state.block_hash = block_hash
+    print(f"Handled {len(logs)} logs from block {from_block} to {to_block}")
+    if time.monotonic() - last_checkpoint_time >= CHECKPOINT_INTERVAL:
+        save_pools(pools)
+        last_checkpoint_time = time.monotonic()
+        print(f"Checkpoint of {len(pools)} pools at block {to_block}")
 
-    # print(f"[Swap] Swap event tx_hash: {event.transactionHash.hex()}")
-    # print(f"[Swap] Detected at tick {tick}, fetching latest liquidity")
-    fetch_tick_liquidity(tick)
 
+def rollback(pools: list[Pool], block_number: int) -> None:
+    print(f"Reorg, rolling back to block {block_number}")
+    for pool in pools:
+        if pool.state.block_number > block_number:
+            pool.state.rollback(block_number)
 
-handlers = {
-    "0x7a53080ba414158be7ec69b987b5fb7d07dee101fe85488f0853ae16239d0bde": handle_mint,
-    "0x0c396cd989a39f4459b5fa1aed6a9a8dcdbc45908acfd67e028cd568da98982c": handle_burn,
-    "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67": handle_swap,
-}
 
+def safe_block() -> tuple[int, str]:
+    # (number, hash) of the block REORG_DEPTH blocks below the head, deeper than any
+    # reorg the ingester follows
+    w3 = get_client().w3
+    block = w3.eth.get_block(max(w3.eth.block_number - REORG_DEPTH, 0))
+    return block["number"], block["hash"].to_0x_hex()
 
-def process_block_range(from_block: int, to_block: int, topics: list[str]) -> None:
-    hex_topics = [HexStr(t) for t in topics]
-    logs = w3.eth.get_logs(
-        {
-            "fromBlock": from_block,
-            "toBlock": to_block,
-            "address": POOL_ADDRESS,
-            "topics": [hex_topics],
-        }
+
+def bootstrap(
+    pool_address: str = POOL_ADDRESS, block: tuple[int, str] | None = None
+) -> Checkpoint:
+    # Pool state at one block B (default safe_block()) from getAllTicks + slot0 +
+    # liquidity in one eth_call pinned to B's hash, the events of B + 1 onwards are then
+    # applied on top of it
+    block_number, block_hash = block or safe_block()
+    snapshot = fetch_pool_snapshot(pool_address, block_hash)
+    assert snapshot.block_number == block_number, "Snapshot of another block"
+    book = TickBook.from_ticks(
+        snapshot.initialized_ticks,
+        snapshot.slot0.sqrtPriceX96,
+        snapshot.liquidity,
+        snapshot.slot0.tick,
+        REORG_DEPTH,
+    )
+    # the snapshot cannot be rolled back, B is too deep to be reorganized
+    book.journal_floor = block_number
+    return Checkpoint(
+        block_number,
+        block_hash,
+        (block_number + 1, -1),
+        book,
+        {block_number: block_hash},
     )
-    print(f"Fetched {len(logs)} logs from block {from_block} to {to_block}")
-    for log in logs:
-        handler = handlers.get(log["topics"][0].to_0x_hex())
-        if handler:
-            handler(log)
-        else:
-            print(f"Unknown event: {log['topics'][0].to_0x_hex()}")
+
+
+def archive_pool(
+    archive: EventArchive,
+    pool_address: str,
+    to_block: int,
+    start_block: int = START_BLOCK,
+    partition_blocks: int = ARCHIVE_PARTITION_BLOCKS,
+) -> None:
+    # fetches the pool's events after the archive head (from start_block for a new pool)
+    # up to to_block and appends them in partitions of at least partition_blocks blocks
+    head = archive.head(pool_address)
+    from_block = start_block if head is None else head + 1
+    if from_block > to_block:
+        return
+    events = []
+    partition_start = from_block
+
+    def handle(log):
+        event = decode_log(log)
+        if event is not None:
+            events.append(event)
+
+    def finish(range_start, range_end, block_hash, logs):
+        nonlocal partition_start
+        if range_end - partition_start + 1 >= partition_blocks or range_end == to_block:
+            archive.append(pool_address, partition_start, range_end, events)
+            print(f"Archived {len(events)} events up to block {range_end}")
+            events.clear()
+            partition_start = range_end + 1
+
+    tailer = LogTailer(
+        pool_address,
+        POOL_EVENT_TOPICS,
+        from_block,
+        handle,
+        range_sizer=range_sizer,
+        on_range=finish,
+    )
+    asyncio.run(tailer.run(stop_block=to_block))
+
+
+def replay_archive(state: Checkpoint, archive: EventArchive, pool_address: str) -> None:
+    # applies the archived events past the state's watermark, without any RPC
+    head = archive.head(pool_address)
+    if head is None or head <= state.block_number:
+        return
+    book = state.book
+    for event in archive.events(pool_address, state.watermark[0]):
+        if (event.block_number, event.log_index) <= state.watermark:
             continue
+        book.begin_block(event.block_number)
+        handlers[type(event)](book, event)
+    state.block_number = head
+    state.block_hash = None
+    state.watermark = (head + 1, -1)
 
 
-def main() -> None:
-    print("Listening for Mint, Burn, and Swap events...")
-    fromBlock = 26316951
-    batchSize = 100000
-    while True:
-        process_block_range(
-            fromBlock,
-            fromBlock + batchSize,
-            [
-                "0x7a53080ba414158be7ec69b987b5fb7d07dee101fe85488f0853ae16239d0bde",
-                "0x0c396cd989a39f4459b5fa1aed6a9a8dcdbc45908acfd67e028cd568da98982c",
-                "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67",
-            ],
+def resume(
+    pool: Pool,
+    replay: bool,
+    start_block: int,
+    workers: int = 1,
+    archive: EventArchive | None = None,
+    block: tuple[int, str] | None = None,
+) -> Checkpoint:
+    # The pool's checkpoint if there is one, otherwise a snapshot of the pool at `block`
+    # (default safe_block()), or an empty book to replay every event since start_block.
+    # Replays with an archive first extend it to `block` and apply it, the tailer only
+    # fetches the blocks after that; without replay the archive is left as it is, as
+    # extending it would fetch the pool's whole history. Replays without an archive are
+    # backfilled in parallel to the same block by more than one worker.
+    assert archive is None or workers == 1, "An archive is extended by a single tailer"
+    block = block or safe_block()
+    checkpoint = Checkpoint.load(checkpoint_path(pool.info.address))
+    if checkpoint is not None:
+        pool.state = checkpoint
+    elif not replay:
+        pool.state = bootstrap(pool.info.address, block)
+    elif archive is not None:
+        pool.state.block_number = start_block - 1
+    elif workers > 1:
+        pool.state = backfill(
+            pool.info.address, start_block, block[0], workers, journal_depth=REORG_DEPTH
         )
-        print(f"Liquidity map: {tick_liquidity_map}")
-        fromBlock += batchSize
-        if fromBlock > w3.eth.block_number:
-            print(f"Reached latest block {w3.eth.block_number}, sleeping...")
-            fromBlock = w3.eth.block_number
-            time.sleep(5)
-            print(f"Liquidity map: {tick_liquidity_map}")
+    else:
+        pool.state.block_number = start_block - 1
+    if replay and archive is not None:
+        archive_pool(archive, pool.info.address, block[0], start_block)
+        replay_archive(pool.state, archive, pool.info.address)
+    return pool.state
+
+
+def main_pools(
+    pool_addresses: list[str],
+    replay: bool = False,
+    start_block: int = START_BLOCK,
+    workers: int = 1,
+    archive_root: str | None = None,
+) -> None:
+    # Ingests all pools with a single log subscription: every get_logs request covers
+    # every pool, so the requests per block range do not grow with the number of pools.
+    # The tailer starts after the pool that is furthest behind; pools resumed from later
+    # checkpoints skip the logs they already applied.
+    pools = registry.load(pool_addresses)
+    archive = EventArchive(archive_root) if archive_root is not None else None
+    # the pools that start over all start from the same block
+    block = safe_block()
+    for pool in pools:
+        resume(pool, replay, start_block, workers, archive, block)
+    first = min(pools, key=lambda pool: pool.state.block_number)
+    # one set of recent block hashes for all the pools, saved with each of them
+    block_hashes = first.state.block_hashes
+    for pool in pools:
+        pool.state.block_hashes = block_hashes
+    print(f"Starting {len(pools)} pools after block {first.state.block_number}")
+    print("Listening for Mint, Burn, and Swap events...")
+    tailer = LogTailer(
+        (
+            [pool.info.address for pool in pools]
+            if len(pools) <= MAX_FILTER_ADDRESSES
+            else None
+        ),
+        POOL_EVENT_TOPICS,
+        first.state.block_number + 1,
+        handle_pool_log,
+        range_sizer=range_sizer,
+        on_range=partial(finish_range, pools),
+        on_reorg=partial(rollback, pools),
+        reorg_depth=REORG_DEPTH,
+        block_hashes=block_hashes,
+    )
+    try:
+        asyncio.run(tailer.run())
+    finally:
+        # every range up to state.block_number is fully applied
+        save_pools(pools)
+
+
+def main(
+    pool_address: str = POOL_ADDRESS,
+    replay: bool = False,
+    start_block: int = START_BLOCK,
+    workers: int = 1,
+    archive_root: str | None = None,
+) -> None:
+    main_pools([pool_address], replay, start_block, workers, archive_root)
 
 
 if __name__ == "__main__":
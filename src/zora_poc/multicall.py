@@ -0,0 +1,57 @@
+from zora_poc.client import Client, get_client
+
+
+# Several contract reads in one eth_call through Multicall3.aggregate3. Every call is
+# executed against the same block, so the results can never be torn across blocks, and
+# the whole batch is one round trip. Calls are bound web3 contract functions, for example
+# client.pool().functions.slot0(); results are decoded like ContractFunction.call() would:
+# the value for a single output, a tuple for several. The batch is sent with eth_call
+# rather than ContractFunction.call(), which would turn a block hash into that block's
+# number: a call pinned to a hash (EIP-1898) fails instead of reading another version of
+# the block after a reorg.
+def aggregate(
+    calls: list,
+    block_identifier="latest",
+    client: Client | None = None,
+) -> tuple[int, list]:
+    # returns (number of the block the calls ran at, results in the order of calls)
+    # imported here, eth_utils alone would more than double the import time of lens
+    from eth_utils.abi import get_abi_output_types
+
+    client = client or get_client()
+    multicall = client.multicall()
+    codec = client.w3.codec
+
+    block_number_call = multicall.functions.getBlockNumber()
+    calls = [block_number_call] + list(calls)
+    requests = [
+        (
+            call.address,
+            False,
+            bytes.fromhex(call.selector[2:])
+            + codec.encode(call.argument_types, call.args),
+        )
+        for call in calls
+    ]
+    transaction = {
+        "to": multicall.address,
+        "data": multicall.encode_abi("aggregate3", [requests]),
+    }
+    (responses,) = codec.decode(
+        get_abi_output_types(multicall.functions.aggregate3.abi),
+        client.w3.eth.call(transaction, block_identifier),
+    )
+
+    results = []
+    for call, (success, return_data) in zip(calls, responses):
+        # allowFailure is false, aggregate3 reverts as a whole instead
+        assert success, f"{call.fn_name} failed"
+        output_types = get_abi_output_types(call.abi)
+        values = [
+            client.w3.to_checksum_address(value) if output_type == "address" else value
+            for output_type, value in zip(
+                output_types, codec.decode(output_types, return_data)
+            )
+        ]
+        results.append(values[0] if len(values) == 1 else tuple(values))
+    return results[0], results[1:]
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+
+from zora_poc.checkpoint import Checkpoint
+from zora_poc.client import Client, get_client
+from zora_poc.lens import CHECKED_KERNEL, Slot0, swap_quote
+from zora_poc.lens_state import TickBook
+from zora_poc.multicall import aggregate
+from zora_poc.simulator.libraries.Shared import (
+    FEE_AMOUNT_TICK_SPACING,
+    MAX_SQRT_RATIO,
+    MIN_SQRT_RATIO,
+)
+
+
+# Immutable metadata of one pool. The registry reads the tick spacing from the pool, as
+# fee tiers enabled after deployment are not in FEE_AMOUNT_TICK_SPACING; from_fee takes
+# it from that table.
+@dataclass(frozen=True, slots=True)
+class PoolInfo:
+    address: str
+    token0: str
+    token1: str
+    fee: int
+    tick_spacing: int
+
+    @classmethod
+    def from_fee(cls, address: str, token0: str, token1: str, fee: int) -> "PoolInfo":
+        assert fee in FEE_AMOUNT_TICK_SPACING, "Fee amount not supported"
+        return cls(address, token0, token1, fee, FEE_AMOUNT_TICK_SPACING[fee])
+
+
+# One pool of the registry: its metadata and its ingestion state, whose tick book holds
+# the pool's ticks, price, tick and active liquidity
+class Pool:
+    __slots__ = ("info", "state")
+
+    def __init__(self, info: PoolInfo, state: Checkpoint):
+        self.info = info
+        self.state = state
+
+    @property
+    def book(self) -> TickBook:
+        return self.state.book
+
+    @property
+    def slot0(self) -> Slot0:
+        return Slot0(self.book.sqrt_price_x96, self.book.tick)
+
+    def quote(
+        self,
+        zero_for_one: bool,
+        amount_specified: int,
+        sqrt_price_limit_x96: int | None = None,
+        kernel=CHECKED_KERNEL,
+    ):
+        # lens.swap_quote on the current book, with the pool's fee and tick spacing
+        if sqrt_price_limit_x96 is None:
+            sqrt_price_limit_x96 = (
+                MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+            )
+        return swap_quote(
+            self.book.ticks,
+            self.slot0,
+            self.book.liquidity,
+            zero_for_one,
+            amount_specified,
+            sqrt_price_limit_x96,
+            self.book.tick_index,
+            kernel,
+            self.info.fee,
+            self.info.tick_spacing,
+        )
+
+    def __repr__(self):
+        return f"Pool(info={self.info}, state={self.state})"
+
+
+# The pools we quote and ingest, by address (case-insensitive). Every pool has its own
+# tick book with a reorg journal of journal_depth blocks; pools share no state.
+#
+# Memory (CPython 3.13, 64-bit, benchmarks.bench_pool_registry): about 1.4 KB per pool
+# for the registry entry, metadata, checkpoint and empty book, plus about 160 bytes per
+# initialized tick (TickInfo, ints, dict slot, index entry). 1k pools with 78
+# initialized ticks on average take 13 MiB, before the reorg journals of ingested pools.
+class PoolRegistry:
+    def __init__(self, client: Client | None = None, journal_depth: int = 0):
+        self.client = client
+        self.journal_depth = journal_depth
+        self.pools = {}
+
+    def __len__(self):
+        return len(self.pools)
+
+    def __contains__(self, address: str):
+        return address.lower() in self.pools
+
+    def __iter__(self):
+        return iter(self.pools.values())
+
+    def __getitem__(self, address: str) -> Pool:
+        return self.pools[address.lower()]
+
+    def get(self, address: str) -> Pool | None:
+        return self.pools.get(address.lower())
+
+    def add(self, info: PoolInfo) -> Pool:
+        # a pool with an empty book, to be bootstrapped from a snapshot or a replay
+        assert info.address not in self, "Pool already registered"
+        pool = Pool(
+            info, Checkpoint(-1, book=TickBook(journal_depth=self.journal_depth))
+        )
+        self.pools[info.address.lower()] = pool
+        return pool
+
+    def load(
+        self, addresses: list[str], block_identifier="latest", batch_size: int = 300
+    ) -> list[Pool]:
+        # registers the pools, reading token0, token1, fee and tickSpacing of batch_size
+        # pools per eth_call; pools already registered are returned as they are
+        client = self.client or get_client()
+        new = [address for address in dict.fromkeys(addresses) if address not in self]
+        for i in range(0, len(new), batch_size):
+            contracts = [client.pool(address) for address in new[i : i + batch_size]]
+            _, results = aggregate(
+                [
+                    function()
+                    for contract in contracts
+                    for function in (
+                        contract.functions.token0,
+                        contract.functions.token1,
+                        contract.functions.fee,
+                        contract.functions.tickSpacing,
+                    )
+                ],
+                block_identifier,
+                client,
+            )
+            for j, contract in enumerate(contracts):
+                token0, token1, fee, tick_spacing = results[4 * j : 4 * j + 4]
+                self.add(
+                    PoolInfo(contract.address, token0, token1, fee, tick_spacing)
+                )
+        return [self[address] for address in addresses]
+
+    def __repr__(self):
+        return f"PoolRegistry(pools={len(self.pools)})"
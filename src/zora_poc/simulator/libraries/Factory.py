@@ -1,4 +1,4 @@
-from .Shared import checkInputTypes
+from .Shared import FEE_AMOUNT_TICK_SPACING, checkInputTypes
 from ..UniswapPool import UniswapPool
 
 
@@ -6,7 +6,7 @@ from ..UniswapPool import UniswapPool
 ## @notice Deploys Uniswap V3 pools and manages ownership and control over pool protocol fees
 class Factory:
     def __init__(self):
-        self.feeAmountTickSpacing = {500: 10, 3000: 60, 10000: 200}
+        self.feeAmountTickSpacing = dict(FEE_AMOUNT_TICK_SPACING)
         self.getPool = []
 
     ## @notice Creates a pool for the given two tokens and fee
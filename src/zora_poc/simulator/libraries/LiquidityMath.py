@@ -1,4 +1,4 @@
-from . import TickMath
+from .Shared import MAX_UINT128
 
 ### @title Math library for liquidity
 
@@ -15,5 +15,5 @@ def addDelta(x, y):
     else:
         z = x + abs(y)
         # Mimic solidity overflow check
-        assert z <= TickMath.MAX_UINT128, "LA"
+        assert z <= MAX_UINT128, "LA"
     return z
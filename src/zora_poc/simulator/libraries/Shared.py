@@ -31,6 +31,9 @@ MIN_TICK = -887272
 ### The maximum tick that may be passed to #getSqrtRatioAtTick computed from log base 1.0001 of 2**128
 MAX_TICK = -MIN_TICK
 
+### Fee amounts enabled in the factory and the tick spacing of the pools created with them
+FEE_AMOUNT_TICK_SPACING = {500: 10, 3000: 60, 10000: 200}
+
 
 # ------------------ Shared dataclasses ------------------ #
 
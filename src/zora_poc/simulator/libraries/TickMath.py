@@ -1,3 +1,6 @@
+from functools import lru_cache
+import math
+
 from .Shared import (
     checkInt24,
     MAX_TICK,
@@ -80,6 +83,48 @@ def getSqrtRatioAtTick(tick):
     return result
 
 
+# Lazily filled lookup tables of getSqrtRatioAtTick, one per tick spacing, indexed by
+# tick // tickSpacing + MAX_TICK // tickSpacing
+_sqrtRatioTables = {}
+
+
+### @notice Memoized getSqrtRatioAtTick for ticks that are not on a tick spacing grid (e.g. MIN_TICK / MAX_TICK)
+_getSqrtRatioAtTickMemo = lru_cache(maxsize=4096)(getSqrtRatioAtTick)
+
+
+### @notice Same result as getSqrtRatioAtTick, served from the lookup table of the given tick spacing
+### @dev Initialized ticks always lie on the pool's tick spacing grid, so a quote only ever computes each of them once
+### @param tick The input tick for the above formula
+### @param tickSpacing The tick spacing of the pool the tick belongs to
+### @return sqrtPriceX96 A Fixed point Q64.96 number representing the sqrt of the ratio of the two assets (token1/token0)
+def getSqrtRatioAtTickCached(tick, tickSpacing):
+    if tick % tickSpacing != 0:
+        return _getSqrtRatioAtTickMemo(tick)
+    table = _sqrtRatioTables.get(tickSpacing)
+    if table is None:
+        table = _sqrtRatioTables.setdefault(
+            tickSpacing, [None] * (2 * (MAX_TICK // tickSpacing) + 1)
+        )
+    i = tick // tickSpacing + MAX_TICK // tickSpacing
+    if i < 0 or i >= len(table):
+        # Out of range, let getSqrtRatioAtTick raise
+        return getSqrtRatioAtTick(tick)
+    result = table[i]
+    if result is None:
+        result = table[i] = getSqrtRatioAtTick(tick)
+    return result
+
+
+### @notice Fills the whole lookup table of a tick spacing up front, e.g. while a worker warms up
+### @param tickSpacing The tick spacing of the grid
+### @return The table, indexed by tick // tickSpacing + MAX_TICK // tickSpacing
+def getSqrtRatioTable(tickSpacing):
+    offset = MAX_TICK // tickSpacing
+    for i in range(-offset, offset + 1):
+        getSqrtRatioAtTickCached(i * tickSpacing, tickSpacing)
+    return _sqrtRatioTables[tickSpacing]
+
+
 ### @notice Calculates the greatest tick value such that getRatioAtTick(tick) <= ratio
 ### @dev Throws in case sqrtPriceX96 < MIN_SQRT_RATIO, as MIN_SQRT_RATIO is the lowest value getRatioAtTick may
 ### ever return.
@@ -144,6 +189,28 @@ def getTickAtSqrtRatio(sqrtPriceX96):
     return tick
 
 
+# log(2**96) and log(sqrt(1.0001)) for the floating point tick estimate of getTickAtSqrtRatioFast
+_LOG_Q96 = 96 * math.log(2)
+_LOG_SQRT10001 = math.log(1.0001) / 2
+
+
+### @notice Same result as getTickAtSqrtRatio, without the 22 fixed point log2 steps
+### @dev The tick is estimated as log(sqrtPriceX96 / 2**96) / log(sqrt(1.0001)) in floating point. Over the whole
+### tick range the absolute error of that estimate stays below 1e-9 ticks, so its floor is the answer unless the
+### price sits right at a tick boundary, in which case getSqrtRatioAtTick settles it exactly
+### @param sqrtPriceX96 The sqrt ratio for which to compute the tick as a Q64.96
+### @return tick The greatest tick for which the ratio is less than or equal to the input ratio
+def getTickAtSqrtRatioFast(sqrtPriceX96):
+    assert sqrtPriceX96 >= MIN_SQRT_RATIO and sqrtPriceX96 < MAX_SQRT_RATIO, "R"
+    estimate = (math.log(sqrtPriceX96) - _LOG_Q96) / _LOG_SQRT10001
+    tick = math.floor(estimate)
+    if 1e-6 < estimate - tick < 1 - 1e-6:
+        return tick
+
+    tick = round(estimate)
+    return tick if getSqrtRatioAtTick(tick) <= sqrtPriceX96 else tick - 1
+
+
 # Need to return r and msb since ints are passed by value and not by reference
 def add_bit_to_log_2(r, msb, lower_bit_mask, bit):
     gt = 1 if r > lower_bit_mask else 0
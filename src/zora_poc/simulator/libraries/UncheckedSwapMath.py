@@ -0,0 +1,128 @@
+import math
+from .Shared import FixedPoint96_RESOLUTION, FixedPoint96_Q96, ONE_IN_PIPS, MAX_UINT256
+
+### @title Unchecked swap step kernel
+### @notice Same arithmetic as SwapMath.computeSwapStep and the SqrtPriceMath / FullMath functions it calls, without
+### the Shared.checkInputTypes validation, the per-result overflow asserts and the nested helper calls. It assumes
+### well-formed inputs (the values a pool can actually hold) and is meant for the quote path; SwapMath stays the
+### Solidity-faithful reference that this module is differentially checked against.
+
+
+def _divRoundingUp(a, b):
+    return -(-a // b)
+
+
+def _getAmount0Delta(sqrtRatioAX96, sqrtRatioBX96, liquidity, roundUp):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = (sqrtRatioBX96, sqrtRatioAX96)
+    numerator = (liquidity << FixedPoint96_RESOLUTION) * (sqrtRatioBX96 - sqrtRatioAX96)
+    if roundUp:
+        return _divRoundingUp(_divRoundingUp(numerator, sqrtRatioBX96), sqrtRatioAX96)
+    return (numerator // sqrtRatioBX96) // sqrtRatioAX96
+
+
+def _getAmount1Delta(sqrtRatioAX96, sqrtRatioBX96, liquidity, roundUp):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = (sqrtRatioBX96, sqrtRatioAX96)
+    product = liquidity * (sqrtRatioBX96 - sqrtRatioAX96)
+    if roundUp:
+        return -(-product // FixedPoint96_Q96)
+    return product >> FixedPoint96_RESOLUTION
+
+
+def _getNextSqrtPriceFromAmount0RoundingUp(sqrtPX96, liquidity, amount, add):
+    if amount == 0:
+        return sqrtPX96
+    numerator1 = liquidity << FixedPoint96_RESOLUTION
+    product = amount * sqrtPX96
+    if add:
+        if product < MAX_UINT256:
+            return _divRoundingUp(numerator1 * sqrtPX96, numerator1 + product)
+        ## SqrtPriceMath rounds this branch through a float division, mirror it exactly
+        return math.ceil(numerator1 / ((numerator1 // sqrtPX96) + amount))
+    return _divRoundingUp(numerator1 * sqrtPX96, numerator1 - product)
+
+
+def _getNextSqrtPriceFromAmount1RoundingDown(sqrtPX96, liquidity, amount, add):
+    if add:
+        return sqrtPX96 + (amount << FixedPoint96_RESOLUTION) // liquidity
+    return sqrtPX96 - _divRoundingUp(amount << FixedPoint96_RESOLUTION, liquidity)
+
+
+### @notice Unchecked SwapMath.computeSwapStep, see there for the parameters and return values
+def computeSwapStep(
+    sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, amountRemaining, feePips
+):
+    zeroForOne = sqrtRatioCurrentX96 >= sqrtRatioTargetX96
+    exactIn = amountRemaining >= 0
+
+    if exactIn:
+        amountRemainingLessFee = (
+            amountRemaining * (ONE_IN_PIPS - feePips) // ONE_IN_PIPS
+        )
+        amountIn = (
+            _getAmount0Delta(sqrtRatioTargetX96, sqrtRatioCurrentX96, liquidity, True)
+            if zeroForOne
+            else _getAmount1Delta(
+                sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, True
+            )
+        )
+        if amountRemainingLessFee >= amountIn:
+            sqrtRatioNextX96 = sqrtRatioTargetX96
+        elif zeroForOne:
+            sqrtRatioNextX96 = _getNextSqrtPriceFromAmount0RoundingUp(
+                sqrtRatioCurrentX96, liquidity, amountRemainingLessFee, True
+            )
+        else:
+            sqrtRatioNextX96 = _getNextSqrtPriceFromAmount1RoundingDown(
+                sqrtRatioCurrentX96, liquidity, amountRemainingLessFee, True
+            )
+    else:
+        amountOut = (
+            _getAmount1Delta(sqrtRatioTargetX96, sqrtRatioCurrentX96, liquidity, False)
+            if zeroForOne
+            else _getAmount0Delta(
+                sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, False
+            )
+        )
+        if -amountRemaining >= amountOut:
+            sqrtRatioNextX96 = sqrtRatioTargetX96
+        elif zeroForOne:
+            sqrtRatioNextX96 = _getNextSqrtPriceFromAmount1RoundingDown(
+                sqrtRatioCurrentX96, liquidity, -amountRemaining, False
+            )
+        else:
+            sqrtRatioNextX96 = _getNextSqrtPriceFromAmount0RoundingUp(
+                sqrtRatioCurrentX96, liquidity, -amountRemaining, False
+            )
+
+    max = sqrtRatioTargetX96 == sqrtRatioNextX96
+
+    if zeroForOne:
+        if not (max and exactIn):
+            amountIn = _getAmount0Delta(
+                sqrtRatioNextX96, sqrtRatioCurrentX96, liquidity, True
+            )
+        if not (max and not exactIn):
+            amountOut = _getAmount1Delta(
+                sqrtRatioNextX96, sqrtRatioCurrentX96, liquidity, False
+            )
+    else:
+        if not (max and exactIn):
+            amountIn = _getAmount1Delta(
+                sqrtRatioCurrentX96, sqrtRatioNextX96, liquidity, True
+            )
+        if not (max and not exactIn):
+            amountOut = _getAmount0Delta(
+                sqrtRatioCurrentX96, sqrtRatioNextX96, liquidity, False
+            )
+
+    if (not exactIn) and (amountOut > -amountRemaining):
+        amountOut = -amountRemaining
+
+    if exactIn and sqrtRatioNextX96 != sqrtRatioTargetX96:
+        feeAmount = amountRemaining - amountIn
+    else:
+        feeAmount = _divRoundingUp(amountIn * feePips, ONE_IN_PIPS - feePips)
+
+    return (sqrtRatioNextX96, amountIn, amountOut, feeAmount)
@@ -0,0 +1,383 @@
+import asyncio
+from collections import deque
+
+from aiohttp import ClientConnectionError, ClientResponseError
+from web3.exceptions import Web3RPCError
+
+from zora_poc.client import Client, get_client
+
+# Parts of the JSON-RPC error messages providers answer to a get_logs range with too many
+# blocks or logs, or that took them too long to serve. Such a range is split in halves.
+RANGE_ERROR_MESSAGES = (
+    "block range",
+    "range is too",
+    "range too",
+    "more than",
+    "too many results",
+    "too many logs",
+    "too many blocks",
+    "response size",
+    "limited to",
+    "query timeout",
+)
+# Parts of the JSON-RPC error messages of rate limits and overloaded or lagging nodes.
+# The request is retried as is after a while, like on HTTP 429 and 5xx responses,
+# connection errors and timeouts.
+TRANSIENT_ERROR_MESSAGES = (
+    "rate limit",
+    "too many requests",
+    "request count",
+    "capacity",
+    "try again",
+    "temporarily",
+    "unavailable",
+    "timeout",
+    "timed out",
+    "internal error",
+    "header not found",
+)
+
+
+def rpc_error_message(error: Web3RPCError) -> str:
+    rpc_error = (error.rpc_response or {}).get("error")
+    if isinstance(rpc_error, dict):
+        return str(rpc_error.get("message", "")).lower()
+    return str(error).lower()
+
+
+def is_range_error(error: Exception) -> bool:
+    if not isinstance(error, Web3RPCError):
+        return False
+    message = rpc_error_message(error)
+    return any(part in message for part in RANGE_ERROR_MESSAGES)
+
+
+def is_transient_error(error: Exception) -> bool:
+    if isinstance(error, ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    if isinstance(error, (ClientConnectionError, TimeoutError)):
+        return True
+    if not isinstance(error, Web3RPCError):
+        return False
+    message = rpc_error_message(error)
+    return any(part in message for part in TRANSIENT_ERROR_MESSAGES)
+
+
+def first_error(error: BaseException) -> BaseException:
+    # the first leaf of nested exception groups
+    while isinstance(error, BaseExceptionGroup):
+        error = error.exceptions[0]
+    return error
+
+
+class ChainReorganized(Exception):
+    def __init__(self, block_number: int):
+        super().__init__(f"chain reorganized at or below block {block_number}")
+        self.block_number = block_number
+
+
+# get_logs block range size per contract address. A range that exceeds a provider limit is
+# bisected and the size that worked is remembered; a range that returns fewer than target_logs / 4 logs
+# doubles the size for the next request and one above target_logs halves it, so quiet
+# stretches are covered in few requests and busy ones stay under provider limits.
+class RangeSizer:
+    def __init__(
+        self,
+        initial_size: int = 10_000,
+        min_size: int = 1,
+        max_size: int = 1_000_000,
+        target_logs: int = 2_000,
+    ):
+        self.initial_size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_logs = target_logs
+        self.sizes = {}
+
+    def size(self, address: str) -> int:
+        return self.sizes.get(address.lower(), self.initial_size)
+
+    def set_size(self, address: str, size: int) -> None:
+        self.sizes[address.lower()] = max(self.min_size, min(size, self.max_size))
+
+    def record(self, address: str, size: int, logs: int) -> None:
+        # a range of `size` blocks returned `logs` logs
+        if logs < self.target_logs // 4:
+            self.set_size(address, max(self.size(address), size * 2))
+        elif logs > self.target_logs:
+            self.set_size(address, min(self.size(address), size // 2))
+
+    def failed(self, address: str, size: int) -> None:
+        self.set_size(address, min(self.size(address), size // 2))
+
+    def __repr__(self):
+        return f"RangeSizer(sizes={self.sizes})"
+
+
+# Follows the logs of one contract, of a list of contracts, or of every contract
+# (address None, topic filtering only) from from_block to the chain head and beyond, on
+# asyncio. Up to `concurrency` get_logs requests for consecutive block ranges are in
+# flight at once, the halves of split ranges included; their results are queued strictly
+# in block order into a queue of at most `queue_size` ranges, so a slow handler pauses the
+# fetching instead of letting results pile up. Range sizes come from a RangeSizer, and a
+# range the provider rejects as too large (RANGE_ERROR_MESSAGES) is split in halves until
+# it goes through. Transient errors (rate limits, 5xx, timeouts, outages) of the get_logs,
+# header and head requests are retried after min_retry_interval seconds, backing off to
+# max_retry_interval; any other error stops run(). Once caught up, the head is polled
+# every min_poll_interval seconds, backing off to max_poll_interval while no new block
+# shows up.
+#
+# The hashes of the last blocks of the handled ranges within reorg_depth blocks are kept in
+# block_hashes. A range whose first block does not descend from the last handled block, or
+# whose logs come from another version of its first or last block or from two versions of
+# one block, is a reorg: the tailer finds the newest recorded block that is still
+# canonical, calls on_reorg with its number (undo the effects of every later block there)
+# and resumes fetching after it. Ranges at least reorg_depth blocks below the head are
+# taken as final and only the hash of their last block is read.
+class LogTailer:
+    def __init__(
+        self,
+        address: str | list[str] | None,
+        topics: list[str],
+        from_block: int,
+        handle_log,
+        client: Client | None = None,
+        range_sizer: RangeSizer | None = None,
+        concurrency: int = 4,
+        queue_size: int = 8,
+        min_poll_interval: float = 0.25,
+        max_poll_interval: float = 4.0,
+        min_retry_interval: float = 0.5,
+        max_retry_interval: float = 30.0,
+        on_range=None,
+        on_reorg=None,
+        reorg_depth: int = 64,
+        block_hashes: dict[int, str] | None = None,
+    ):
+        self.address = address
+        ## RangeSizer key, an address list or every address share one entry
+        self.range_key = address if isinstance(address, str) else "*"
+        self.topics = topics
+        ## next block to fetch, and the last block whose logs were all handled
+        self.next_block = from_block
+        self.last_block = from_block - 1
+        self.last_block_hash = None
+        self.handle_log = handle_log
+        self.client = client or get_client()
+        self.range_sizer = range_sizer or RangeSizer()
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.min_retry_interval = min_retry_interval
+        self.max_retry_interval = max_retry_interval
+        ## bounds the get_logs requests in flight to `concurrency`, created by run()
+        self.request_slots = None
+        ## called with (from_block, to_block, hash of to_block, logs) after the logs of a
+        ## range were handled
+        self.on_range = on_range
+        ## called with the number of the common ancestor block after a reorg
+        self.on_reorg = on_reorg
+        self.reorg_depth = reorg_depth
+        ## block number => hash, of recently handled range ends
+        self.block_hashes = {} if block_hashes is None else block_hashes
+        if self.last_block in self.block_hashes:
+            self.last_block_hash = self.block_hashes[self.last_block]
+
+    async def retry(self, description: str, request):
+        # awaits request() until it returns, sleeping min_retry_interval seconds after a
+        # transient error and doubling that up to max_retry_interval; any other error is
+        # raised
+        retry_interval = self.min_retry_interval
+        while True:
+            try:
+                return await request()
+            except Exception as error:
+                if not is_transient_error(error):
+                    raise
+                print(
+                    f"{description} failed ({error!r}), retrying in {retry_interval}s"
+                )
+            await asyncio.sleep(retry_interval)
+            retry_interval = min(retry_interval * 2, self.max_retry_interval)
+
+    async def get_logs(self, from_block: int, to_block: int) -> list:
+        filter_params = {
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [self.topics],
+        }
+        if self.address is not None:
+            filter_params["address"] = self.address
+        if self.request_slots is None:
+            self.request_slots = asyncio.Semaphore(self.concurrency)
+
+        async def request() -> list:
+            try:
+                async with self.request_slots:
+                    logs = await self.client.async_w3.eth.get_logs(filter_params)
+            except Exception as error:
+                if from_block < to_block and is_range_error(error):
+                    return await self.bisect(from_block, to_block)
+                raise
+            self.range_sizer.record(
+                self.range_key, to_block - from_block + 1, len(logs)
+            )
+            return logs
+
+        return await self.retry(f"get_logs {from_block}-{to_block}", request)
+
+    async def bisect(self, from_block: int, to_block: int) -> list:
+        # the halves wait for a request slot like any other range
+        self.range_sizer.failed(self.range_key, to_block - from_block + 1)
+        middle = (from_block + to_block) // 2
+        async with asyncio.TaskGroup() as tasks:
+            lower = tasks.create_task(self.get_logs(from_block, middle))
+            upper = tasks.create_task(self.get_logs(middle + 1, to_block))
+        return lower.result() + upper.result()
+
+    async def block_header(self, block_number: int) -> tuple[str, str]:
+        # (hash, parent hash)
+        block = await self.retry(
+            f"get_block {block_number}",
+            lambda: self.client.async_w3.eth.get_block(block_number),
+        )
+        return block["hash"].to_0x_hex(), block["parentHash"].to_0x_hex()
+
+    async def fetch_range(self, from_block: int, to_block: int, head: int) -> tuple:
+        # (logs, block number => hash of from_block and to_block, parent hash of
+        # from_block). The hash of to_block is read before and after the logs: when it
+        # is the same, the logs are from that version of the chain, otherwise the chain
+        # changed under the request and the range is fetched again. A range at least
+        # reorg_depth blocks below the head cannot change any more: only the hash of
+        # to_block is read, and the parent hash is None.
+        if to_block <= head - self.reorg_depth:
+            logs = await self.get_logs(from_block, to_block)
+            block_hash, _ = await self.block_header(to_block)
+            return logs, {to_block: block_hash}, None
+        numbers = [from_block] if from_block == to_block else [from_block, to_block]
+        while True:
+            headers = await asyncio.gather(*map(self.block_header, numbers))
+            logs = await self.get_logs(from_block, to_block)
+            block_hash, _ = await self.block_header(to_block)
+            if block_hash == headers[-1][0]:
+                hashes = {n: header[0] for n, header in zip(numbers, headers)}
+                return logs, hashes, headers[0][1]
+
+    async def head(self) -> int:
+        return await self.retry(
+            "block_number", lambda: self.client.async_w3.eth.block_number
+        )
+
+    async def wait_for_head(self, head: int) -> int:
+        # sleep until the head moves past `head`, backing off while it does not
+        interval = self.min_poll_interval
+        while True:
+            await asyncio.sleep(interval)
+            new_head = await self.head()
+            if new_head > head:
+                return new_head
+            interval = min(interval * 2, self.max_poll_interval)
+
+    async def produce(
+        self, queue: asyncio.Queue, stop_block: int | None, tasks: asyncio.TaskGroup
+    ) -> None:
+        # the fetches run in the task group of run(), which cancels them with the rest
+        pending = deque()
+        head = await self.head()
+        while stop_block is None or self.next_block <= stop_block or pending:
+            last = head if stop_block is None else min(head, stop_block)
+            while len(pending) < self.concurrency and self.next_block <= last:
+                range_size = self.range_sizer.size(self.range_key)
+                to_block = min(self.next_block + range_size - 1, last)
+                task = tasks.create_task(
+                    self.fetch_range(self.next_block, to_block, head)
+                )
+                pending.append((self.next_block, to_block, task))
+                self.next_block = to_block + 1
+
+            if pending:
+                from_block, to_block, task = pending.popleft()
+                # blocks while the queue is full: backpressure from the handlers
+                await queue.put((from_block, to_block, *await task))
+            else:
+                head = await self.wait_for_head(head)
+        await queue.put(None)
+
+    async def consume(self, queue: asyncio.Queue) -> None:
+        while (item := await queue.get()) is not None:
+            from_block, to_block, logs, hashes, parent_hash = item
+            if (
+                self.last_block_hash is not None
+                and parent_hash is not None
+                and parent_hash != self.last_block_hash
+            ):
+                raise ChainReorganized(self.last_block)
+            # the logs of a block all come from one version of it, the one of the header
+            # when we have it
+            for log in logs:
+                log_hash = log["blockHash"].to_0x_hex()
+                if hashes.setdefault(log["blockNumber"], log_hash) != log_hash:
+                    raise ChainReorganized(to_block)
+            block_hash = hashes[to_block]
+
+            for log in logs:
+                self.handle_log(log)
+            self.last_block = to_block
+            self.last_block_hash = block_hash
+            self.block_hashes[to_block] = block_hash
+            for block_number in [
+                n for n in self.block_hashes if n <= to_block - self.reorg_depth
+            ]:
+                del self.block_hashes[block_number]
+            if self.on_range is not None:
+                self.on_range(from_block, to_block, block_hash, logs)
+
+    async def common_ancestor(self, block_number: int) -> int:
+        # newest recorded block at or below block_number that is still canonical
+        for number in sorted(self.block_hashes, reverse=True):
+            if number > block_number:
+                continue
+            block_hash, _ = await self.block_header(number)
+            if block_hash == self.block_hashes[number]:
+                return number
+        raise Exception(f"Reorg below block {block_number} is deeper than reorg_depth")
+
+    async def handle_reorg(self, block_number: int) -> None:
+        ancestor = await self.common_ancestor(block_number)
+        for number in [n for n in self.block_hashes if n > ancestor]:
+            del self.block_hashes[number]
+        if self.on_reorg is not None:
+            self.on_reorg(ancestor)
+        self.last_block = ancestor
+        self.last_block_hash = self.block_hashes[ancestor]
+        self.next_block = ancestor + 1
+
+    async def run(self, stop_block: int | None = None) -> None:
+        # tails forever unless stop_block is given, then returns once it is handled
+        self.request_slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            reorg = None
+            try:
+                queue = asyncio.Queue(maxsize=self.queue_size)
+                async with asyncio.TaskGroup() as tasks:
+                    tasks.create_task(self.produce(queue, stop_block, tasks))
+                    tasks.create_task(self.consume(queue))
+            except* ChainReorganized as errors:
+                reorg = errors.exceptions[0]
+            except* Exception as errors:
+                # the error itself rather than the group of the task group
+                raise first_error(errors) from None
+            if reorg is None:
+                return
+            # the ranges in flight were cancelled with the task group
+            await self.handle_reorg(reorg.block_number)
+
+    def __repr__(self):
+        address = self.address
+        if isinstance(address, list):
+            address = f"[{len(address)} addresses]"
+        return (
+            f"LogTailer(address={address}, next_block={self.next_block}, "
+            f"last_block={self.last_block})"
+        )
@@ -0,0 +1,149 @@
+from bisect import bisect_left
+from pathlib import Path
+import mmap
+import os
+import struct
+import sys
+
+from zora_poc.client import POOL_ADDRESS, Client
+from zora_poc.lens import PoolSnapshot, Slot0, fetch_pool_snapshot
+from zora_poc.lens_state import TickSnapshot, next_initialized_tick
+
+# Tick snapshot file of one pool at one block: the header, then the initialized ticks as
+# a sorted int32 array, then their liquidityNet as 16-byte two's complement integers in
+# the same order. Everything is little-endian.
+## magic, version, reserved, pool address, block number, tick, tick spacing, fee,
+## tick count, sqrtPriceX96, liquidity
+HEADER = struct.Struct("<4sHH20sqiiIQ32s16s")
+MAGIC = b"ZPTK"
+VERSION = 1
+LIQUIDITY_NET_SIZE = 16
+
+
+def write_tick_snapshot(path: Path, snapshot: PoolSnapshot) -> None:
+    # written next to the target and renamed over it, like a checkpoint
+    assert sys.byteorder == "little", "tick snapshot files are little-endian"
+    ticks = snapshot.ticks
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        0,
+        bytes.fromhex(snapshot.pool_address[2:]),
+        snapshot.block_number,
+        snapshot.slot0.tick,
+        snapshot.tick_spacing,
+        snapshot.fee,
+        len(ticks),
+        snapshot.slot0.sqrtPriceX96.to_bytes(32, "little"),
+        snapshot.liquidity.to_bytes(16, "little"),
+    )
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as snapshot_file:
+        snapshot_file.write(header)
+        snapshot_file.write(struct.pack(f"<{len(ticks)}i", *ticks.ticks))
+        snapshot_file.write(
+            b"".join(
+                net.to_bytes(LIQUIDITY_NET_SIZE, "little", signed=True)
+                for net in ticks.liquidity_nets
+            )
+        )
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_tick_snapshot(
+    path: Path,
+    pool_address: str = POOL_ADDRESS,
+    block_identifier="latest",
+    client: Client | None = None,
+) -> PoolSnapshot:
+    # the pool's snapshot at one block, read in one eth_call and written to path
+    snapshot = fetch_pool_snapshot(pool_address, block_identifier, client)
+    write_tick_snapshot(path, snapshot)
+    return snapshot
+
+
+# A tick snapshot file mapped read-only. It has the next_initialized / liquidity_net
+# pair lens.swap_quote reads, both served from the mapped arrays: opening it reads only
+# the header, and a quote only touches the pages of the ticks it crosses, so nothing is
+# built per tick and the pages are shared by every process that maps the same file.
+class MappedTicks:
+    def __init__(self, path: Path):
+        assert sys.byteorder == "little", "tick snapshot files are little-endian"
+        self.path = Path(path)
+        with open(self.path, "rb") as snapshot_file:
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            _,
+            pool_address,
+            self.block_number,
+            tick,
+            self.tick_spacing,
+            self.fee,
+            count,
+            sqrt_price_x96,
+            liquidity,
+        ) = HEADER.unpack_from(self._mmap)
+        assert magic == MAGIC and version == VERSION, f"not a tick snapshot: {path}"
+        self.pool_address = "0x" + pool_address.hex()
+        self.slot0 = Slot0(int.from_bytes(sqrt_price_x96, "little"), tick)
+        self.liquidity = int.from_bytes(liquidity, "little")
+
+        self._view = memoryview(self._mmap)
+        nets_offset = HEADER.size + 4 * count
+        ## sorted initialized ticks, an int32 view of the file
+        self.ticks = self._view[HEADER.size : nets_offset].cast("i")
+        self._liquidity_nets = self._view[
+            nets_offset : nets_offset + LIQUIDITY_NET_SIZE * count
+        ]
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __contains__(self, tick):
+        i = bisect_left(self.ticks, tick)
+        return i < len(self.ticks) and self.ticks[i] == tick
+
+    def __iter__(self):
+        return iter(self.ticks)
+
+    def liquidity_net(self, tick: int) -> int:
+        i = bisect_left(self.ticks, tick)
+        if i == len(self.ticks) or self.ticks[i] != tick:
+            raise KeyError(tick)
+        offset = LIQUIDITY_NET_SIZE * i
+        return int.from_bytes(
+            self._liquidity_nets[offset : offset + LIQUIDITY_NET_SIZE],
+            "little",
+            signed=True,
+        )
+
+    def next_initialized(self, tick: int, lte: bool) -> tuple[int, bool]:
+        return next_initialized_tick(self.ticks, tick, lte)
+
+    def snapshot(self) -> TickSnapshot:
+        # every tick as an in-memory TickSnapshot
+        return TickSnapshot({tick: self.liquidity_net(tick) for tick in self.ticks})
+
+    def close(self) -> None:
+        self.ticks.release()
+        self._liquidity_nets.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return (
+            f"MappedTicks(pool_address={self.pool_address}, "
+            f"block_number={self.block_number}, ticks={len(self.ticks)}, "
+            f"fee={self.fee})"
+        )
@@ -0,0 +1,152 @@
+import threading
+
+from zora_poc.client import POOL_ADDRESS, Client, get_client
+from zora_poc.lens_state import TickSnapshot, next_initialized_tick
+from zora_poc.multicall import aggregate
+from zora_poc.simulator.libraries.Shared import MAX_TICK, MIN_TICK
+
+
+# Initialized ticks of a pool loaded a window at a time, for pools too deep for one
+# getAllTicks call. The pool's tickBitmap is read in pages of words_per_page bitmap words
+# (256 * tickSpacing ticks each), starting with the page around slot0.tick, and the ticks
+# of every set bit in one more multicall. All reads are pinned to the block of the first
+# one, so the loaded ticks are always one consistent state.
+#
+# It has the next_initialized / liquidity_net pair lens.swap_quote reads: a quote that walks
+# past the loaded window loads the next page in its direction first, so quotes are the same
+# as on the full tick set and only the pages they touch are ever fetched.
+# prefetch_in_background loads the remaining pages outward from the current price.
+class WindowedTicks:
+    def __init__(
+        self,
+        pool_address: str = POOL_ADDRESS,
+        words_per_page: int = 1,
+        block_identifier="latest",
+        client: Client | None = None,
+    ):
+        self.client = client or get_client()
+        self.pool_contract = self.client.pool(pool_address)
+        self.words_per_page = words_per_page
+        self._lock = threading.RLock()
+
+        functions = self.pool_contract.functions
+        self.block_number, (slot0, self.liquidity, self.tick_spacing) = aggregate(
+            [functions.slot0(), functions.liquidity(), functions.tickSpacing()],
+            block_identifier,
+            self.client,
+        )
+        self.sqrt_price_x96, self.tick = slot0[0], slot0[1]
+        self.min_word = self.word(MIN_TICK)
+        self.max_word = self.word(MAX_TICK)
+
+        self.ticks = []
+        self.liquidity_nets = {}
+        self.liquidity_grosses = {}
+        ## loaded bitmap words are lo_word..hi_word, both included
+        word = self.word(self.tick)
+        self.lo_word = word
+        self.hi_word = word - 1
+        self.load_words(word - words_per_page // 2, word + (words_per_page - 1) // 2)
+
+    def word(self, tick: int) -> int:
+        # TickBitmap.position of the compressed tick, rounded towards negative infinity
+        return (tick // self.tick_spacing) >> 8
+
+    @property
+    def complete(self) -> bool:
+        return self.lo_word <= self.min_word and self.hi_word >= self.max_word
+
+    def load_words(self, lo_word: int, hi_word: int) -> None:
+        # extend the window to cover lo_word..hi_word, only fetching the missing words
+        with self._lock:
+            lo_word = max(lo_word, self.min_word)
+            hi_word = min(hi_word, self.max_word)
+            words = [
+                w
+                for w in range(lo_word, hi_word + 1)
+                if not self.lo_word <= w <= self.hi_word
+            ]
+            if not words:
+                return
+
+            functions = self.pool_contract.functions
+            _, bitmaps = aggregate(
+                [functions.tickBitmap(w) for w in words], self.block_number, self.client
+            )
+            ticks = [
+                ((w << 8) + bit) * self.tick_spacing
+                for w, bitmap in zip(words, bitmaps)
+                for bit in range(256)
+                if bitmap >> bit & 1
+            ]
+            if ticks:
+                _, infos = aggregate(
+                    [functions.ticks(t) for t in ticks], self.block_number, self.client
+                )
+                for t, info in zip(ticks, infos):
+                    self.liquidity_grosses[t] = info[0]
+                    self.liquidity_nets[t] = info[1]
+                self.ticks = sorted(self.liquidity_nets)
+
+            self.lo_word = min(self.lo_word, lo_word)
+            self.hi_word = max(self.hi_word, hi_word)
+
+    def load_pages_below(self, pages: int = 1) -> None:
+        self.load_words(self.lo_word - pages * self.words_per_page, self.lo_word - 1)
+
+    def load_pages_above(self, pages: int = 1) -> None:
+        self.load_words(self.hi_word + 1, self.hi_word + pages * self.words_per_page)
+
+    def next_initialized(self, tick: int, lte: bool) -> tuple[int, bool]:
+        # same contract as TickSnapshot.next_initialized, loading pages as needed. Every
+        # page that turns out empty doubles the next load, so walking through sparse
+        # words to the end of the tick range takes a logarithmic number of calls.
+        pages = 1
+        while True:
+            with self._lock:
+                word = self.word(tick if lte else tick + 1)
+                if word < self.lo_word:
+                    self.load_words(word, self.lo_word - 1)
+                elif word > self.hi_word:
+                    self.load_words(self.hi_word + 1, word)
+
+                next_tick, initialized = next_initialized_tick(self.ticks, tick, lte)
+                if initialized:
+                    return next_tick, True
+                if lte and self.lo_word <= self.min_word:
+                    return MIN_TICK, False
+                if not lte and self.hi_word >= self.max_word:
+                    return MAX_TICK, False
+                if lte:
+                    self.load_pages_below(pages)
+                else:
+                    self.load_pages_above(pages)
+                pages *= 2
+
+    def liquidity_net(self, tick: int) -> int:
+        return self.liquidity_nets[tick]
+
+    def prefetch_in_background(self) -> threading.Thread:
+        # load the remaining pages, alternating below and above the window and doubling
+        # the number of pages per call
+        def prefetch():
+            pages = 1
+            while not self.complete:
+                self.load_pages_below(pages)
+                self.load_pages_above(pages)
+                pages *= 2
+
+        thread = threading.Thread(target=prefetch, daemon=True)
+        thread.start()
+        return thread
+
+    def snapshot(self) -> TickSnapshot:
+        # the ticks loaded so far, all of them once complete
+        with self._lock:
+            return TickSnapshot(dict(self.liquidity_nets))
+
+    def __repr__(self):
+        return (
+            f"WindowedTicks(block_number={self.block_number}, ticks={len(self.ticks)}, "
+            f"words={self.lo_word}..{self.hi_word} of {self.min_word}..{self.max_word})"
+        )
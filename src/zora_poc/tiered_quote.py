@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+
+from zora_poc.float_depth import FloatDepth
+from zora_poc.lens import CHECKED_KERNEL, FEE, TICK_SPACING, swap_quote
+from zora_poc.simulator.libraries.Shared import MAX_SQRT_RATIO, MIN_SQRT_RATIO
+
+FLOAT_TIER = "float"
+EXACT_TIER = "exact"
+
+
+@dataclass
+class ThresholdQuote:
+    ## whether the output of the swap is at least the threshold
+    meets: bool
+    ## FLOAT_TIER if the float estimate decided it, EXACT_TIER if swap_quote had to run
+    tier: str
+    ## the exact output for EXACT_TIER, the float estimate for FLOAT_TIER
+    amount_out: float
+    ## 0 for EXACT_TIER, the FloatDepth error bound of amount_out for FLOAT_TIER
+    error_bound: float
+
+
+# Exact-input threshold checks (min-out, competing route) on one pool snapshot and
+# direction. The float estimate answers whenever the threshold is outside
+# [amount_out - bound, amount_out + bound]; only the requests where it is inside run the
+# exact Q64.96 swap_quote, so the answer is always the one swap_quote would give.
+class TieredQuoter:
+    def __init__(
+        self,
+        ticks,
+        slot0,
+        liquidity: int,
+        zero_for_one: bool,
+        tick_index=None,
+        kernel=CHECKED_KERNEL,
+        fee: int = FEE,
+        tick_spacing: int = TICK_SPACING,
+    ):
+        # ticks is a lens_state.TickSnapshot
+        self.ticks = ticks
+        self.slot0 = slot0
+        self.liquidity = liquidity
+        self.zero_for_one = zero_for_one
+        self.tick_index = tick_index
+        self.kernel = kernel
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        self.depth = FloatDepth(ticks, slot0, liquidity, zero_for_one, fee)
+
+    def exact_amount_out(self, amount_in: int) -> int:
+        amount0, amount1, _, _, _ = swap_quote(
+            self.ticks,
+            self.slot0,
+            self.liquidity,
+            self.zero_for_one,
+            amount_in,
+            MIN_SQRT_RATIO + 1 if self.zero_for_one else MAX_SQRT_RATIO - 1,
+            self.tick_index,
+            self.kernel,
+            self.fee,
+            self.tick_spacing,
+        )
+        return -amount1 if self.zero_for_one else -amount0
+
+    def decide(self, amount_in: int, threshold: int, amount_out, bound):
+        if amount_out - bound >= threshold:
+            return ThresholdQuote(True, FLOAT_TIER, amount_out, bound)
+        if amount_out + bound < threshold:
+            return ThresholdQuote(False, FLOAT_TIER, amount_out, bound)
+        exact = self.exact_amount_out(amount_in)
+        return ThresholdQuote(exact >= threshold, EXACT_TIER, exact, 0)
+
+    def meets(self, amount_in: int, threshold: int) -> ThresholdQuote:
+        assert amount_in > 0, "AS"
+        amount_out, _, bound = self.depth.quote(amount_in)
+        return self.decide(amount_in, threshold, amount_out, bound)
+
+    def meets_many(self, amounts_in, thresholds) -> list[ThresholdQuote]:
+        # one vectorized float pass for the whole batch (needs numpy), then swap_quote
+        # for the undecided requests only
+        amounts_out, _, bounds = self.depth.quote_many(amounts_in)
+        return [
+            self.decide(amount_in, threshold, float(amount_out), float(bound))
+            for amount_in, threshold, amount_out, bound in zip(
+                amounts_in, thresholds, amounts_out, bounds
+            )
+        ]
+
+    def __repr__(self):
+        return f"TieredQuoter(zero_for_one={self.zero_for_one}, depth={self.depth})"
@@ -0,0 +1,47 @@
+import random
+
+from zora_poc.lens import Slot0
+from zora_poc.simulator.libraries import TickMath
+from zora_poc.simulator.libraries.Shared import MAX_TICK, MIN_TICK, TickInfo
+
+# Random inputs for the quote tests, kept apart from the ones zora_poc.benchmarks times
+# so that changing a benchmark's workload does not change what the tests check.
+
+
+def random_swap_step_inputs(rnd: random.Random) -> tuple:
+    # (sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, amountRemaining, feePips) of
+    # computeSwapStep, magnitudes drawn log-uniformly so that tiny and huge values both
+    # show up
+    sqrt_price = TickMath.getSqrtRatioAtTick(rnd.randint(MIN_TICK, MAX_TICK - 1))
+    sqrt_target = TickMath.getSqrtRatioAtTick(rnd.randint(MIN_TICK, MAX_TICK - 1))
+    if rnd.random() < 0.5:
+        sqrt_target = sqrt_price + rnd.randint(
+            -(2 ** rnd.randint(0, 96)), 2 ** rnd.randint(0, 96)
+        )
+        sqrt_target = min(
+            max(sqrt_target, TickMath.MIN_SQRT_RATIO), TickMath.MAX_SQRT_RATIO
+        )
+    liquidity = rnd.randrange(2 ** rnd.randint(0, 128))
+    amount = rnd.randrange(2 ** rnd.randint(0, 200)) * rnd.choice((1, -1))
+    fee = rnd.choice((100, 500, 3000, 10000))
+    return (sqrt_price, sqrt_target, liquidity, amount, fee)
+
+
+def random_pool(rnd: random.Random, positions: int, tick_spacing: int = 200) -> tuple:
+    # (ticks mapping, slot0, liquidity) of a pool with random positions around the price
+    ticks = {}
+    current_tick = rnd.randrange(-50_000, 50_000)
+    for _ in range(positions):
+        lower = (current_tick // tick_spacing + rnd.randrange(-300, 300)) * tick_spacing
+        upper = lower + tick_spacing * rnd.randrange(1, 200)
+        amount = rnd.randrange(10**15, 10**22)
+        for tick, delta in ((lower, amount), (upper, -amount)):
+            info = ticks.setdefault(tick, TickInfo(0, 0, 0, 0))
+            info.liquidityGross += amount
+            info.liquidityNet += delta
+    liquidity = sum(
+        info.liquidityNet for tick, info in ticks.items() if tick <= current_tick
+    )
+    sqrt_price = TickMath.getSqrtRatioAtTick(current_tick) + rnd.randrange(10**20)
+    slot0 = Slot0(sqrt_price, TickMath.getTickAtSqrtRatio(sqrt_price))
+    return ticks, slot0, liquidity
@@ -0,0 +1,436 @@
+import asyncio
+from collections import Counter
+from hashlib import sha256
+import random
+
+from eth_abi import decode, encode
+from eth_utils.abi import (
+    function_abi_to_4byte_selector,
+    get_abi_input_types,
+    get_abi_output_types,
+)
+from web3 import Web3
+from web3.providers.async_base import AsyncBaseProvider
+from web3.providers.base import BaseProvider
+
+from zora_poc.client import (
+    LENS_ADDRESS,
+    MULTICALL3_ABI,
+    MULTICALL3_ADDRESS,
+    UNISWAP_V3_LENS_ABI,
+    UNISWAP_V3_POOL_ABI,
+    Client,
+    load_abi,
+)
+from zora_poc.events import BURN_TOPIC, MINT_TOPIC, SWAP_TOPIC
+from zora_poc.simulator.libraries import TickMath
+
+# A local stand-in for a Base node. StubChain is an in-memory chain of blocks on which
+# Uniswap V3 pools change through Mint/Burn/Swap events. It serves the JSON-RPC methods
+# zora_poc uses, through StubProvider (Web3) and AsyncStubProvider (AsyncWeb3):
+# eth_blockNumber, eth_getBlockByNumber, eth_getLogs, and eth_call to the pools, the lens
+# and Multicall3, evaluated at the block they are pinned to. The pool model here is written
+# independently of lens_state.TickBook, so ingestion tests can compare against it.
+
+OWNER = "0x" + "11" * 20
+POOL_ADDRESSES = [
+    Web3.to_checksum_address("0x" + f"{i:02x}" * 20) for i in (0xA1, 0xB2, 0xC3)
+]
+ZERO_HASH = "0x" + "00" * 32
+
+
+class StubRPCError(Exception):
+    # answered as a JSON-RPC error, web3 raises it as Web3RPCError
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class StubPool:
+    def __init__(self, address, token0, token1, fee, tick_spacing, tick=0):
+        self.address = address
+        self.token0 = token0
+        self.token1 = token1
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        ## tick => [liquidityGross, liquidityNet]
+        self.ticks = {}
+        ## (tick_lower, tick_upper) => liquidity of the positions minted on the pool
+        self.positions = {}
+        self.sqrt_price_x96 = TickMath.getSqrtRatioAtTick(tick)
+        self.tick = tick
+        self.liquidity = 0
+
+    def copy(self) -> "StubPool":
+        pool = StubPool.__new__(StubPool)
+        pool.__dict__.update(self.__dict__)
+        pool.ticks = {tick: list(info) for tick, info in self.ticks.items()}
+        pool.positions = dict(self.positions)
+        return pool
+
+    def modify_position(self, tick_lower: int, tick_upper: int, delta: int) -> None:
+        for tick, net in ((tick_lower, delta), (tick_upper, -delta)):
+            info = self.ticks.setdefault(tick, [0, 0])
+            info[0] += delta
+            info[1] += net
+            assert info[0] >= 0
+            if info[0] == 0:
+                del self.ticks[tick]
+        if tick_lower <= self.tick < tick_upper:
+            self.liquidity += delta
+        amount = self.positions.get((tick_lower, tick_upper), 0) + delta
+        assert amount >= 0
+        if amount:
+            self.positions[(tick_lower, tick_upper)] = amount
+        else:
+            del self.positions[(tick_lower, tick_upper)]
+
+    def swap_to(self, tick: int) -> None:
+        # moves the price to a random point of `tick`, the active liquidity follows
+        self.tick = tick
+        self.sqrt_price_x96 = TickMath.getSqrtRatioAtTick(tick) + 1
+        self.liquidity = sum(net for t, (_, net) in self.ticks.items() if t <= tick)
+
+    def state(self) -> tuple:
+        # (sqrtPriceX96, liquidity, tick, {tick: (liquidityGross, liquidityNet)})
+        ticks = {tick: tuple(info) for tick, info in self.ticks.items()}
+        return self.sqrt_price_x96, self.liquidity, self.tick, ticks
+
+    def tick_bitmap(self, word: int) -> int:
+        bitmap = 0
+        for tick in self.ticks:
+            compressed = tick // self.tick_spacing
+            if compressed >> 8 == word:
+                bitmap |= 1 << (compressed & 255)
+        return bitmap
+
+
+def random_event(rnd: random.Random, pool: StubPool) -> tuple:
+    # a Mint around the price, a Burn of part of a position or a Swap near the price,
+    # applied to pool and returned in the form StubChain.mine takes
+    spacing = pool.tick_spacing
+    kind = rnd.choice(("mint", "mint", "burn", "swap", "swap"))
+    if kind == "burn" and pool.positions:
+        tick_lower, tick_upper = rnd.choice(sorted(pool.positions))
+        amount = pool.positions[(tick_lower, tick_upper)]
+        amount = rnd.choice((amount, rnd.randrange(1, amount + 1)))
+        pool.modify_position(tick_lower, tick_upper, -amount)
+        return (pool.address, "burn", tick_lower, tick_upper, amount)
+    if kind == "swap":
+        tick = pool.tick + rnd.randrange(-30 * spacing, 30 * spacing)
+        pool.swap_to(tick)
+        return (pool.address, "swap", tick)
+    tick_lower = (pool.tick // spacing + rnd.randrange(-20, 20)) * spacing
+    tick_upper = tick_lower + spacing * rnd.randrange(1, 20)
+    amount = rnd.randrange(10**15, 10**21)
+    pool.modify_position(tick_lower, tick_upper, amount)
+    return (pool.address, "mint", tick_lower, tick_upper, amount)
+
+
+class Block:
+    def __init__(self, number, block_hash, parent_hash, logs, pools):
+        self.number = number
+        self.hash = block_hash
+        self.parent_hash = parent_hash
+        self.logs = logs
+        ## address (lower case) => StubPool after the block
+        self.pools = pools
+
+
+def word(value: int) -> str:
+    return "0x" + (value % 2**256).to_bytes(32, "big").hex()
+
+
+class StubChain:
+    def __init__(self, pools: list[StubPool], max_logs: int | None = None):
+        self.fork = 0
+        genesis = {pool.address.lower(): pool for pool in pools}
+        self.blocks = [Block(0, self.block_hash(0), ZERO_HASH, [], genesis)]
+        ## get_logs answers with a result limit error above this many logs
+        self.max_logs = max_logs
+        ## called with (method, params) before every request, may raise or change the
+        ## chain, e.g. to inject provider errors or reorganize it between two requests
+        self.hooks = []
+        self.requests = []
+        self.contracts = {
+            MULTICALL3_ADDRESS.lower(): self.functions(MULTICALL3_ABI),
+            LENS_ADDRESS.lower(): self.functions(UNISWAP_V3_LENS_ABI),
+        }
+        self.pool_functions = self.functions(UNISWAP_V3_POOL_ABI)
+
+    def block_hash(self, number: int) -> str:
+        return "0x" + sha256(f"{self.fork}:{number}".encode()).hexdigest()
+
+    @staticmethod
+    def functions(abi_name: str) -> dict:
+        # 4 byte selector => function ABI
+        return {
+            function_abi_to_4byte_selector(function): function
+            for function in load_abi(abi_name)
+            if function["type"] == "function"
+        }
+
+    @property
+    def head(self) -> int:
+        return self.blocks[-1].number
+
+    def pool(self, address: str, block_number: int | None = None) -> StubPool:
+        block = self.blocks[self.head if block_number is None else block_number]
+        return block.pools[address.lower()]
+
+    def mine(self, events=()) -> Block:
+        # a new block with events (pool address, "mint"/"burn", tick_lower, tick_upper,
+        # amount) or (pool address, "swap", tick), applied in order
+        parent = self.blocks[-1]
+        number = parent.number + 1
+        block_hash = self.block_hash(number)
+        pools = dict(parent.pools)
+        logs = []
+        for address, kind, *args in events:
+            pool = pools[address.lower()] = pools[address.lower()].copy()
+            if kind == "swap":
+                (tick,) = args
+                pool.swap_to(tick)
+                topics = [SWAP_TOPIC, word(int(OWNER, 16)), word(int(OWNER, 16))]
+                data = encode(
+                    ["int256", "int256", "uint160", "uint128", "int24"],
+                    [-1, 1, pool.sqrt_price_x96, pool.liquidity, pool.tick],
+                )
+            else:
+                tick_lower, tick_upper, amount = args
+                delta = amount if kind == "mint" else -amount
+                pool.modify_position(tick_lower, tick_upper, delta)
+                topics = [MINT_TOPIC if kind == "mint" else BURN_TOPIC]
+                topics += [word(int(OWNER, 16)), word(tick_lower), word(tick_upper)]
+                types = ["uint128", "uint256", "uint256"]
+                values = [amount, amount // 3, amount // 5]
+                if kind == "mint":
+                    types = ["address"] + types
+                    values = [OWNER] + values
+                data = encode(types, values)
+            logs.append(
+                {
+                    "address": address,
+                    "topics": topics,
+                    "data": "0x" + data.hex(),
+                    "blockNumber": hex(number),
+                    "blockHash": block_hash,
+                    "transactionHash": word(len(logs) + (number << 32)),
+                    "transactionIndex": hex(len(logs)),
+                    "logIndex": hex(len(logs)),
+                    "removed": False,
+                }
+            )
+        block = Block(number, block_hash, parent.hash, logs, pools)
+        self.blocks.append(block)
+        return block
+
+    def mine_random(self, rnd: random.Random, blocks: int, max_events: int = 4) -> None:
+        # blocks with up to max_events random events of random pools each
+        for _ in range(blocks):
+            pools = {
+                address: pool.copy() for address, pool in self.blocks[-1].pools.items()
+            }
+            self.mine(
+                [
+                    random_event(rnd, pools[rnd.choice(sorted(pools))])
+                    for _ in range(rnd.randrange(max_events + 1))
+                ]
+            )
+
+    def reorganize(self, block_number: int) -> None:
+        # drops every block after block_number, the blocks mined next get new hashes
+        del self.blocks[block_number + 1 :]
+        self.fork += 1
+
+    def block_number(self, block_identifier) -> int:
+        if isinstance(block_identifier, dict):
+            block_identifier = block_identifier.get(
+                "blockHash", block_identifier.get("blockNumber")
+            )
+        if block_identifier in ("latest", "safe", "finalized", "pending"):
+            return self.head
+        if block_identifier == "earliest":
+            return 0
+        if len(block_identifier) == 66:
+            for block in self.blocks:
+                if block.hash == block_identifier:
+                    return block.number
+            raise StubRPCError(-32000, "header for hash not found")
+        number = int(block_identifier, 16)
+        if number > self.head:
+            raise StubRPCError(-32000, "header not found")
+        return number
+
+    def get_logs(self, filter_params: dict) -> list:
+        from_block = self.block_number(filter_params.get("fromBlock", "latest"))
+        to_block = self.block_number(filter_params.get("toBlock", "latest"))
+        addresses = filter_params.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        if addresses is not None:
+            addresses = {address.lower() for address in addresses}
+        topics = filter_params.get("topics") or [None]
+        topic0 = topics[0]
+        if isinstance(topic0, str):
+            topic0 = [topic0]
+        logs = [
+            log
+            for block in self.blocks[from_block : to_block + 1]
+            for log in block.logs
+            if (addresses is None or log["address"].lower() in addresses)
+            and (topic0 is None or log["topics"][0] in topic0)
+        ]
+        if self.max_logs is not None and len(logs) > self.max_logs:
+            raise StubRPCError(
+                -32005, f"query returned more than {self.max_logs} results"
+            )
+        return logs
+
+    def get_block(self, block_identifier) -> dict | None:
+        try:
+            block = self.blocks[self.block_number(block_identifier)]
+        except StubRPCError:
+            return None
+        return {
+            "number": hex(block.number),
+            "hash": block.hash,
+            "parentHash": block.parent_hash,
+            "timestamp": hex(1_700_000_000 + 2 * block.number),
+            "transactions": [],
+        }
+
+    def call(self, transaction: dict, block_identifier) -> str:
+        block = self.blocks[self.block_number(block_identifier)]
+        data = bytes.fromhex(transaction["data"][2:])
+        return "0x" + self.execute(block, transaction["to"], data).hex()
+
+    def execute(self, block: Block, to: str, data: bytes) -> bytes:
+        pool = block.pools.get(to.lower())
+        functions = self.pool_functions if pool else self.contracts.get(to.lower())
+        function = (functions or {}).get(data[:4])
+        if function is None:
+            raise StubRPCError(3, "execution reverted")
+        args = decode(get_abi_input_types(function), data[4:])
+        name = function["name"]
+        if name == "aggregate3":
+            results = []
+            for target, allow_failure, call_data in args[0]:
+                results.append((True, self.execute(block, target, call_data)))
+            values = [results]
+        elif name == "getBlockNumber":
+            values = [block.number]
+        elif name == "getBlockHash":
+            (number,) = args
+            # like BLOCKHASH, only the 256 blocks before the current one
+            known = block.number - 256 <= number < block.number
+            values = [bytes.fromhex(self.blocks[number].hash[2:]) if known else b""]
+        elif name == "getAllTicks":
+            pool = block.pools[args[0].lower()]
+            values = [[(tick, *pool.ticks[tick]) for tick in sorted(pool.ticks)]]
+        elif name == "slot0":
+            values = [pool.sqrt_price_x96, pool.tick, 0, 1, 1, 0, True]
+        elif name == "ticks":
+            gross, net = pool.ticks.get(args[0], (0, 0))
+            values = [gross, net, 0, 0, 0, 0, 0, gross > 0]
+        elif name == "tickBitmap":
+            values = [pool.tick_bitmap(args[0])]
+        elif name in ("token0", "token1", "fee", "liquidity"):
+            values = [getattr(pool, name)]
+        elif name == "tickSpacing":
+            values = [pool.tick_spacing]
+        else:
+            raise StubRPCError(3, "execution reverted")
+        return encode(get_abi_output_types(function), values)
+
+    def handle(self, method: str, params) -> object:
+        self.requests.append((method, params))
+        for hook in list(self.hooks):
+            hook(method, params)
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        if method == "eth_chainId":
+            return hex(8453)
+        if method == "web3_clientVersion":
+            return "stub"
+        if method == "eth_getBlockByNumber" or method == "eth_getBlockByHash":
+            return self.get_block(params[0])
+        if method == "eth_getLogs":
+            return self.get_logs(params[0])
+        if method == "eth_call":
+            return self.call(params[0], params[1])
+        raise StubRPCError(-32601, f"method {method} not supported")
+
+    def count(self, method: str) -> int:
+        return sum(1 for m, _ in self.requests if m == method)
+
+    def response(self, method: str, params) -> dict:
+        try:
+            return {"jsonrpc": "2.0", "id": 0, "result": self.handle(method, params)}
+        except StubRPCError as error:
+            return {
+                "jsonrpc": "2.0",
+                "id": 0,
+                "error": {"code": error.code, "message": error.message},
+            }
+
+
+class StubProvider(BaseProvider):
+    def __init__(self, chain: StubChain):
+        super().__init__()
+        self.chain = chain
+
+    def make_request(self, method, params):
+        return self.chain.response(method, params)
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+
+# Every request yields to the event loop for latency seconds plus up to jitter seconds, so
+# concurrent requests are really in flight together and complete in a random order;
+# in_flight / max_in_flight count them per method.
+class AsyncStubProvider(AsyncBaseProvider):
+    def __init__(self, chain: StubChain, latency: float = 0.0, jitter: float = 0.0):
+        super().__init__()
+        self.chain = chain
+        self.latency = latency
+        self.jitter = jitter
+        self.rnd = random.Random(0)
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+
+    async def make_request(self, method, params):
+        self.in_flight[method] += 1
+        self.max_in_flight[method] = max(
+            self.max_in_flight[method], self.in_flight[method]
+        )
+        try:
+            await asyncio.sleep(self.latency + self.jitter * self.rnd.random())
+            return self.chain.response(method, params)
+        finally:
+            self.in_flight[method] -= 1
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+
+def random_chain(seed: int, blocks: int = 300, **kwargs) -> StubChain:
+    # the three POOL_ADDRESSES pools (fee 3000) after `blocks` blocks of random events
+    rnd = random.Random(seed)
+    pools = [
+        StubPool(address, POOL_ADDRESSES[0], POOL_ADDRESSES[1], 3000, 60)
+        for address in POOL_ADDRESSES
+    ]
+    chain = StubChain(pools, **kwargs)
+    chain.mine_random(rnd, blocks)
+    return chain
+
+
+def stub_client(chain: StubChain, latency: float = 0.0, jitter: float = 0.0) -> Client:
+    return Client(
+        "stub",
+        provider=StubProvider(chain),
+        async_provider=AsyncStubProvider(chain, latency, jitter),
+    )
@@ -0,0 +1,98 @@
+import random
+
+from eth_abi import encode
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from zora_poc.client import UNISWAP_V3_POOL_ABI, load_abi
+from zora_poc.events import (
+    BURN_TOPIC,
+    MINT_TOPIC,
+    SWAP_TOPIC,
+    BurnEvent,
+    MintEvent,
+    decode_log,
+    decode_logs,
+)
+from zora_poc.simulator.libraries.Shared import MAX_TICK, MIN_TICK
+
+
+def word(value: int) -> HexBytes:
+    return HexBytes((value % 2**256).to_bytes(32, "big"))
+
+
+def random_pool_logs(rnd: random.Random, count: int) -> list:
+    # raw Mint/Burn/Swap logs as get_logs returns them, with values over the full range
+    # of every field
+    logs = []
+    for i in range(count):
+        kind = rnd.choice((MINT_TOPIC, BURN_TOPIC, SWAP_TOPIC))
+        owner = "0x" + rnd.randbytes(20).hex()
+        if kind == SWAP_TOPIC:
+            topics = [HexBytes(kind), word(int(owner, 16)), word(rnd.getrandbits(160))]
+            data = encode(
+                ["int256", "int256", "uint160", "uint128", "int24"],
+                [
+                    rnd.randint(-(2**255), 2**255 - 1),
+                    rnd.randint(-(2**255), 2**255 - 1),
+                    rnd.getrandbits(160),
+                    rnd.getrandbits(128),
+                    rnd.choice((MIN_TICK, MAX_TICK, rnd.randint(MIN_TICK, MAX_TICK))),
+                ],
+            )
+        else:
+            tick_lower = rnd.choice((MIN_TICK, rnd.randint(MIN_TICK, MAX_TICK - 1)))
+            tick_upper = rnd.choice((MAX_TICK, rnd.randint(tick_lower + 1, MAX_TICK)))
+            topics = [HexBytes(kind), word(int(owner, 16))]
+            topics += [word(tick_lower), word(tick_upper)]
+            amounts = [rnd.getrandbits(128), rnd.getrandbits(256), rnd.getrandbits(256)]
+            if kind == MINT_TOPIC:
+                data = encode(
+                    ["address", "uint128", "uint256", "uint256"], [owner, *amounts]
+                )
+            else:
+                data = encode(["uint128", "uint256", "uint256"], amounts)
+        logs.append(
+            AttributeDict(
+                {
+                    "address": "0xE020E67Cb76C780329d4c205578Aaa6d6478Fb2A",
+                    "topics": topics,
+                    "data": HexBytes(data),
+                    "blockNumber": 30_000_000 + i // 4,
+                    "logIndex": i % 4,
+                    "transactionIndex": 0,
+                    "transactionHash": HexBytes(rnd.randbytes(32)),
+                    "blockHash": HexBytes(rnd.randbytes(32)),
+                    "removed": False,
+                }
+            )
+        )
+    return logs
+
+
+def test_decode_log_equals_web3_process_log():
+    rnd = random.Random(0)
+    logs = random_pool_logs(rnd, 3_000)
+    events = Web3().eth.contract(abi=load_abi(UNISWAP_V3_POOL_ABI)).events
+    abi_events = {
+        MINT_TOPIC: events.Mint(),
+        BURN_TOPIC: events.Burn(),
+        SWAP_TOPIC: events.Swap(),
+    }
+    for log in logs:
+        args = abi_events[log["topics"][0].to_0x_hex()].process_log(log)["args"]
+        event = decode_log(log)
+        if isinstance(event, (MintEvent, BurnEvent)):
+            expected = (args["tickLower"], args["tickUpper"], args["amount"])
+            expected += (args["amount0"], args["amount1"])
+        else:
+            expected = (args["amount0"], args["amount1"], args["sqrtPriceX96"])
+            expected += (args["liquidity"], args["tick"])
+        expected = (log["blockNumber"], log["logIndex"], *expected)
+        assert tuple(event) == expected, log
+
+    # other events are skipped
+    other = AttributeDict({**logs[0], "topics": [word(1), *logs[0]["topics"][1:]]})
+    assert decode_log(other) is None
+    assert decode_logs([other, *logs, other]) == list(map(decode_log, logs))
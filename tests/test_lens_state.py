@@ -0,0 +1,62 @@
+import random
+
+from zora_poc.lens_state import TickIndex, next_initialized_tick
+from zora_poc.simulator.libraries.Shared import MAX_TICK, MIN_TICK
+
+
+def reference_next(ticks, tick, lte):
+    if lte:
+        below = [t for t in ticks if t <= tick]
+        return (max(below), True) if below else (MIN_TICK, False)
+    above = [t for t in ticks if t > tick]
+    return (min(above), True) if above else (MAX_TICK, False)
+
+
+def test_next_initialized_tick_edges():
+    ticks = [MIN_TICK, -256 * 60, -60, 0, 255 * 60, 256 * 60, MAX_TICK]
+    probes = {MIN_TICK, MAX_TICK, MIN_TICK + 1, MAX_TICK - 1}
+    for t in ticks:
+        probes |= {t - 1, t, t + 1}
+    for tick in sorted(probes):
+        for lte in (True, False):
+            assert next_initialized_tick(ticks, tick, lte) == reference_next(
+                ticks, tick, lte
+            ), (tick, lte)
+    assert next_initialized_tick([], 0, True) == (MIN_TICK, False)
+    assert next_initialized_tick([], 0, False) == (MAX_TICK, False)
+    assert next_initialized_tick([5], 5, False) == (MAX_TICK, False)
+    assert next_initialized_tick([5], 4, True) == (MIN_TICK, False)
+
+
+def test_tick_index_insert_remove():
+    # random inserts and removes around word boundaries (256 spacings) and the range
+    # ends, against a set
+    rnd = random.Random(3)
+    for tick_spacing in (1, 60, 200):
+        index = TickIndex()
+        ticks = set()
+        candidates = [MIN_TICK, MAX_TICK]
+        for word in (-2, -1, 0, 1):
+            edge = word * 256 * tick_spacing
+            candidates += [edge - tick_spacing, edge, edge + tick_spacing]
+        for _ in range(2_000):
+            tick = rnd.choice(candidates)
+            if rnd.random() < 0.5:
+                index.insert(tick)
+                ticks.add(tick)
+            else:
+                index.remove(tick)
+                ticks.discard(tick)
+            assert list(index) == sorted(ticks)
+            assert len(index) == len(ticks)
+            probe = rnd.choice(candidates) + rnd.choice((-1, 0, 1))
+            assert (probe in index) == (probe in ticks)
+            for lte in (True, False):
+                assert index.next_initialized(probe, lte) == reference_next(
+                    ticks, probe, lte
+                )
+    # inserting twice and removing a missing tick are no-ops
+    index = TickIndex([0, 60])
+    index.insert(60)
+    index.remove(120)
+    assert list(index) == [0, 60]
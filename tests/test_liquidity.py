@@ -0,0 +1,278 @@
+import asyncio
+from functools import partial
+import random
+
+import pytest
+from stub_node import POOL_ADDRESSES, StubChain, random_chain, stub_client
+
+from zora_poc import client as client_module
+from zora_poc import liquidity
+from zora_poc.archive import EventArchive
+from zora_poc.backfill import backfill
+from zora_poc.checkpoint import Checkpoint
+from zora_poc.events import POOL_EVENT_TOPICS
+from zora_poc.lens_state import TickBook
+from zora_poc.pools import PoolRegistry
+from zora_poc.tailer import LogTailer, RangeSizer
+
+
+class Stop(Exception):
+    pass
+
+
+class Crash(Exception):
+    pass
+
+
+def book_state(book) -> tuple:
+    # in the form of StubPool.state()
+    ticks = {
+        tick: (info.liquidityGross, info.liquidityNet)
+        for tick, info in book.ticks.items()
+    }
+    return book.sqrt_price_x96, book.liquidity, book.tick, ticks
+
+
+def assert_pools_match(chain: StubChain, pools) -> None:
+    for pool in pools:
+        assert pool.state.block_number == chain.head
+        assert book_state(pool.book) == chain.pool(pool.info.address).state()
+
+
+def restart(monkeypatch) -> None:
+    # a new process: nothing in memory but what the checkpoint files hold
+    monkeypatch.setattr(
+        liquidity, "registry", PoolRegistry(journal_depth=liquidity.REORG_DEPTH)
+    )
+    monkeypatch.setattr(
+        liquidity, "range_sizer", RangeSizer(initial_size=16, max_size=16)
+    )
+    monkeypatch.setattr(liquidity, "last_checkpoint_time", 0.0)
+
+
+def run_until_caught_up(chain: StubChain, **kwargs) -> list:
+    # main_pools on the stub node, stopped once every pool is at the head
+    def stop(method, params):
+        if method == "eth_blockNumber" and all(
+            pool.state.block_number == chain.head for pool in liquidity.registry
+        ):
+            raise Stop
+
+    chain.hooks.append(stop)
+    try:
+        with pytest.raises(Stop):
+            liquidity.main_pools(POOL_ADDRESSES, **kwargs)
+    finally:
+        chain.hooks.remove(stop)
+    return [liquidity.registry[address] for address in POOL_ADDRESSES]
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch) -> StubChain:
+    # a random chain of the three pools as the default client, checkpoints in tmp_path
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(liquidity, "CHECKPOINT_INTERVAL", 0)
+    restart(monkeypatch)
+    chain = random_chain(10)
+    monkeypatch.setattr(client_module, "_default_client", stub_client(chain))
+    return chain
+
+
+@pytest.mark.parametrize("save_on_exit", [True, False])
+def test_exactly_once_across_crash_and_resume(node, monkeypatch, save_on_exit):
+    # Crashes in the middle of ranges, then restarts from the checkpoints: with
+    # save_on_exit the checkpoint holds the logs of the crashed range applied so far,
+    # without it (a killed process) the one saved after the last complete range
+    chain = node
+    handle_log = liquidity.handle_log
+    save_pools = liquidity.save_pools
+    applied = 0
+    crash_at = [170, 90, 35]
+    crashed = False
+
+    def crashing_handle_log(state, log):
+        nonlocal applied, crashed
+        if not state.is_applied(log):
+            if crash_at and applied == crash_at[-1]:
+                crash_at.pop()
+                crashed = True
+                raise Crash
+            applied += 1
+        handle_log(state, log)
+
+    def save_unless_killed(pools):
+        if save_on_exit or not crashed:
+            save_pools(pools)
+
+    monkeypatch.setattr(liquidity, "handle_log", crashing_handle_log)
+    monkeypatch.setattr(liquidity, "save_pools", save_unless_killed)
+    runs = 0
+    while True:
+        runs += 1
+        restart(monkeypatch)
+        crashed = False
+        try:
+            pools = run_until_caught_up(chain, replay=True, start_block=1)
+            break
+        except Crash:
+            pass
+    assert runs == 4
+    assert_pools_match(chain, pools)
+    for pool in pools:
+        assert Checkpoint.load(liquidity.checkpoint_path(pool.info.address))
+    if save_on_exit:
+        # every event was applied once, either before the crash it belongs to or after
+        assert applied == sum(len(block.logs) for block in chain.blocks)
+
+
+def test_rollback_equals_replay_to_the_ancestor(node, monkeypatch):
+    # reorgs while the pools are ingested: after each rollback the books are the stub
+    # pools' state at the common ancestor, and at the end the state of the new chain. The
+    # reorgs land anywhere in the chain, so every block is within REORG_DEPTH.
+    chain = node
+    monkeypatch.setattr(liquidity, "REORG_DEPTH", 512)
+    restart(monkeypatch)
+    rnd = random.Random(11)
+    rollback = liquidity.rollback
+    ancestors = []
+
+    def checked_rollback(pools, block_number):
+        rollback(pools, block_number)
+        ancestors.append(block_number)
+        for pool in pools:
+            assert pool.state.block_number == block_number
+            state = chain.pool(pool.info.address, block_number).state()
+            assert book_state(pool.book) == state
+
+    reorg_points = [0]
+
+    def reorganize(method, params):
+        # four times, 1 to 12 blocks below the last ingested block, once the pools are
+        # 24 blocks past the previous reorg
+        if method == "eth_getLogs" and len(reorg_points) <= 4:
+            last = min(pool.state.block_number for pool in liquidity.registry)
+            if last >= reorg_points[-1] + 24:
+                head = chain.head
+                reorg_points.append(last - rnd.randrange(1, 13))
+                chain.reorganize(reorg_points[-1])
+                chain.mine_random(rnd, head - chain.head)
+
+    monkeypatch.setattr(liquidity, "rollback", checked_rollback)
+    chain.hooks.append(reorganize)
+    pools = run_until_caught_up(chain, replay=True, start_block=1)
+
+    assert len(ancestors) == 4
+    assert_pools_match(chain, pools)
+
+
+def test_bootstrap_then_tail_equals_replay(node):
+    # new pools start from one snapshot per pool, all at the block REORG_DEPTH below the
+    # head and pinned to its hash, then follow the events after it
+    chain = node
+    calls = []
+    chain.hooks.append(
+        lambda method, params: calls.append(params[1]) if method == "eth_call" else None
+    )
+    pools = run_until_caught_up(chain)
+
+    block_number = chain.head - liquidity.REORG_DEPTH
+    block_hash = chain.blocks[block_number].hash
+    # the registry's eth_call, then one snapshot per pool
+    assert calls[1:4] == [block_hash] * 3
+    for pool in pools:
+        assert pool.book.journal_floor == block_number
+        assert pool.state.block_hashes[chain.head] == chain.blocks[-1].hash
+    assert_pools_match(chain, pools)
+
+
+def test_backfill_equals_sequential_replay():
+    # deltas of ranges fetched by worker processes, merged, against every event applied
+    # in order
+    chain = random_chain(12, blocks=400)
+    for address in POOL_ADDRESSES:
+        replayed = Checkpoint(0, book=TickBook())
+        tailer = LogTailer(
+            address,
+            POOL_EVENT_TOPICS,
+            1,
+            partial(liquidity.handle_log, replayed),
+            client=stub_client(chain),
+        )
+        asyncio.run(tailer.run(stop_block=chain.head))
+        backfilled = backfill(
+            address,
+            1,
+            chain.head,
+            workers=2,
+            ranges_per_worker=5,
+            journal_depth=liquidity.REORG_DEPTH,
+            client_factory=partial(stub_client, chain),
+        )
+
+        assert book_state(backfilled.book) == book_state(replayed.book)
+        assert book_state(backfilled.book) == chain.pool(address).state()
+        assert backfilled.block_number == chain.head
+        assert backfilled.block_hash == chain.blocks[-1].hash
+        assert backfilled.watermark == (chain.head + 1, -1)
+
+
+def test_replay_archive_equals_live_ingestion(node, monkeypatch, tmp_path):
+    # pools replayed from the event archive up to the safe block, then tailed, end up
+    # with the books of pools ingested from the node alone
+    chain = node
+    live = run_until_caught_up(chain, replay=True, start_block=1)
+    live_states = [book_state(pool.book) for pool in live]
+    for pool in live:
+        (tmp_path / liquidity.checkpoint_path(pool.info.address)).unlink()
+
+    restart(monkeypatch)
+    archive_root = str(tmp_path / "archive")
+    archived = run_until_caught_up(
+        chain, replay=True, start_block=1, archive_root=archive_root
+    )
+    assert [book_state(pool.book) for pool in archived] == live_states
+    assert_pools_match(chain, archived)
+    archive = EventArchive(archive_root)
+    safe_block_number = chain.head - liquidity.REORG_DEPTH
+    assert all(archive.head(address) == safe_block_number for address in POOL_ADDRESSES)
+
+    # a restart without checkpoints replays the archive and only fetches the blocks
+    # after it
+    for pool in archived:
+        (tmp_path / liquidity.checkpoint_path(pool.info.address)).unlink()
+    restart(monkeypatch)
+    requests = len(chain.requests)
+    replayed = run_until_caught_up(
+        chain, replay=True, start_block=1, archive_root=archive_root
+    )
+    assert [book_state(pool.book) for pool in replayed] == live_states
+    assert all(
+        int(params[0]["fromBlock"], 16) > safe_block_number
+        for method, params in chain.requests[requests:]
+        if method == "eth_getLogs"
+    )
+
+
+def test_archive_replay_rejects_workers(node):
+    archive = EventArchive("archive")
+    pool = liquidity.registry.load(POOL_ADDRESSES[:1])[0]
+    with pytest.raises(AssertionError, match="single tailer"):
+        liquidity.resume(pool, True, 1, workers=2, archive=archive)
+
+
+def test_bootstrap_leaves_the_archive_alone(node, tmp_path):
+    # without replay, pools start from snapshots: the archive is neither extended from
+    # start_block nor read, and get_logs only covers the blocks after the safe block
+    chain = node
+    archive_root = str(tmp_path / "archive")
+    pools = run_until_caught_up(chain, start_block=1, archive_root=archive_root)
+
+    assert_pools_match(chain, pools)
+    archive = EventArchive(archive_root)
+    assert all(archive.head(address) is None for address in POOL_ADDRESSES)
+    safe_block_number = chain.head - liquidity.REORG_DEPTH
+    assert all(
+        int(params[0]["fromBlock"], 16) > safe_block_number
+        for method, params in chain.requests
+        if method == "eth_getLogs"
+    )
@@ -0,0 +1,98 @@
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+from stub_node import StubChain, StubPool, stub_client
+
+from zora_poc.client import POOL_ADDRESS
+from zora_poc.lens import fetch_pool_snapshot, fetch_pool_state
+from zora_poc.multicall import aggregate
+
+TOKEN0 = "0x4200000000000000000000000000000000000006"
+TOKEN1 = "0x" + "22" * 20
+
+
+def pool_chain() -> StubChain:
+    # POOL_ADDRESS with a few positions, changing in every block
+    chain = StubChain([StubPool(POOL_ADDRESS, TOKEN0, TOKEN1, 10000, 200, -100)])
+    chain.mine([(POOL_ADDRESS, "mint", -1000, 1000, 10**18)])
+    chain.mine([(POOL_ADDRESS, "mint", -400, 600, 5 * 10**17)])
+    chain.mine([(POOL_ADDRESS, "swap", 450)])
+    chain.mine([(POOL_ADDRESS, "burn", -1000, 1000, 4 * 10**17)])
+    return chain
+
+
+def test_lens_import_does_not_load_web3():
+    # quoting processes never pay for web3 or eth_utils
+    code = (
+        "import sys, zora_poc.lens; "
+        "print(sorted({m.split('.')[0] for m in sys.modules} & {'web3', 'eth_utils'}))"
+    )
+    src = Path(__file__).parents[1] / "src"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH=str(src)),
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_aggregate_is_pinned_to_one_block():
+    chain = pool_chain()
+    client = stub_client(chain)
+    pool = client.pool()
+    for block_number in range(chain.head + 1):
+        expected = chain.pool(POOL_ADDRESS, block_number)
+        number, (slot0, liquidity, token0) = aggregate(
+            [
+                pool.functions.slot0(),
+                pool.functions.liquidity(),
+                pool.functions.token0(),
+            ],
+            block_number,
+            client,
+        )
+        assert number == block_number
+        assert (slot0[0], slot0[1]) == (expected.sqrt_price_x96, expected.tick)
+        assert liquidity == expected.liquidity
+        assert token0 == TOKEN0
+
+    number, (liquidity,) = aggregate([pool.functions.liquidity()], client=client)
+    assert (number, liquidity) == (chain.head, chain.pool(POOL_ADDRESS).liquidity)
+
+
+def test_fetch_pool_snapshot_in_one_call():
+    chain = pool_chain()
+    client = stub_client(chain)
+    for block_number in range(chain.head + 1):
+        calls = chain.count("eth_call")
+        snapshot = fetch_pool_snapshot(POOL_ADDRESS, block_number, client)
+        assert chain.count("eth_call") == calls + 1
+
+        expected = chain.pool(POOL_ADDRESS, block_number)
+        assert snapshot.block_number == block_number
+        assert (snapshot.token0, snapshot.token1) == (TOKEN0, TOKEN1)
+        assert snapshot.slot0.sqrtPriceX96 == expected.sqrt_price_x96
+        assert snapshot.slot0.tick == expected.tick
+        assert snapshot.liquidity == expected.liquidity
+        assert {
+            tick.tick_index: (tick.liquidity_gross, tick.liquidity_net)
+            for tick in snapshot.initialized_ticks
+        } == {tick: tuple(info) for tick, info in expected.ticks.items()}
+        assert dict(zip(snapshot.ticks.ticks, snapshot.ticks.liquidity_nets)) == {
+            tick: net for tick, (_, net) in expected.ticks.items()
+        }
+
+
+def test_fetch_pool_state_in_one_call():
+    chain = pool_chain()
+    state = fetch_pool_state(stub_client(chain))
+    assert chain.count("eth_call") == 1
+    expected = chain.pool(POOL_ADDRESS)
+    assert (state.current_tick, state.current_liquidity) == (
+        expected.tick,
+        expected.liquidity,
+    )
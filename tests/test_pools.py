@@ -0,0 +1,25 @@
+from stub_node import StubChain, StubPool, stub_client
+from web3 import Web3
+
+from zora_poc.pools import PoolRegistry
+
+# fee tiers of the factory table, and one enabled later (not in FEE_AMOUNT_TICK_SPACING)
+TIERS = [(100, 1), (500, 10), (3000, 60), (10000, 200), (200, 4)]
+ADDRESSES = [Web3.to_checksum_address(f"0x{i:040x}") for i in range(1, 6)]
+TOKEN0 = "0x4200000000000000000000000000000000000006"
+TOKEN1 = "0x" + "22" * 20
+
+
+def test_registry_reads_the_tick_spacing():
+    pools = [
+        StubPool(address, TOKEN0, TOKEN1, fee, tick_spacing)
+        for address, (fee, tick_spacing) in zip(ADDRESSES, TIERS)
+    ]
+    chain = StubChain(pools)
+    registry = PoolRegistry(stub_client(chain))
+    loaded = registry.load(ADDRESSES, batch_size=3)
+
+    assert [(pool.info.fee, pool.info.tick_spacing) for pool in loaded] == TIERS
+    assert all(pool.info.token0 == TOKEN0 for pool in loaded)
+    # token0, token1, fee and tickSpacing of up to 3 pools per eth_call
+    assert chain.count("eth_call") == 2
@@ -0,0 +1,381 @@
+import copy
+import math
+import random
+
+import pytest
+from quote_cases import random_pool, random_swap_step_inputs
+
+from zora_poc.depth_index import DepthIndex
+from zora_poc.float_depth import FloatDepth, np
+from zora_poc.tiered_quote import EXACT_TIER, FLOAT_TIER, TieredQuoter
+from zora_poc.lens import (
+    UNCHECKED_KERNEL,
+    swap_quote,
+    swap_quote_many,
+    swap_quote_token0_to_token1,
+    swap_quote_token1_to_token0,
+    swap_token0_in_upward,
+    swap_token1_in_downward,
+    tick_to_price,
+)
+from zora_poc.lens_state import PoolState, TickIndex, TickSnapshot
+from zora_poc.simulator.libraries import SwapMath, TickMath, UncheckedSwapMath
+from zora_poc.simulator.libraries.Shared import MAX_TICK, MIN_TICK, ONE_IN_PIPS
+
+
+def price_limit(zero_for_one: bool) -> int:
+    return TickMath.MIN_SQRT_RATIO + 1 if zero_for_one else TickMath.MAX_SQRT_RATIO - 1
+
+
+def test_get_tick_at_sqrt_ratio_fast():
+    # every tick boundary of a sample of the full range, the price just below it and a
+    # random price inside the tick
+    rnd = random.Random(0)
+    prices = [TickMath.MIN_SQRT_RATIO, TickMath.MAX_SQRT_RATIO - 1]
+    ticks = [MIN_TICK, MAX_TICK - 1, -1, 0, 1]
+    ticks += [rnd.randint(MIN_TICK, MAX_TICK - 1) for _ in range(20_000)]
+    for tick in ticks:
+        sqrt_price = TickMath.getSqrtRatioAtTick(tick)
+        prices += [sqrt_price, max(sqrt_price - 1, TickMath.MIN_SQRT_RATIO)]
+        prices.append(
+            sqrt_price
+            + rnd.randrange(TickMath.getSqrtRatioAtTick(tick + 1) - sqrt_price)
+        )
+
+    for sqrt_price in prices:
+        assert TickMath.getTickAtSqrtRatioFast(
+            sqrt_price
+        ) == TickMath.getTickAtSqrtRatio(sqrt_price), sqrt_price
+
+
+def test_unchecked_swap_step():
+    # the unchecked kernel against the checked reference wherever the reference does
+    # not revert
+    rnd = random.Random(0)
+    checked = 0
+    while checked < 20_000:
+        args = random_swap_step_inputs(rnd)
+        try:
+            expected = SwapMath.computeSwapStep(*args)
+        except (AssertionError, ZeroDivisionError):
+            continue
+        assert UncheckedSwapMath.computeSwapStep(*args) == expected, args
+        checked += 1
+
+
+def test_unchecked_swap_quote():
+    rnd = random.Random(1)
+    for _ in range(20):
+        ticks, slot0, liquidity = random_pool(rnd, rnd.choice((3, 30, 400)))
+        snapshot = TickSnapshot.from_mapping(ticks)
+        for zero_for_one in (True, False):
+            for _ in range(20):
+                amount = int(10 ** rnd.uniform(0, 30)) * rnd.choice((1, -1))
+                args = (snapshot, slot0, liquidity, zero_for_one, amount)
+                args += (price_limit(zero_for_one),)
+                assert swap_quote(*args, kernel=UNCHECKED_KERNEL) == swap_quote(*args)
+
+
+def test_swap_quote_leaves_the_ticks_unchanged():
+    # quotes through every initialized tick in both directions, on a tick mapping with
+    # its index and on a snapshot, against deep copies taken before
+    rnd = random.Random(6)
+    for _ in range(10):
+        ticks, slot0, liquidity = random_pool(rnd, rnd.choice((3, 30, 400)))
+        snapshot = TickSnapshot.from_mapping(ticks)
+        tick_index = TickIndex(ticks)
+        ticks_before = copy.deepcopy(ticks)
+        snapshot_before = (snapshot.ticks, snapshot.liquidity_nets)
+        liquidity_nets_before = {t: snapshot.liquidity_net(t) for t in snapshot}
+        for zero_for_one in (True, False):
+            for amount in (10**40, -(10**40), 10**18):
+                args = (
+                    slot0,
+                    liquidity,
+                    zero_for_one,
+                    amount,
+                    price_limit(zero_for_one),
+                )
+                swap_quote(ticks, *args, tick_index=tick_index)
+                swap_quote(snapshot, *args)
+        assert ticks == ticks_before
+        assert list(tick_index) == sorted(ticks_before)
+        assert (snapshot.ticks, snapshot.liquidity_nets) == snapshot_before
+        assert {t: snapshot.liquidity_net(t) for t in snapshot} == liquidity_nets_before
+
+
+def test_swap_quote_many():
+    # a ladder of exact input and exact output amounts, with repeats, against one
+    # swap_quote per amount, on a snapshot and on a mutable tick mapping with its index
+    rnd = random.Random(2)
+    for _ in range(20):
+        ticks, slot0, liquidity = random_pool(rnd, rnd.choice((3, 30, 400)))
+        snapshot = TickSnapshot.from_mapping(ticks)
+        for zero_for_one in (True, False):
+            amounts = [
+                int(10 ** rnd.uniform(0, 30)) * rnd.choice((1, -1)) for _ in range(30)
+            ]
+            amounts += amounts[:5]
+            limit = price_limit(zero_for_one)
+            expected = [
+                swap_quote(snapshot, slot0, liquidity, zero_for_one, amount, limit)
+                for amount in amounts
+            ]
+            assert (
+                swap_quote_many(snapshot, slot0, liquidity, zero_for_one, amounts)
+                == expected
+            )
+            assert (
+                swap_quote_many(
+                    ticks,
+                    slot0,
+                    liquidity,
+                    zero_for_one,
+                    amounts,
+                    limit,
+                    TickIndex(ticks),
+                )
+                == expected
+            )
+
+
+def test_swap_quote_many_price_limit():
+    # a limit a few ticks away from the price stops most of the ladder
+    rnd = random.Random(3)
+    ticks, slot0, liquidity = random_pool(rnd, 30)
+    snapshot = TickSnapshot.from_mapping(ticks)
+    for zero_for_one, tick in ((True, slot0.tick - 1_000), (False, slot0.tick + 1_000)):
+        limit = TickMath.getSqrtRatioAtTick(tick)
+        amounts = [10**exponent for exponent in range(30)]
+        amounts += [-amount for amount in amounts]
+        assert swap_quote_many(
+            snapshot, slot0, liquidity, zero_for_one, amounts, limit
+        ) == [
+            swap_quote(snapshot, slot0, liquidity, zero_for_one, amount, limit)
+            for amount in amounts
+        ]
+
+
+def test_depth_index():
+    # amounts around the input/output needed to cross each step, where the fee rounding
+    # of the partial step matters most, and random ones, with every fee tier
+    rnd = random.Random(4)
+    for _ in range(20):
+        fee, tick_spacing = rnd.choice(((500, 10), (3000, 60), (10000, 200)))
+        ticks, slot0, liquidity = random_pool(
+            rnd, rnd.choice((3, 30, 400)), tick_spacing
+        )
+        snapshot = TickSnapshot.from_mapping(ticks)
+        for zero_for_one in (True, False):
+            index = DepthIndex(
+                snapshot,
+                slot0,
+                liquidity,
+                zero_for_one,
+                fee=fee,
+                tick_spacing=tick_spacing,
+            )
+            amounts = [int(10 ** rnd.uniform(0, 30)) for _ in range(20)]
+            for used in rnd.sample(index.exact_input_path.used[1:], min(len(index), 5)):
+                amounts += [used - 1, used, used + 1]
+            for used in rnd.sample(
+                index.exact_output_path.used[1:], min(len(index), 5)
+            ):
+                amounts += [-used + 1, -used, -used - 1]
+            amounts += [index.max_amount_in, -index.max_amount_out]
+            limit = price_limit(zero_for_one)
+            for amount in amounts:
+                if amount == 0:
+                    continue
+                assert index.quote(amount) == swap_quote(
+                    snapshot,
+                    slot0,
+                    liquidity,
+                    zero_for_one,
+                    amount,
+                    limit,
+                    fee=fee,
+                    tick_spacing=tick_spacing,
+                ), amount
+
+
+def dense_token0_in_upward(mapping, tick, max_tick, tick_spacing, liquidity, amount):
+    # the float quote loop before the sparse traversal: one range per tick_spacing
+    total_token1_out = 0
+    while amount > 0 and tick <= max_tick:
+        liquidity += mapping.get(tick, 0)
+        sqrt_price_current = tick_to_price(tick / 2)
+        sqrt_price_next = tick_to_price((tick + tick_spacing) / 2)
+        delta_y = liquidity * (sqrt_price_next - sqrt_price_current)
+        delta_x = delta_y / (sqrt_price_next * sqrt_price_current)
+        if amount >= delta_x:
+            total_token1_out += delta_y
+            amount -= delta_x
+        else:
+            total_token1_out += amount * sqrt_price_current * sqrt_price_next
+            break
+        tick += tick_spacing
+    return total_token1_out
+
+
+def dense_token1_in_downward(mapping, tick, min_tick, tick_spacing, liquidity, amount):
+    total_token0_out = 0
+    while amount > 0 and tick >= min_tick:
+        liquidity += mapping.get(tick, 0)
+        sqrt_price_current = tick_to_price(tick / 2)
+        sqrt_price_previous = tick_to_price((tick - tick_spacing) / 2)
+        delta_x = liquidity * (1 / sqrt_price_previous - 1 / sqrt_price_current)
+        delta_y = delta_x * sqrt_price_current * sqrt_price_previous
+        if amount >= delta_y:
+            total_token0_out += delta_x
+            amount -= delta_y
+        else:
+            total_token0_out += amount / (sqrt_price_current * sqrt_price_previous)
+            break
+        tick -= tick_spacing
+    return total_token0_out
+
+
+def test_sparse_float_traversal():
+    # the span-at-a-time walks against the per-range loops they replaced, on sparse
+    # books whose liquidity stays positive along the walk
+    rnd = random.Random(5)
+    for _ in range(200):
+        tick_spacing = rnd.choice((10, 60, 200))
+        start = rnd.randrange(-2_000, 2_000) * tick_spacing
+        liquidity = rnd.randrange(10**18, 10**22)
+        mapping = {}
+        for _ in range(rnd.choice((1, 5, 50))):
+            tick = start + rnd.randrange(-1_000, 1_000) * tick_spacing
+            mapping[tick] = rnd.randrange(-liquidity // 200, liquidity)
+        last = start + 1_000 * tick_spacing
+        first = start - 1_000 * tick_spacing
+        for amount in [10 ** rnd.uniform(10, 26) for _ in range(10)]:
+            args = (mapping, start, last, tick_spacing, liquidity, amount)
+            assert math.isclose(
+                swap_token0_in_upward(*args),
+                dense_token0_in_upward(*args),
+                rel_tol=1e-12,
+            ), args
+            args = (mapping, start, first, tick_spacing, liquidity, amount)
+            assert math.isclose(
+                swap_token1_in_downward(*args),
+                dense_token1_in_downward(*args),
+                rel_tol=1e-12,
+            ), args
+
+
+def test_float_quotes_use_the_pool_fee_and_tick_spacing():
+    # from a range boundary, the float quotes are the per-range loops on the amount left
+    # after the pool's fee, stepping by the pool's tick spacing
+    rnd = random.Random(6)
+    for fee, tick_spacing in ((100, 1), (500, 10), (3000, 60), (10000, 200)):
+        for _ in range(50):
+            start = rnd.randrange(-2_000, 2_000) * tick_spacing
+            liquidity = rnd.randrange(10**18, 10**22)
+            mapping = {}
+            for _ in range(rnd.choice((1, 5, 50))):
+                for side in (1, -1):
+                    tick = start + side * rnd.randrange(1, 1_000) * tick_spacing
+                    mapping[tick] = rnd.randrange(-liquidity // 200, liquidity)
+            state = PoolState(start, liquidity)
+            amount = int(10 ** rnd.uniform(15, 26))
+            after_fee = amount * (ONE_IN_PIPS - fee) / ONE_IN_PIPS
+            args = (amount, mapping, state, fee, tick_spacing)
+            expected = dense_token0_in_upward(
+                mapping, start, max(mapping), tick_spacing, liquidity, after_fee
+            )
+            assert math.isclose(
+                swap_quote_token0_to_token1(*args), int(expected), rel_tol=1e-9
+            ), args
+            expected = dense_token1_in_downward(
+                mapping, start, min(mapping), tick_spacing, liquidity, after_fee
+            )
+            assert math.isclose(
+                swap_quote_token1_to_token0(*args), int(expected), rel_tol=1e-9
+            ), args
+
+
+def float_depth_cases(seed: int):
+    # (FloatDepth, amounts in, exact swap_quote results) on random pools of every depth
+    rnd = random.Random(seed)
+    for _ in range(20):
+        ticks, slot0, liquidity = random_pool(rnd, rnd.choice((3, 30, 400)))
+        snapshot = TickSnapshot.from_mapping(ticks)
+        amounts_in = [int(10 ** rnd.uniform(0, 30)) for _ in range(200)]
+        for zero_for_one in (True, False):
+            index = DepthIndex(
+                snapshot, slot0, liquidity, zero_for_one, kernel=UNCHECKED_KERNEL
+            )
+            depth = FloatDepth(snapshot, slot0, liquidity, zero_for_one)
+            yield depth, amounts_in, [index.quote(amount) for amount in amounts_in]
+
+
+def check_float_quote(depth, exact, amount_out, sqrt_price, bound):
+    amount0, amount1, exact_sqrt_price, _, _ = exact
+    error = abs((-amount1 if depth.zero_for_one else -amount0) - amount_out)
+    assert error <= bound, (exact, amount_out, bound)
+    assert abs(sqrt_price - exact_sqrt_price) <= 1e-9 * exact_sqrt_price
+
+
+def test_float_depth_error_bound():
+    # every estimate within its documented bound of the exact quote
+    for depth, amounts_in, exact in float_depth_cases(6):
+        for amount_in, result in zip(amounts_in, exact):
+            check_float_quote(depth, result, *depth.quote(amount_in))
+
+
+@pytest.mark.skipif(np is None, reason="FloatDepth.quote_many needs numpy")
+def test_float_depth_quote_many():
+    for depth, amounts_in, exact in float_depth_cases(7):
+        for result, *estimate in zip(exact, *depth.quote_many(amounts_in)):
+            check_float_quote(depth, result, *estimate)
+
+
+def tiered_cases(seed: int):
+    # (quoter, amounts in, thresholds, exact outputs) with thresholds a relative 1e-7 to
+    # 10% away from the exact output and exactly on it or one wei away
+    rnd = random.Random(seed)
+    for _ in range(20):
+        ticks, slot0, liquidity = random_pool(rnd, rnd.choice((3, 30, 400)))
+        snapshot = TickSnapshot.from_mapping(ticks)
+        for zero_for_one in (True, False):
+            quoter = TieredQuoter(snapshot, slot0, liquidity, zero_for_one)
+            amounts_in = [int(10 ** rnd.uniform(12, 24)) for _ in range(100)]
+            exact = [quoter.exact_amount_out(amount) for amount in amounts_in]
+            thresholds = [
+                int(out * (1 + rnd.choice((1, -1)) * 10 ** rnd.uniform(-7, -1)))
+                for out in exact
+            ]
+            thresholds[:3] = [exact[0], exact[1] + 1, exact[2] - 1]
+            yield quoter, amounts_in, thresholds, exact
+
+
+def check_threshold_quotes(results, thresholds, exact):
+    for result, threshold, out in zip(results, thresholds, exact):
+        assert result.meets == (out >= threshold), (result, threshold, out)
+        assert result.tier in (FLOAT_TIER, EXACT_TIER)
+        if result.tier == EXACT_TIER:
+            assert result.amount_out == out and result.error_bound == 0
+        else:
+            assert abs(result.amount_out - out) <= result.error_bound
+
+
+def test_tiered_quoter():
+    # always the answer of swap_quote, whichever tier gave it
+    tiers = set()
+    for quoter, amounts_in, thresholds, exact in tiered_cases(8):
+        results = [
+            quoter.meets(amount, threshold)
+            for amount, threshold in zip(amounts_in, thresholds)
+        ]
+        check_threshold_quotes(results, thresholds, exact)
+        tiers.update(result.tier for result in results)
+    assert tiers == {FLOAT_TIER, EXACT_TIER}
+
+
+@pytest.mark.skipif(np is None, reason="TieredQuoter.meets_many needs numpy")
+def test_tiered_quoter_meets_many():
+    for quoter, amounts_in, thresholds, exact in tiered_cases(9):
+        results = quoter.meets_many(amounts_in, thresholds)
+        check_threshold_quotes(results, thresholds, exact)
@@ -0,0 +1,300 @@
+import asyncio
+import random
+
+from aiohttp import ClientConnectionError, ClientResponseError
+import pytest
+from stub_node import (
+    POOL_ADDRESSES,
+    StubChain,
+    StubRPCError,
+    random_chain,
+    stub_client,
+)
+from web3.exceptions import Web3RPCError
+
+from zora_poc.events import POOL_EVENT_TOPICS
+from zora_poc.tailer import LogTailer, RangeSizer
+
+
+def chain_logs(chain: StubChain, address=None, from_block: int = 1) -> list:
+    # (blockNumber, logIndex, blockHash) of the canonical logs, in chain order
+    return [
+        (block.number, int(log["logIndex"], 16), block.hash)
+        for block in chain.blocks[from_block:]
+        for log in block.logs
+        if address is None or log["address"] in address
+    ]
+
+
+def log_key(log) -> tuple:
+    return (log["blockNumber"], log["logIndex"], log["blockHash"].to_0x_hex())
+
+
+def test_logs_in_order_with_concurrent_ranges():
+    # ranges complete in a random order, logs are still handled in chain order, once
+    chain = random_chain(0)
+    client = stub_client(chain, jitter=0.002)
+    handled = []
+    ranges = []
+    tailer = LogTailer(
+        POOL_ADDRESSES[:2],
+        POOL_EVENT_TOPICS,
+        1,
+        lambda log: handled.append(log_key(log)),
+        client=client,
+        range_sizer=RangeSizer(initial_size=7, max_size=7),
+        concurrency=4,
+        on_range=lambda *args: ranges.append(args[:2]),
+    )
+    asyncio.run(tailer.run(stop_block=chain.head))
+
+    assert handled == chain_logs(chain, set(POOL_ADDRESSES[:2]))
+    assert ranges[0][0] == 1 and ranges[-1][1] == chain.head
+    assert all(a[1] + 1 == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert client.async_provider.max_in_flight["eth_getLogs"] == 4
+    assert tailer.last_block == chain.head
+
+
+def test_follows_the_head():
+    # blocks mined while the tailer runs are picked up by polling the head
+    chain = random_chain(1, blocks=20)
+    handled = []
+    tailer = LogTailer(
+        None,
+        POOL_EVENT_TOPICS,
+        1,
+        lambda log: handled.append(log_key(log)),
+        client=stub_client(chain),
+        min_poll_interval=0.001,
+        max_poll_interval=0.004,
+    )
+
+    async def mine_and_follow():
+        task = asyncio.create_task(tailer.run())
+        rnd = random.Random(2)
+        for _ in range(30):
+            await asyncio.sleep(rnd.choice((0, 0.001, 0.01)))
+            chain.mine_random(rnd, 1)
+        while tailer.last_block < chain.head:
+            await asyncio.sleep(0.001)
+        task.cancel()
+
+    asyncio.run(mine_and_follow())
+    assert handled == chain_logs(chain)
+
+
+def test_bisects_ranges_over_the_result_limit():
+    # ranges over max_logs are split until they go through, without exceeding the
+    # concurrency and without changing the order of the logs
+    chain = random_chain(3, max_logs=6)
+    client = stub_client(chain, jitter=0.002)
+    handled = []
+    tailer = LogTailer(
+        None,
+        POOL_EVENT_TOPICS,
+        1,
+        lambda log: handled.append(log_key(log)),
+        client=client,
+        range_sizer=RangeSizer(initial_size=64, target_logs=10**6),
+        concurrency=3,
+    )
+    asyncio.run(tailer.run(stop_block=chain.head))
+
+    assert handled == chain_logs(chain)
+    assert chain.count("eth_getLogs") > chain.head // 64 * 2
+    assert client.async_provider.max_in_flight["eth_getLogs"] <= 3
+
+
+def test_retries_transient_errors():
+    chain = random_chain(4)
+    rnd = random.Random(5)
+    errors = [
+        ClientResponseError(None, (), status=429),
+        ClientResponseError(None, (), status=503),
+        ClientConnectionError("connection reset"),
+        TimeoutError(),
+        StubRPCError(-32005, "rate limit exceeded"),
+    ]
+
+    def flaky(method, params):
+        if method == "eth_getLogs" and rnd.random() < 0.3:
+            raise rnd.choice(errors)
+
+    chain.hooks.append(flaky)
+    handled = []
+    tailer = LogTailer(
+        None,
+        POOL_EVENT_TOPICS,
+        1,
+        lambda log: handled.append(log_key(log)),
+        client=stub_client(chain),
+        range_sizer=RangeSizer(initial_size=16, max_size=16),
+        min_retry_interval=0.001,
+        max_retry_interval=0.004,
+    )
+    asyncio.run(tailer.run(stop_block=chain.head))
+
+    assert handled == chain_logs(chain)
+    # a failed range is retried as is, never split
+    assert all(
+        int(params[0]["toBlock"], 16) - int(params[0]["fromBlock"], 16) + 1 == 16
+        or int(params[0]["toBlock"], 16) == chain.head
+        for method, params in chain.requests
+        if method == "eth_getLogs"
+    )
+
+
+def test_retries_transient_errors_of_headers_and_head():
+    chain = random_chain(4)
+    rnd = random.Random(6)
+    errors = [
+        ClientResponseError(None, (), status=429),
+        ClientResponseError(None, (), status=503),
+        ClientConnectionError("connection reset"),
+        TimeoutError(),
+    ]
+    failures = []
+
+    def flaky(method, params):
+        # the head is read once, the first three times fail
+        if (method == "eth_blockNumber" and failures.count(method) < 3) or (
+            method == "eth_getBlockByNumber" and rnd.random() < 0.3
+        ):
+            failures.append(method)
+            raise rnd.choice(errors)
+
+    chain.hooks.append(flaky)
+    handled = []
+    tailer = LogTailer(
+        None,
+        POOL_EVENT_TOPICS,
+        1,
+        lambda log: handled.append(log_key(log)),
+        client=stub_client(chain),
+        range_sizer=RangeSizer(initial_size=16, max_size=16),
+        min_retry_interval=0.001,
+        max_retry_interval=0.004,
+    )
+    asyncio.run(tailer.run(stop_block=chain.head))
+
+    assert handled == chain_logs(chain)
+    assert set(failures) == {"eth_getBlockByNumber", "eth_blockNumber"}
+    assert tailer.block_hashes[chain.head] == chain.blocks[-1].hash
+
+
+def test_reads_headers_only_within_reorg_depth():
+    # ranges of 20 blocks: the 11 ending at least reorg_depth below the head read the
+    # hash of their last block, the 4 after it both headers before the logs and the last
+    # one again after them
+    chain = random_chain(5, blocks=300)
+    tailer = LogTailer(
+        None,
+        POOL_EVENT_TOPICS,
+        1,
+        lambda log: None,
+        client=stub_client(chain),
+        range_sizer=RangeSizer(initial_size=20, max_size=20),
+        reorg_depth=64,
+    )
+    asyncio.run(tailer.run(stop_block=chain.head))
+
+    assert chain.count("eth_getLogs") == 15
+    assert chain.count("eth_getBlockByNumber") == 11 + 4 * 3
+    assert tailer.block_hashes[chain.head] == chain.blocks[-1].hash
+
+
+def test_outage_does_not_fan_out():
+    # every get_logs fails for a while: the ranges in flight are retried, not split
+    chain = random_chain(6)
+    failures = []
+
+    def outage(method, params):
+        if method == "eth_getLogs" and len(failures) < 40:
+            failures.append(params[0]["fromBlock"])
+            raise ClientResponseError(None, (), status=502)
+
+    chain.hooks.append(outage)
+    client = stub_client(chain, jitter=0.001)
+    ranges = []
+    tailer = LogTailer(
+        None,
+        POOL_EVENT_TOPICS,
+        1,
+        lambda log: None,
+        client=client,
+        range_sizer=RangeSizer(initial_size=50, max_size=50),
+        concurrency=3,
+        min_retry_interval=0.001,
+        max_retry_interval=0.002,
+        on_range=lambda *args: ranges.append(hex(args[0])),
+    )
+    asyncio.run(tailer.run(stop_block=chain.head))
+
+    assert set(failures) <= set(ranges[:3])
+    assert client.async_provider.max_in_flight["eth_getLogs"] <= 3
+    assert chain.count("eth_getLogs") == 40 + len(ranges)
+
+
+def test_single_block_over_the_limit_stops_the_tailer():
+    chain = random_chain(7, blocks=20, max_logs=0)
+    tailer = LogTailer(
+        None, POOL_EVENT_TOPICS, 1, lambda log: None, client=stub_client(chain)
+    )
+    with pytest.raises(Web3RPCError, match="more than 0 results"):
+        asyncio.run(tailer.run(stop_block=chain.head))
+
+
+def reorganizing(chain: StubChain, rnd: random.Random, tailer: LogTailer, at: set):
+    # A hook that, on the request after each get_logs numbered in `at`, replaces the
+    # blocks after a random point with as many new ones. The points alternate between
+    # the last 8 blocks the tailer handled and the blocks of the ranges in flight, so
+    # reorgs land on handled blocks and between the logs and headers of a range.
+    reorgs = 0
+    reorg_next = False
+
+    def hook(method, params):
+        nonlocal reorgs, reorg_next
+        if reorg_next:
+            reorg_next = False
+            head = chain.head
+            if reorgs % 2 == 0:
+                block_number = tailer.last_block - rnd.randrange(1, 9)
+            else:
+                block_number = rnd.randrange(tailer.last_block, tailer.next_block)
+            chain.reorganize(max(block_number, 1))
+            chain.mine_random(rnd, head - chain.head)
+            reorgs += 1
+        if method == "eth_getLogs" and chain.count("eth_getLogs") in at:
+            reorg_next = True
+
+    return hook
+
+
+def test_reorgs_under_ranges_in_flight():
+    # the reorgs land anywhere in the chain, so every range is within reorg_depth
+    chain = random_chain(8, blocks=200)
+    handled = []
+    ancestors = []
+
+    def on_reorg(ancestor):
+        ancestors.append(ancestor)
+        handled[:] = [key for key in handled if key[0] <= ancestor]
+
+    tailer = LogTailer(
+        None,
+        POOL_EVENT_TOPICS,
+        1,
+        lambda log: handled.append(log_key(log)),
+        client=stub_client(chain, jitter=0.001),
+        range_sizer=RangeSizer(initial_size=8, max_size=8),
+        on_reorg=on_reorg,
+        reorg_depth=256,
+    )
+    chain.hooks.append(
+        reorganizing(chain, random.Random(9), tailer, {3, 6, 10, 15, 19, 24})
+    )
+    asyncio.run(tailer.run(stop_block=chain.head))
+
+    assert ancestors
+    assert handled == chain_logs(chain)
+    assert tailer.block_hashes[chain.head] == chain.blocks[-1].hash
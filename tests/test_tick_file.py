@@ -0,0 +1,56 @@
+import random
+
+from stub_node import StubChain, StubPool, stub_client
+from web3 import Web3
+
+from zora_poc.lens import swap_quote
+from zora_poc.simulator.libraries.Shared import MAX_SQRT_RATIO, MIN_SQRT_RATIO
+from zora_poc.tick_file import MappedTicks, save_tick_snapshot
+
+ADDRESS = Web3.to_checksum_address("0x" + "d4" * 20)
+TOKEN0 = "0x4200000000000000000000000000000000000006"
+TOKEN1 = "0x" + "22" * 20
+
+
+def test_tick_file_of_a_pool_outside_the_fee_table(tmp_path):
+    # fee 100 / spacing 1 is not in FEE_AMOUNT_TICK_SPACING: both come from the pool,
+    # in the same eth_call as the ticks
+    chain = StubChain([StubPool(ADDRESS, TOKEN0, TOKEN1, 100, 1, -7)])
+    chain.mine_random(random.Random(13), 60)
+    path = tmp_path / "pool.ticks"
+    snapshot = save_tick_snapshot(path, ADDRESS, "latest", stub_client(chain))
+
+    assert chain.count("eth_call") == 1
+    sqrt_price_x96, liquidity, tick, ticks = chain.pool(ADDRESS).state()
+    with MappedTicks(path) as mapped:
+        assert (mapped.fee, mapped.tick_spacing) == (100, 1)
+        assert mapped.block_number == chain.head
+        assert mapped.slot0 == snapshot.slot0
+        assert mapped.slot0.sqrtPriceX96 == sqrt_price_x96
+        assert mapped.slot0.tick == tick
+        assert mapped.liquidity == liquidity
+        assert list(mapped) == sorted(ticks)
+        for zero_for_one in (True, False):
+            limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+            for amount in (10**12, 10**18, 10**24, -(10**15)):
+                expected = swap_quote(
+                    snapshot.ticks,
+                    snapshot.slot0,
+                    snapshot.liquidity,
+                    zero_for_one,
+                    amount,
+                    limit,
+                    fee=100,
+                    tick_spacing=1,
+                )
+                actual = swap_quote(
+                    mapped,
+                    mapped.slot0,
+                    mapped.liquidity,
+                    zero_for_one,
+                    amount,
+                    limit,
+                    fee=mapped.fee,
+                    tick_spacing=mapped.tick_spacing,
+                )
+                assert actual == expected, (zero_for_one, amount)
@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+from zora_poc.simulator.libraries import TickMath
+from zora_poc.simulator.libraries.Shared import MAX_TICK, MIN_TICK
+
+
+@pytest.mark.parametrize("tick_spacing", [10, 60, 200])
+def test_sqrt_ratio_table_equals_get_sqrt_ratio_at_tick(tick_spacing):
+    table = TickMath.getSqrtRatioTable(tick_spacing)
+    offset = MAX_TICK // tick_spacing
+    assert len(table) == 2 * offset + 1
+    for i, sqrt_price in enumerate(table):
+        assert sqrt_price == TickMath.getSqrtRatioAtTick((i - offset) * tick_spacing)
+
+
+@pytest.mark.parametrize("tick_spacing", [1, 10, 60, 200])
+def test_cached_sqrt_ratio_equals_get_sqrt_ratio_at_tick(tick_spacing):
+    # grid and off-grid ticks, MIN_TICK and MAX_TICK (off the grid of every spacing but
+    # 1), each twice to read the cached value back
+    rnd = random.Random(tick_spacing)
+    ticks = [MIN_TICK, MAX_TICK, MIN_TICK + 1, MAX_TICK - 1, 0, 1, -1]
+    ticks += [rnd.randint(MIN_TICK, MAX_TICK) for _ in range(500)]
+    ticks += [t - t % tick_spacing for t in ticks[7:]]
+    for tick in ticks + ticks:
+        assert TickMath.getSqrtRatioAtTickCached(
+            tick, tick_spacing
+        ) == TickMath.getSqrtRatioAtTick(tick), tick
+    for tick in (MIN_TICK - 1, MAX_TICK + 1):
+        with pytest.raises(AssertionError):
+            TickMath.getSqrtRatioAtTickCached(tick, tick_spacing)
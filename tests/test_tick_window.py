@@ -0,0 +1,131 @@
+import random
+
+import pytest
+from stub_node import StubChain, StubPool, stub_client
+from web3 import Web3
+
+from zora_poc.lens import Slot0, swap_quote
+from zora_poc.lens_state import TickSnapshot
+from zora_poc.simulator.libraries import TickMath
+from zora_poc.simulator.libraries.Shared import MAX_SQRT_RATIO, MAX_TICK, MIN_SQRT_RATIO
+from zora_poc.tick_window import WindowedTicks
+
+ADDRESS = Web3.to_checksum_address("0x" + "e5" * 20)
+TOKEN0 = "0x4200000000000000000000000000000000000006"
+TOKEN1 = "0x" + "22" * 20
+FEE_TICK_SPACINGS = [(500, 10), (3000, 60), (10000, 200)]
+
+
+def wide_pool_chain(rnd: random.Random, fee: int, tick_spacing: int) -> StubChain:
+    # a pool with positions starting in every bitmap word from 12 below the price to 12
+    # above it, a few of them reaching much further
+    chain = StubChain([StubPool(ADDRESS, TOKEN0, TOKEN1, fee, tick_spacing)])
+    mints = []
+    for word in range(-12, 13):
+        for _ in range(3):
+            tick_lower = (word * 256 + rnd.randrange(256)) * tick_spacing
+            width = rnd.choice((rnd.randrange(1, 300), rnd.randrange(1, 5000)))
+            tick_upper = min(tick_lower + width * tick_spacing, MAX_TICK)
+            tick_upper -= tick_upper % tick_spacing
+            mints.append((ADDRESS, "mint", tick_lower, tick_upper, 10**18))
+    chain.mine(mints)
+    return chain
+
+
+def full_snapshot(chain: StubChain) -> TickSnapshot:
+    return TickSnapshot({t: net for t, (_, net) in chain.pool(ADDRESS).ticks.items()})
+
+
+def price_limit(zero_for_one: bool) -> int:
+    return MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+
+
+@pytest.mark.parametrize("fee,tick_spacing", FEE_TICK_SPACINGS)
+@pytest.mark.parametrize("words_per_page", [1, 2, 5])
+def test_quotes_equal_the_full_snapshot(fee, tick_spacing, words_per_page):
+    # every quote on a fresh window, so that each one loads its pages from the start,
+    # up to amounts that run through every initialized tick to the end of the range
+    chain = wide_pool_chain(random.Random(tick_spacing), fee, tick_spacing)
+    client = stub_client(chain)
+    snapshot = full_snapshot(chain)
+    pool = chain.pool(ADDRESS)
+    slot0 = Slot0(pool.sqrt_price_x96, pool.tick)
+    for zero_for_one in (True, False):
+        for amount in (10**15, 10**19, 10**21, 10**40, -(10**18), -(10**40)):
+            args = (slot0, pool.liquidity, zero_for_one, amount)
+            args += (price_limit(zero_for_one),)
+            window = WindowedTicks(ADDRESS, words_per_page, client=client)
+            assert (window.tick_spacing, window.liquidity) == (
+                tick_spacing,
+                pool.liquidity,
+            )
+            expected = swap_quote(snapshot, *args, fee=fee, tick_spacing=tick_spacing)
+            actual = swap_quote(window, *args, fee=fee, tick_spacing=tick_spacing)
+            assert actual == expected, (zero_for_one, amount)
+
+
+@pytest.mark.parametrize("fee,tick_spacing", FEE_TICK_SPACINGS)
+def test_pages_load_lazily(monkeypatch, fee, tick_spacing):
+    # swaps up or down to a price limit a few words away: the bitmap words requested
+    # are the ones from the price to the first initialized tick past the limit, once
+    # each, as every word holds initialized ticks
+    requested = []
+    tick_bitmap = StubPool.tick_bitmap
+
+    def recorded_tick_bitmap(pool, word):
+        requested.append(word)
+        return tick_bitmap(pool, word)
+
+    monkeypatch.setattr(StubPool, "tick_bitmap", recorded_tick_bitmap)
+    rnd = random.Random(tick_spacing + 1)
+    chain = wide_pool_chain(rnd, fee, tick_spacing)
+    client = stub_client(chain)
+    pool = chain.pool(ADDRESS)
+    slot0 = Slot0(pool.sqrt_price_x96, pool.tick)
+    ticks = sorted(pool.ticks)
+
+    def word(tick):
+        return (tick // tick_spacing) >> 8
+
+    for zero_for_one, words_away in ((True, 3), (False, 4), (True, 8), (False, 1)):
+        # off the tick grid, so that the swap stops between two initialized ticks
+        direction = -1 if zero_for_one else 1
+        limit_tick = pool.tick + direction * words_away * 256 * tick_spacing
+        limit_tick += tick_spacing // 2 - limit_tick % tick_spacing
+        if zero_for_one:
+            last_word = word(max(t for t in ticks if t < limit_tick))
+        else:
+            last_word = word(min(t for t in ticks if t > limit_tick))
+        requested.clear()
+        window = WindowedTicks(ADDRESS, 1, client=client)
+        swap_quote(
+            window,
+            slot0,
+            pool.liquidity,
+            zero_for_one,
+            10**40,
+            TickMath.getSqrtRatioAtTick(limit_tick),
+            fee=fee,
+            tick_spacing=tick_spacing,
+        )
+        first, last = sorted((word(pool.tick), last_word))
+        assert sorted(requested) == list(range(first, last + 1))
+        assert not window.complete
+
+
+def test_prefetch_in_background_loads_every_tick():
+    chain = wide_pool_chain(random.Random(5), 3000, 60)
+    window = WindowedTicks(ADDRESS, 2, client=stub_client(chain))
+    thread = window.prefetch_in_background()
+    thread.join(timeout=60)
+
+    assert not thread.is_alive()
+    assert window.complete
+    snapshot = window.snapshot()
+    expected = full_snapshot(chain)
+    assert snapshot.ticks == expected.ticks
+    assert snapshot.liquidity_nets == expected.liquidity_nets
+    pool = chain.pool(ADDRESS)
+    assert window.liquidity_grosses == {
+        t: gross for t, (gross, _) in pool.ticks.items()
+    }